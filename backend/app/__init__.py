@@ -1,6 +1,6 @@
 import os
 from flask import Flask, jsonify
-from .extensions import db, cors
+from .extensions import db, cors, cache, write_queue, autocomplete
 from config import Config
 
 # --- 1. IMPORTACIÓN DE MODELOS (Limpia) ---
@@ -9,14 +9,16 @@ from .models.role import Role
 from .models.permission import Permission
 from .models.cost_center import CostCenter
 from .models.provider import Provider
-from .models.product_catalog import Category, Product
+from .models.product_catalog import Category, Product, ProductLocation, SkuSequence, CatalogChange, CategoryClosure
 from .models.warehouse import Warehouse
-from .models.inventory_models import InventoryStock, InventoryTransaction
+from .models.inventory_models import InventoryStock, InventoryTransaction, ProductStockTotal, KardexSnapshot
 from .models.purchase_order import PurchaseOrder, DocumentType, OrderStatus, PurchaseOrderItem
 from .models.stock_transfer import StockTransfer, StockTransferItem
 
 # Importa el decorador y el error
 from .services.auth_service import AuthError, requires_auth
+from .services import category_tree_service
+from .migrations import run_migrations
 
 
 def create_app(config_class=Config):
@@ -25,6 +27,9 @@ def create_app(config_class=Config):
 
     # --- 2. INICIALIZACIÓN DE EXTENSIONES ---
     db.init_app(app)
+    cache.init_app(app)
+    write_queue.init_app(app)
+    autocomplete.init_app(app)
     cors.init_app(
         app,
         resources={r"/api/*": {"origins": [
@@ -64,14 +69,21 @@ def create_app(config_class=Config):
     app.register_blueprint(product_api, url_prefix='/api/products')
     app.register_blueprint(gre_bp, url_prefix='/api/gre')
 
-    # --- 4. MANEJADOR DE ERRORES ---
+    # --- 4. COMANDOS DE MANTENIMIENTO Y EVENTOS DE BD ---
+    from .commands import register_commands
+    register_commands(app)
+
+    from .services.kardex_snapshot_service import register_snapshot_invalidation
+    register_snapshot_invalidation()
+
+    # --- 5. MANEJADOR DE ERRORES ---
     @app.errorhandler(AuthError)
     def handle_auth_error(ex):
         response = jsonify(ex.error)
         response.status_code = ex.status_code
         return response
 
-    # --- 5. CREACIÓN DE BASE DE DATOS Y SEEDING ---
+    # --- 6. CREACIÓN DE BASE DE DATOS Y SEEDING ---
     with app.app_context():
         # Crea la carpeta 'instance' si no existe
         os.makedirs(app.instance_path, exist_ok=True)
@@ -79,6 +91,10 @@ def create_app(config_class=Config):
         # Crea todas las tablas definidas en los modelos importados
         db.create_all()
 
+        # create_all() no agrega índices ni cambios a tablas que ya existen: van en migraciones
+        if app.config.get('AUTO_MIGRATE', True):
+            run_migrations()
+
         # Llama a la función de seeding (definida abajo)
         _seed_database()
 
@@ -123,6 +139,7 @@ def _seed_database():
         cat_cables = Category(name='Cables', description='Cables eléctricos y de red')
         cat_herr = Category(name='Herramientas', description='Herramientas manuales')
         db.session.add_all([cat_cables, cat_herr])
+        category_tree_service.add([cat_cables, cat_herr])
         db.session.commit()
 
         prod_cable = Product(
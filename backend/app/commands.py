@@ -0,0 +1,66 @@
+import click
+from .extensions import db
+from .services import stock_totals_service, kardex_snapshot_service, catalog_change_service, category_tree_service
+from .migrations import pending_migrations, run_migrations
+
+
+# --- Comandos de mantenimiento (flask <comando>) ---
+def register_commands(app):
+
+    @app.cli.command('rebuild-stock-totals')
+    @click.option('--check', is_flag=True, help='Solo verificar, sin corregir.')
+    def rebuild_stock_totals(check):
+        """Verifica (y reconstruye) product_stock_totals contra inventory_stock."""
+        mismatches = stock_totals_service.rebuild(fix=not check)
+        if not check:
+            db.session.commit()
+        for product_id, stored, real in mismatches:
+            click.echo(f"Producto {product_id}: guardado={stored} real={real}")
+        if not mismatches:
+            click.echo("product_stock_totals coincide con inventory_stock.")
+        elif check:
+            click.echo(f"{len(mismatches)} diferencias encontradas (usa el comando sin --check para corregir).")
+            raise SystemExit(1)
+        else:
+            click.echo(f"{len(mismatches)} diferencias corregidas.")
+
+    @app.cli.command('close-kardex-period')
+    @click.argument('period')
+    def close_kardex_period(period):
+        """Genera los saldos de cierre del mes PERIOD (formato AAAA-MM)."""
+        try:
+            count = kardex_snapshot_service.close_period(kardex_snapshot_service.parse_period(period))
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        db.session.commit()
+        click.echo(f"Periodo {period} cerrado: {count} saldos guardados.")
+
+    @app.cli.command('prune-catalog-changes')
+    @click.option('--days', type=int, default=None, help='Días a conservar (por defecto CATALOG_CHANGES_RETENTION_DAYS).')
+    def prune_catalog_changes(days):
+        """Borra el registro de cambios del catálogo más antiguo que DAYS días."""
+        days = days if days is not None else app.config.get('CATALOG_CHANGES_RETENTION_DAYS', 30)
+        count = catalog_change_service.prune(days)
+        db.session.commit()
+        click.echo(f"{count} cambios del catálogo borrados (se conservan los últimos {days} días).")
+
+    @app.cli.command('rebuild-category-tree')
+    def rebuild_category_tree():
+        """Vuelve a armar category_closure desde categories.parent_id."""
+        count = category_tree_service.rebuild()
+        db.session.commit()
+        click.echo(f"Árbol de categorías reconstruido: {count} filas en category_closure.")
+
+    @app.cli.command('migrate-db')
+    @click.option('--status', is_flag=True, help='Solo listar las migraciones pendientes.')
+    def migrate_db(status):
+        """Aplica las migraciones de esquema pendientes (app/migrations.py)."""
+        if status:
+            pending = pending_migrations()
+            for migration_id in pending:
+                click.echo(f"Pendiente: {migration_id}")
+            if not pending:
+                click.echo("No hay migraciones pendientes.")
+            return
+        done = run_migrations()
+        click.echo(f"{len(done)} migraciones aplicadas." if done else "No hay migraciones pendientes.")
@@ -1,6 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
+from .services.cache_service import CacheService
+from .services.write_queue import WriteQueue
+from .services.autocomplete_service import AutocompleteIndex
 
 # Creamos las instancias de las extensiones sin vincularlas a una app
 db = SQLAlchemy()
-cors = CORS()
\ No newline at end of file
+cors = CORS()
+cache = CacheService()
+write_queue = WriteQueue()
+autocomplete = AutocompleteIndex()
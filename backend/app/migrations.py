@@ -0,0 +1,206 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, select, text
+from .extensions import db
+
+
+# --- Migraciones de esquema ---
+# db.create_all() crea las tablas que faltan, pero no agrega índices ni cambios a
+# tablas que ya existen. Cada migración de esta lista se aplica una sola vez, en
+# orden, y queda registrada en la tabla schema_migrations.
+# Para agregar una: una función que recibe la conexión, decorada con @migration('NNNN_nombre').
+
+MIGRATIONS = []
+
+schema_migrations = Table(
+    'schema_migrations', MetaData(),
+    Column('id', String(100), primary_key=True),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+# Clave del candado de PostgreSQL: varios workers arrancando a la vez no migran dos veces
+_ADVISORY_LOCK_KEY = 72150016
+
+
+def migration(migration_id):
+    def decorator(fn):
+        MIGRATIONS.append((migration_id, fn))
+        return fn
+    return decorator
+
+
+def _create_indexes(connection, model, *names):
+    for index in model.__table__.indexes:
+        if index.name in names:
+            index.create(connection, checkfirst=True)
+
+
+@migration('0001_inventory_transaction_indexes')
+def _inventory_transaction_indexes(connection):
+    """Índices compuestos del Kardex paginado (timestamp, id) y sus filtros."""
+    from .models.inventory_models import InventoryTransaction
+    _create_indexes(connection, InventoryTransaction,
+                    'ix_inv_tx_timestamp_id', 'ix_inv_tx_product_timestamp',
+                    'ix_inv_tx_warehouse_timestamp', 'ix_inv_tx_product_warehouse_timestamp')
+
+
+@migration('0002_product_search_index')
+def _product_search_index(connection):
+    """
+    Índice de búsqueda de productos por SKU/nombre.
+    SQLite: tabla FTS5 'products_fts' (contenido externo = products) sincronizada con
+    triggers, así cualquier INSERT/UPDATE/DELETE (rutas, importación, SQL directo) la
+    mantiene al día. PostgreSQL: índices GIN de trigramas (pg_trgm) sobre lower(...),
+    que sirven a LIKE '%...%' y a similarity().
+    Si el motor no trae FTS5 / pg_trgm, se avisa y la búsqueda sigue con LIKE.
+    """
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        try:
+            with connection.begin_nested():
+                connection.execute(text(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+                    "sku, name, content='products', content_rowid='id', "
+                    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"))
+        except Exception as e:
+            print(f"--- AVISO: SQLite sin FTS5, la búsqueda de productos usará LIKE: {e} ---")
+            return
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN "
+            "INSERT INTO products_fts(rowid, sku, name) VALUES (new.id, new.sku, new.name); END"))
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN "
+            "INSERT INTO products_fts(products_fts, rowid, sku, name) VALUES ('delete', old.id, old.sku, old.name); END"))
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF sku, name ON products BEGIN "
+            "INSERT INTO products_fts(products_fts, rowid, sku, name) VALUES ('delete', old.id, old.sku, old.name); "
+            "INSERT INTO products_fts(rowid, sku, name) VALUES (new.id, new.sku, new.name); END"))
+        # Indexa los productos que ya existían
+        connection.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+
+    elif dialect == 'postgresql':
+        try:
+            with connection.begin_nested():
+                connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        except Exception as e:
+            print(f"--- AVISO: PostgreSQL sin pg_trgm, la búsqueda de productos usará LIKE: {e} ---")
+            return
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (lower(name) gin_trgm_ops)"))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_products_sku_trgm ON products USING gin (lower(sku) gin_trgm_ops)"))
+
+
+@migration('0003_product_name_index')
+def _product_name_index(connection):
+    """Índice (name, id) del listado de productos paginado por cursor."""
+    from .models.product_catalog import Product
+    _create_indexes(connection, Product, 'ix_products_name_id')
+
+
+@migration('0004_product_locations')
+def _product_locations(connection):
+    """
+    Pasa las ubicaciones de products.location (texto separado por comas) a la tabla
+    product_locations, sin almacén asignado. La columna vieja queda sin uso (no se borra).
+    """
+    from .models.product_catalog import ProductLocation
+    from .services.product_location_service import clean_codes
+
+    table = ProductLocation.__table__
+    table.create(connection, checkfirst=True)
+    if 'location' not in {column['name'] for column in inspect(connection).get_columns('products')}:
+        return  # BD nueva: nunca tuvo la columna
+
+    rows = connection.execute(text(
+        "SELECT id, location FROM products WHERE location IS NOT NULL AND location <> ''"))
+    batch = []
+    for product_id, location in rows:
+        batch += [{'product_id': product_id, 'warehouse_id': None, 'code': code, 'position': position}
+                  for position, code in enumerate(clean_codes(location.split(',')))]
+        if len(batch) >= 1000:
+            connection.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        connection.execute(table.insert(), batch)
+
+
+@migration('0005_sku_sequences')
+def _sku_sequences(connection):
+    """
+    Tabla sku_sequences, arrancando cada prefijo en el mayor PREFIJO-NNN que ya existe
+    (las importaciones anteriores numeraban desde 1 en cada archivo).
+    """
+    from .models.product_catalog import SkuSequence
+    from .services.sku_sequence_service import parse
+
+    table = SkuSequence.__table__
+    table.create(connection, checkfirst=True)
+
+    highest = {}
+    for (sku,) in connection.execute(text("SELECT sku FROM products WHERE sku LIKE '%-%'")):
+        parsed = parse(sku)
+        if parsed and parsed[1] > highest.get(parsed[0], 0):
+            highest[parsed[0]] = parsed[1]
+    existing = {prefix for (prefix,) in connection.execute(select(table.c.prefix))}
+    rows = [{'prefix': prefix, 'last_value': number} for prefix, number in highest.items() if prefix not in existing]
+    if rows:
+        connection.execute(table.insert(), rows)
+
+
+@migration('0006_catalog_changes')
+def _catalog_changes(connection):
+    """
+    Registro de cambios del catálogo para la sincronización por versiones (/api/products/changes).
+    Arranca con una fila de base: la versión 1 es el catálogo tal como está (la versión 0
+    queda para "cliente sin datos", que siempre recibe el catálogo completo).
+    """
+    from .models.product_catalog import CatalogChange
+    from .services.catalog_change_service import BASELINE
+
+    table = CatalogChange.__table__
+    table.create(connection, checkfirst=True)
+    if connection.execute(select(table.c.id).limit(1)).first() is None:
+        connection.execute(table.insert().values(entity=BASELINE, entity_id=0, changed_at=datetime.now()))
+
+
+@migration('0007_category_closure')
+def _category_closure(connection):
+    """Tabla de clausura del árbol de categorías, armada desde categories.parent_id."""
+    from .models.product_catalog import CategoryClosure
+    from .services.category_tree_service import closure_rows
+
+    table = CategoryClosure.__table__
+    table.create(connection, checkfirst=True)
+    if connection.execute(select(table.c.ancestor_id).limit(1)).first() is not None:
+        return
+    rows = closure_rows(dict(connection.execute(text("SELECT id, parent_id FROM categories")).all()))
+    if rows:
+        connection.execute(table.insert(), rows)
+
+
+# --- Ejecución ---
+def applied_migrations(connection):
+    schema_migrations.create(connection, checkfirst=True)
+    return {row.id for row in connection.execute(select(schema_migrations.c.id))}
+
+
+def pending_migrations():
+    with db.engine.begin() as connection:
+        applied = applied_migrations(connection)
+    return [migration_id for migration_id, _ in MIGRATIONS if migration_id not in applied]
+
+
+def run_migrations():
+    """Aplica las migraciones pendientes (cada una en su propia transacción). Devuelve sus ids."""
+    done = []
+    for migration_id, fn in MIGRATIONS:
+        with db.engine.begin() as connection:
+            if connection.dialect.name == 'postgresql':
+                connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': _ADVISORY_LOCK_KEY})
+            if migration_id in applied_migrations(connection):
+                continue
+            print(f"--- Aplicando migración {migration_id} ---")
+            fn(connection)
+            connection.execute(schema_migrations.insert().values(id=migration_id, applied_at=datetime.now()))
+            done.append(migration_id)
+    return done
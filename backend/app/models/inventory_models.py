@@ -35,6 +35,15 @@ class InventoryTransaction(db.Model):
     product = db.relationship('Product')
     warehouse = db.relationship('Warehouse')
 
+    # Índices compuestos para el Kardex paginado por (timestamp, id) descendente,
+    # uno por cada combinación de filtros que acepta /api/inventory/transactions
+    __table_args__ = (
+        db.Index('ix_inv_tx_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_inv_tx_product_timestamp', 'product_id', 'timestamp', 'id'),
+        db.Index('ix_inv_tx_warehouse_timestamp', 'warehouse_id', 'timestamp', 'id'),
+        db.Index('ix_inv_tx_product_warehouse_timestamp', 'product_id', 'warehouse_id', 'timestamp', 'id'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -46,4 +55,31 @@ class InventoryTransaction(db.Model):
             'reference': self.reference,
             'quantity_change': float(self.quantity_change),
             'new_quantity': float(self.new_quantity)
-        }
\ No newline at end of file
+        }
+
+# TABLA 3: Stock total por producto (suma de todos los almacenes), mantenido incrementalmente
+# Evita el SUM(inventory_stock.quantity) en cada cálculo de costo promedio.
+# Se actualiza con services/stock_totals_service.py y se verifica con 'flask rebuild-stock-totals'.
+class ProductStockTotal(db.Model):
+    __tablename__ = 'product_stock_totals'
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    quantity = db.Column(db.Numeric(12, 2), nullable=False, default=0.00)
+
+
+# TABLA 4: Cierre mensual del Kardex (saldo por producto y almacén al final de cada mes)
+# 'stock a una fecha' = snapshot más cercano anterior + movimientos posteriores.
+class KardexSnapshot(db.Model):
+    __tablename__ = 'kardex_snapshots'
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouses.id'), nullable=False)
+
+    period = db.Column(db.Date, nullable=False) # Primer día del mes cerrado
+    balance_at = db.Column(db.DateTime, nullable=False) # Fin del periodo (exclusivo): 1er instante del mes siguiente
+    quantity = db.Column(db.Numeric(12, 2), nullable=False)
+    closed_at = db.Column(db.DateTime, default=datetime.now)
+
+    __table_args__ = (
+        UniqueConstraint('product_id', 'warehouse_id', 'period', name='_snapshot_product_warehouse_period_uc'),
+        db.Index('ix_kardex_snapshots_pw_balance', 'product_id', 'warehouse_id', 'balance_at'),
+    )
@@ -1,3 +1,4 @@
+from datetime import datetime
 from ..extensions import db
 
 class Category(db.Model):
@@ -10,7 +11,10 @@ class Category(db.Model):
     # parent_id apunta al id de otra categoría en esta misma tabla
     parent_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=True)
     # Relación para obtener las subcategorías (ej. Categoria "Cables" -> subcategorías "Red", "Eléctrico")
-    subcategories = db.relationship('Category', backref=db.backref('parent', remote_side=[id]), lazy='dynamic')
+    # 'selectin': los padres que no vinieron en el mismo resultado llegan en una sola consulta
+    # extra (antes to_dict() hacía una consulta por fila para 'parent_name')
+    subcategories = db.relationship('Category', backref=db.backref('parent', remote_side=[id], lazy='selectin',
+                                                                   join_depth=1), lazy='dynamic')
 
     # Relación: Una categoría tiene muchos productos
     products = db.relationship('Product', backref='category', lazy='dynamic')
@@ -34,13 +38,21 @@ class Product(db.Model):
 
     # --- ¡NUEVO CAMPO! Precio Estándar / Referencial ---
     standard_price = db.Column(db.Numeric(10, 2), nullable=False, default=0.00)
-    location = db.Column(db.Text, nullable=True) # Ubicaciones físicas/estantes, separadas por comas
 
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
 
+    # Ubicaciones físicas/estantes (tabla product_locations; antes un texto separado por comas).
+    # 'selectin': al cargar varios productos, sus ubicaciones llegan en una sola consulta extra
+    locations = db.relationship('ProductLocation', lazy='selectin', cascade='all, delete-orphan',
+                                order_by='(ProductLocation.position, ProductLocation.id)')
+
+    # Listado paginado por nombre (cursor sobre name, id)
+    __table_args__ = (
+        db.Index('ix_products_name_id', 'name', 'id'),
+    )
+
     def to_dict(self):
-        # Convierte el string de ubicaciones separadas por comas en una lista
-        locations = [loc.strip() for loc in self.location.split(',')] if self.location else []
+        locations = [loc.code for loc in self.locations]
         return {
             'id': self.id,
             'sku': self.sku,
@@ -50,4 +62,61 @@ class Product(db.Model):
             'location': locations, # <-- Devuelve una lista
             'category_name': self.category.name if self.category else 'N/A',
             'category_id': self.category_id
-        }
\ No newline at end of file
+        }
+
+
+# Ubicación física de un producto (estante, pasillo...), opcionalmente en un almacén.
+# warehouse_id = None: ubicación cargada desde el catálogo, sin almacén asignado.
+class ProductLocation(db.Model):
+    __tablename__ = 'product_locations'
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouses.id'), nullable=True)
+    code = db.Column(db.String(100), nullable=False) # ej. "A1-B2"
+    position = db.Column(db.Integer, nullable=False, default=0) # Orden dentro de la lista del producto
+
+    __table_args__ = (
+        db.Index('ix_product_locations_code_warehouse', 'code', 'warehouse_id'),
+        db.Index('ix_product_locations_product_warehouse', 'product_id', 'warehouse_id'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'product_id': self.product_id,
+            'warehouse_id': self.warehouse_id,
+            'code': self.code
+        }
+
+
+# Árbol de categorías como tabla de clausura: un par (ancestro, descendiente) por cada
+# categoría y cada uno de sus ancestros, incluida ella misma (depth 0). "Todo lo que
+# cuelga de Cables" es un SELECT por ancestor_id (services/category_tree_service.py).
+class CategoryClosure(db.Model):
+    __tablename__ = 'category_closure'
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False) # 0 = la misma categoría, 1 = hijo directo...
+
+    __table_args__ = (
+        db.Index('ix_category_closure_descendant', 'descendant_id', 'ancestor_id'),
+    )
+
+
+# Último número entregado por prefijo de SKU ("CEL" -> CEL-001, CEL-002...).
+# Lo usan la importación y el alta de productos (services/sku_sequence_service.py).
+class SkuSequence(db.Model):
+    __tablename__ = 'sku_sequences'
+    prefix = db.Column(db.String(50), primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Registro de cambios del catálogo para la sincronización incremental
+# (/api/products/changes?since=). El id es la versión: cada producto o categoría
+# creado, modificado o borrado agrega una fila (services/catalog_change_service.py).
+class CatalogChange(db.Model):
+    __tablename__ = 'catalog_changes'
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False) # 'product' | 'category'
+    entity_id = db.Column(db.Integer, nullable=False)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
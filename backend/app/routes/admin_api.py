@@ -4,7 +4,7 @@ from ..models.role import Role
 from ..models.permission import Permission
 # Importaremos un decorador de auth mejorado en el siguiente paso
 # Por ahora, usaremos el que ya tenemos
-from ..services.auth_service import requires_auth
+from ..services.auth_service import requires_auth, invalidate_permissions_cache
 
 admin_api = Blueprint('admin_api', __name__)
 
@@ -69,6 +69,9 @@ def update_role_permissions(role_id, payload):
         # 4. Guardar en la base de datos
         db.session.commit()
 
+        # 5. Los permisos resueltos en memoria ya no son válidos
+        invalidate_permissions_cache()
+
         return jsonify(success=True, message=f"Permisos del rol '{role.name}' actualizados.")
 
     except Exception as e:
@@ -1,7 +1,9 @@
-from flask import Blueprint, jsonify, request
-from ..extensions import db
+from flask import Blueprint, jsonify, request, current_app
+from ..extensions import db, cache
 from ..models.product_catalog import Category
 from ..services.auth_service import requires_auth
+from ..services.tabular_reader import TabularReader
+from ..services import catalog_change_service, category_tree_service
 import pandas as pd # <-- Importar pandas
 
 category_api = Blueprint('category_api', __name__)
@@ -12,8 +14,11 @@ category_api = Blueprint('category_api', __name__)
 def get_categories(payload):
     """Devuelve una lista de todas las categorías."""
     try:
-        categories = Category.query.order_by(Category.name).all()
-        return jsonify([c.to_dict() for c in categories])
+        # Se sirve desde la caché compartida hasta que alguna escritura suba la versión
+        data = cache.remember('categories', 'list', lambda: [
+            c.to_dict() for c in Category.query.order_by(Category.name).all()
+        ])
+        return jsonify(data)
     except Exception as e:
         return jsonify(error=str(e)), 500
 
@@ -33,7 +38,10 @@ def create_category(payload):
             parent_id=data.get('parent_id')
         )
         db.session.add(new_cat)
+        category_tree_service.add([new_cat])
+        catalog_change_service.record(catalog_change_service.CATEGORY, [new_cat.id])
         db.session.commit()
+        cache.bump_version('categories')
         return jsonify(new_cat.to_dict()), 201
 
     except Exception as e:
@@ -50,10 +58,22 @@ def update_category(cat_id, payload):
     try:
         cat.name = data.get('name', cat.name)
         cat.description = data.get('description', cat.description)
-        cat.parent_id = data.get('parent_id', cat.parent_id)
 
+        # Cambio de padre: se mueve el subárbol completo (no puede quedar dentro de sí mismo)
+        parent_id = data.get('parent_id', cat.parent_id)
+        parent_id = int(parent_id) if parent_id not in (None, '') else None
+        if parent_id != cat.parent_id:
+            category_tree_service.move(cat.id, parent_id)
+            cat.parent_id = parent_id
+
+        # El nombre también se ve en sus productos y subcategorías
+        catalog_change_service.record_category(cat.id)
         db.session.commit()
+        cache.bump_version('categories')
         return jsonify(cat.to_dict())
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify(error=str(e)), 400
     except Exception as e:
         db.session.rollback()
         return jsonify(error=str(e)), 500
@@ -65,8 +85,11 @@ def delete_category(cat_id, payload):
     cat = Category.query.get_or_404(cat_id)
 
     try:
+        category_tree_service.remove(cat_id)
         db.session.delete(cat)
+        catalog_change_service.record_category(cat_id)
         db.session.commit()
+        cache.bump_version('categories')
         return jsonify(success=True, message="Categoría eliminada")
     except Exception as e:
         db.session.rollback()
@@ -84,53 +107,70 @@ def import_categories(payload):
         return jsonify(error="No se seleccionó ningún archivo"), 400
 
     try:
-        df = pd.read_excel(file)
+        # Lectura por streaming (Excel o CSV), en bloques de filas
+        reader = TabularReader(file, chunk_size=current_app.config['IMPORT_CHUNK_SIZE'])
 
         required_columns = ['Nombre']
-        if not all(col in df.columns for col in required_columns):
+        if not all(col in reader.columns for col in required_columns):
+            reader.close()
             return jsonify(error=f"El Excel debe tener al menos la columna: {', '.join(required_columns)}. La columna 'Padre' es opcional."), 400
 
         created_count = 0
         updated_count = 0
         errors = []
+        touched = []  # Categorías creadas/modificadas, para el registro de cambios del catálogo
 
         # Para manejar las relaciones padre-hijo, procesamos en dos pasadas o de forma inteligente
         # Primero creamos todas las categorías sin padres, luego asignamos padres
         # O, más simple, procesamos en orden y creamos padres si no existen
 
-        for index, row in df.iterrows():
-            try:
-                cat_name = str(row['Nombre']).strip()
-                parent_name = str(row['Padre']).strip() if 'Padre' in row and pd.notna(row['Padre']) else None
+        with reader:
+            for index, row in reader.iter_rows(['Nombre', 'Padre']):
+                try:
+                    cat_name = str(row['Nombre']).strip()
+                    parent_name = str(row['Padre']).strip() if 'Padre' in row and pd.notna(row['Padre']) else None
                 
-                category = Category.query.filter(db.func.lower(Category.name) == cat_name.lower()).first()
+                    category = Category.query.filter(db.func.lower(Category.name) == cat_name.lower()).first()
                 
-                parent_id = None
-                if parent_name:
-                    parent_category = Category.query.filter(db.func.lower(Category.name) == parent_name.lower()).first()
-                    if not parent_category:
-                        # Crear la categoría padre si no existe
-                        new_parent = Category(name=parent_name, description=f"Padre de {cat_name} (creado por importación)")
-                        db.session.add(new_parent)
-                        db.session.flush() # Para obtener el ID
-                        parent_id = new_parent.id
+                    parent_id = None
+                    if parent_name:
+                        parent_category = Category.query.filter(db.func.lower(Category.name) == parent_name.lower()).first()
+                        if not parent_category:
+                            # Crear la categoría padre si no existe
+                            new_parent = Category(name=parent_name, description=f"Padre de {cat_name} (creado por importación)")
+                            db.session.add(new_parent)
+                            db.session.flush() # Para obtener el ID
+                            category_tree_service.add([new_parent])
+                            parent_id = new_parent.id
+                            touched.append(new_parent)
+                        else:
+                            parent_id = parent_category.id
+
+                    if category:
+                        # Actualizar existente (moviendo su subárbol si cambia el padre)
+                        if category.parent_id != parent_id:
+                            category_tree_service.move(category.id, parent_id)
+                        category.parent_id = parent_id
+                        touched.append(category)
+                        updated_count += 1
                     else:
-                        parent_id = parent_category.id
-
-                if category:
-                    # Actualizar existente
-                    category.parent_id = parent_id
-                    updated_count += 1
-                else:
-                    # Crear nueva
-                    new_cat = Category(name=cat_name, parent_id=parent_id)
-                    db.session.add(new_cat)
-                    created_count += 1
-            except Exception as row_e:
-                errors.append(f"Fila {index + 2}: Error al procesar '{cat_name}' - {str(row_e)}")
-                db.session.rollback() # Rollback de la fila actual si hay error
-
+                        # Crear nueva
+                        new_cat = Category(name=cat_name, parent_id=parent_id)
+                        db.session.add(new_cat)
+                        category_tree_service.add([new_cat])
+                        touched.append(new_cat)
+                        created_count += 1
+                except ValueError as row_e:
+                    # Padre inválido (la categoría quedaría dentro de sí misma): move() no escribió nada
+                    errors.append(f"Fila {index + 2}: '{cat_name}' - {str(row_e)}")
+                except Exception as row_e:
+                    errors.append(f"Fila {index + 2}: Error al procesar '{cat_name}' - {str(row_e)}")
+                    db.session.rollback() # Rollback de la fila actual si hay error
+
+        db.session.flush()
+        catalog_change_service.record(catalog_change_service.CATEGORY, [category.id for category in touched])
         db.session.commit()
+        cache.bump_version('categories')
 
         return jsonify({
             "message": "Importación de categorías completada",
@@ -142,4 +182,17 @@ def import_categories(payload):
     except Exception as e:
         db.session.rollback()
         print(f"--- ERROR EN IMPORTACIÓN DE CATEGORÍAS: {e} ---")
-        return jsonify(error=f"Error al procesar el archivo: {str(e)}"), 500
\ No newline at end of file
+        return jsonify(error=f"Error al procesar el archivo: {str(e)}"), 500
+
+# --- RUTA 6: Árbol de categorías ---
+@category_api.route('/tree', methods=['GET'])
+@requires_auth(required_permission='view:catalog')
+def get_category_tree(payload):
+    """
+    Todas las categorías anidadas: [{id, name, description, parent_id, children: [...]}].
+    Se arma con una sola consulta y se guarda en la caché junto con la lista.
+    """
+    try:
+        return jsonify(cache.remember('categories', 'tree', category_tree_service.tree))
+    except Exception as e:
+        return jsonify(error=str(e)), 500
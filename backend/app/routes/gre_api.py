@@ -8,10 +8,11 @@ import time
 from flask import current_app
 
 # --- INICIO DE CAMBIOS: Importaciones para movimiento de stock ---
-from ..extensions import db
+from ..extensions import db, write_queue
 from ..services.auth_service import requires_auth
+from ..services import stock_service, stock_totals_service
 from ..models.stock_transfer import StockTransfer, StockTransferItem
-from ..models.inventory_models import InventoryStock, InventoryTransaction
+from ..models.inventory_models import InventoryTransaction
 from ..models.product_catalog import Product
 from ..models.warehouse import Warehouse # <-- AÑADIDO
 # --- FIN DE CAMBIOS ---
@@ -20,6 +21,96 @@ from ..models.warehouse import Warehouse # <-- AÑADIDO
 gre_bp = Blueprint('gre_api', __name__, url_prefix='/api/gre')
 
 
+# --- Trabajo de escritura: registra la salida de stock de una GRE aceptada (sin commit) ---
+def _register_gre_movement(datos_guia, ticket_id, user_id):
+    # --- ¡NUEVO! Búsqueda de IDs ---
+    # 1. Buscar el ID del almacén de origen por su nombre/dirección
+    origin_address = datos_guia.get('punto_de_partida_direccion')
+    if not origin_address:
+        raise ValueError("El campo 'punto_de_partida_direccion' es requerido para buscar el almacén de origen.")
+
+    warehouse_origen = Warehouse.query.filter_by(address=origin_address).first()
+    if not warehouse_origen:
+        raise ValueError(f"No se encontró un almacén con la dirección exacta: '{origin_address}'.")
+    origin_warehouse_id = warehouse_origen.id
+
+    # 2. Validar que hay items
+    if not datos_guia.get('items'):
+        raise ValueError("No hay 'items' en los datos para registrar el movimiento.")
+
+    # 3. Crear el registro de la transferencia
+    new_transfer = StockTransfer(
+        user_id=user_id,
+        origin_warehouse_id=origin_warehouse_id, # <-- ID encontrado
+        destination_external_address=datos_guia.get('punto_de_llegada_direccion'),
+        status="Completada (GRE)",
+        transfer_date=datetime.now(),
+        gre_series=datos_guia.get('serie'),
+        gre_number=datos_guia.get('numero'),
+        gre_ticket=ticket_id
+    )
+    db.session.add(new_transfer)
+
+    # 4. Crear los items y descontar el stock
+    total_deltas = {}  # Cambio neto del stock total por producto
+    for item_data in datos_guia['items']:
+        # --- ¡NUEVO! Buscar el ID del producto por su SKU/código ---
+        item_sku = item_data.get('codigo')
+        if not item_sku:
+            raise ValueError("Cada ítem debe tener un 'codigo' (SKU) para buscarlo en la base de datos.")
+
+        product = Product.query.filter_by(sku=item_sku).first()
+        if not product:
+            raise ValueError(f"No se encontró un producto con el SKU: '{item_sku}'.")
+        product_id = product.id
+        # --- Fin búsqueda ---
+
+        # --- INICIO DE CAMBIO: Lógica robusta para obtener la cantidad ---
+        quantity_val = item_data.get('quantity')
+        if quantity_val is None:
+            quantity_val = item_data.get('cantidad')
+
+        if quantity_val is None:
+            raise ValueError(f"El ítem con SKU {item_sku} no tiene un campo de cantidad ('quantity' o 'cantidad').")
+
+        quantity = float(quantity_val)
+        # --- FIN DE CAMBIO ---
+        if quantity <= 0:
+            raise ValueError("La cantidad debe ser mayor a 0.")
+
+        # Crear el item de la transferencia
+        new_item = StockTransferItem(
+            transfer=new_transfer,
+            product_id=product_id, # <-- ID encontrado
+            quantity=quantity
+        )
+        db.session.add(new_item)
+
+        # Descontar del stock de origen (UPDATE condicional en la BD)
+        try:
+            new_quantity = stock_service.decrement(product_id, origin_warehouse_id, quantity)
+        except stock_service.InsufficientStockError:
+            raise ValueError(f"Stock insuficiente para '{product.name}' (SKU: {item_sku}) en el almacén '{warehouse_origen.name}'.")
+
+        # Registrar la transacción de salida
+        trans_salida = InventoryTransaction(
+            product_id=product_id,
+            warehouse_id=origin_warehouse_id,
+            quantity_change=-quantity,
+            new_quantity=new_quantity,
+            type="Envío a Terceros (GRE)",
+            user_id=user_id,
+            reference=f"GRE: {datos_guia.get('serie')}-{datos_guia.get('numero')}"
+        )
+        db.session.add(trans_salida)
+        total_deltas[product_id] = total_deltas.get(product_id, 0.0) - quantity
+
+    stock_totals_service.apply_deltas(total_deltas)
+
+    db.session.flush()
+    return new_transfer.id
+
+
 # --- INICIO DE CAMBIOS: Se añade autenticación para obtener el user_id ---
 @gre_bp.route('/enviar', methods=['POST'])
 @requires_auth(required_permission='manage:transfers')
@@ -88,97 +179,11 @@ def enviar_guia_endpoint(payload):
         if resultado_consulta.get('codRespuesta') == '0':
             print(f"--- GRE Aceptada. Registrando movimiento de stock... ---")
             try:
-                # --- ¡NUEVO! Búsqueda de IDs ---
-                # 1. Buscar el ID del almacén de origen por su nombre/dirección
-                origin_address = datos_guia.get('punto_de_partida_direccion')
-                if not origin_address:
-                    raise ValueError("El campo 'punto_de_partida_direccion' es requerido para buscar el almacén de origen.")
-                
-                warehouse_origen = Warehouse.query.filter_by(address=origin_address).first()
-                if not warehouse_origen:
-                    raise ValueError(f"No se encontró un almacén con la dirección exacta: '{origin_address}'.")
-                origin_warehouse_id = warehouse_origen.id
-                
-                # 2. Validar que hay items
-                if not datos_guia.get('items'):
-                    raise ValueError("No hay 'items' en los datos para registrar el movimiento.")
-
-                # 3. Crear el registro de la transferencia
-                new_transfer = StockTransfer(
-                    user_id=user_id,
-                    origin_warehouse_id=origin_warehouse_id, # <-- ID encontrado
-                    destination_external_address=datos_guia.get('punto_de_llegada_direccion'),
-                    status="Completada (GRE)",
-                    transfer_date=datetime.now(),
-                    gre_series=datos_guia.get('serie'),
-                    gre_number=datos_guia.get('numero'),
-                    gre_ticket=ticket_id
-                )
-                db.session.add(new_transfer)
-
-                # 4. Crear los items y descontar el stock
-                for item_data in datos_guia['items']:
-                    # --- ¡NUEVO! Buscar el ID del producto por su SKU/código ---
-                    item_sku = item_data.get('codigo')
-                    if not item_sku:
-                        raise ValueError("Cada ítem debe tener un 'codigo' (SKU) para buscarlo en la base de datos.")
-                    
-                    product = Product.query.filter_by(sku=item_sku).first()
-                    if not product:
-                        raise ValueError(f"No se encontró un producto con el SKU: '{item_sku}'.")
-                    product_id = product.id
-                    # --- Fin búsqueda ---
-
-                    # --- INICIO DE CAMBIO: Lógica robusta para obtener la cantidad ---
-                    quantity_val = item_data.get('quantity')
-                    if quantity_val is None:
-                        quantity_val = item_data.get('cantidad')
-
-                    if quantity_val is None:
-                        raise ValueError(f"El ítem con SKU {item_sku} no tiene un campo de cantidad ('quantity' o 'cantidad').")
-                    
-                    quantity = float(quantity_val)
-                    # --- FIN DE CAMBIO ---
-                    if quantity <= 0:
-                        raise ValueError("La cantidad debe ser mayor a 0.")
-
-                    # Crear el item de la transferencia
-                    new_item = StockTransferItem(
-                        transfer=new_transfer,
-                        product_id=product_id, # <-- ID encontrado
-                        quantity=quantity
-                    )
-                    db.session.add(new_item)
-
-                    # Descontar del stock de origen
-                    stock_origen = InventoryStock.query.filter_by(
-                        product_id=product_id,
-                        warehouse_id=origin_warehouse_id
-                    ).first()
-
-                    if not stock_origen or float(stock_origen.quantity) < quantity:
-                        raise ValueError(f"Stock insuficiente para '{product.name}' (SKU: {item_sku}) en el almacén '{warehouse_origen.name}'.")
-
-                    stock_origen.quantity = float(stock_origen.quantity) - quantity
-
-                    # Registrar la transacción de salida
-                    trans_salida = InventoryTransaction(
-                        product_id=product_id,
-                        warehouse_id=origin_warehouse_id,
-                        quantity_change=-quantity,
-                        new_quantity=stock_origen.quantity,
-                        type="Envío a Terceros (GRE)",
-                        user_id=user_id,
-                        reference=f"GRE: {datos_guia.get('serie')}-{datos_guia.get('numero')}"
-                    )
-                    db.session.add(trans_salida)
-
-                # 5. Guardar todos los cambios en la base de datos
-                db.session.commit()
-                print(f"--- Movimiento de stock para Transferencia ID {new_transfer.id} registrado exitosamente. ---")
+                # La cola de escritura registra el movimiento y lo guarda en un commit
+                transfer_id = write_queue.run(_register_gre_movement, datos_guia, ticket_id, user_id)
+                print(f"--- Movimiento de stock para Transferencia ID {transfer_id} registrado exitosamente. ---")
 
             except Exception as db_error:
-                db.session.rollback()
                 print(f"--- ERROR CRÍTICO: La GRE fue aceptada por SUNAT pero falló el registro en BD: {db_error} ---")
                 resultado_consulta['advertencia_interna'] = f"La GRE fue ACEPTADA por SUNAT, pero ocurrió un error al registrar el movimiento de stock: {str(db_error)}"
                 return jsonify(resultado_consulta), 500
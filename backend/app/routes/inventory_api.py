@@ -1,26 +1,28 @@
 from flask import Blueprint, jsonify, request, send_file, current_app
-from ..extensions import db
+from ..extensions import db, cache, write_queue
 from ..models.warehouse import Warehouse
 from ..models.purchase_order import PurchaseOrder, PurchaseOrderItem, OrderStatus
 from ..models.inventory_models import InventoryStock, InventoryTransaction
 from ..models.product_catalog import Product, Category
 from ..services.auth_service import requires_auth
-from sqlalchemy import or_, and_
+from ..services.receiving_service import receive_items
+from ..services.stock_adjustment_service import adjust_stock_mass
+from ..services.tabular_reader import TabularReader
+from ..services.streaming import stream_rows, json_array_response
+from ..services.product_location_service import codes_in, with_locations
+from ..services import kardex_snapshot_service, label_service, category_tree_service
+from sqlalchemy import or_, and_, tuple_
 from sqlalchemy.orm import joinedload
 import pandas as pd
 import os
-from fpdf import FPDF
-from PIL import Image
+import io
+import base64
+import binascii
+from datetime import datetime
 
 inventory_api = Blueprint('inventory_api', __name__)
 
 # --- API de Etiquetas ---
-class PDF(FPDF):
-    def header(self):
-        pass
-    def footer(self):
-        pass
-
 @inventory_api.route('/generate-labels', methods=['POST'])
 @requires_auth(required_permission='view:inventory')
 def generate_labels(payload):
@@ -31,75 +33,29 @@ def generate_labels(payload):
         return jsonify(error="No se proporcionaron productos para generar etiquetas."), 400
 
     try:
-        pdf = PDF('P', 'mm', 'A4')
-        pdf.add_page()
-        pdf.set_auto_page_break(auto=True, margin=10)
-        pdf.set_font('Arial', 'B', 10)
-
-        # --- Dimensiones y Posicionamiento ---
-        label_width = 60
-        label_height = 30
-        margin_x = 10
-        margin_y = 10
-        gap_x = 5
-        gap_y = 5
-        
         # Logo - Asegúrate que la ruta es correcta
         logo_path = os.path.join(current_app.instance_path, 'logo_v2.png')
         if not os.path.exists(logo_path):
             return jsonify(error=f"No se encontró el logo en la ruta: {logo_path}"), 500
-        
-        # Obtener dimensiones del logo para mantener el aspect ratio
-        with Image.open(logo_path) as img:
-            logo_orig_w, logo_orig_h = img.size
-            aspect_ratio = logo_orig_w / logo_orig_h
-
-        x = margin_x
-        y = margin_y
-
-        for product in products:
-            quantity = int(product.get('quantity', 1))
-            for _ in range(quantity):
-                # --- Dibujar el borde del sticker ---
-                pdf.rect(x, y, label_width, label_height)
-
-                # --- Logo (Centrado y sin distorsión) ---
-                logo_h = 8 # Altura fija para el logo
-                logo_w = logo_h * aspect_ratio # Ancho calculado para mantener proporción
-                x_logo = x + (label_width - logo_w) / 2
-                pdf.image(logo_path, x_logo, y + 2, w=logo_w, h=logo_h)
-
-                # --- SKU ---
-                pdf.set_font('Arial', 'B', 12)
-                pdf.set_xy(x + 1, y + 12) # Se baja un poco el SKU para dar espacio al logo
-                pdf.cell(label_width - 2, 5, f"SKU: {product.get('product_sku', 'N/A')}", align='C')
-
-                # --- Nombre del Producto ---
-                pdf.set_font('Arial', '', 8)
-                pdf.set_xy(x + 1, y + 18) # Se baja el nombre
-                # MultiCell para auto-ajuste de texto
-                pdf.multi_cell(label_width - 2, 5, product.get('product_name', 'Sin Nombre'), align='C')
-
-                # --- Avanzar a la siguiente posición ---
-                x += label_width + gap_x
-                if x + label_width > pdf.w - margin_x:
-                    x = margin_x
-                    y += label_height + gap_y
-                    if y + label_height > pdf.h - margin_y:
-                        pdf.add_page()
-                        y = margin_y
-
-        # --- Generar y enviar el PDF ---
-        pdf_output_path = os.path.join(current_app.instance_path, 'etiquetas.pdf')
-        pdf.output(pdf_output_path)
+
+        # --- Generar el PDF en memoria (cada petición tiene su propio archivo) ---
+        pdf_bytes = label_service.render_pdf(
+            products, logo_path,
+            size=data.get('size', label_service.DEFAULT_SIZE),
+            symbology=data.get('symbology', label_service.DEFAULT_SYMBOLOGY),
+            workers=current_app.config.get('LABELS_WORKERS'),
+            parallel_threshold=current_app.config.get('LABELS_PARALLEL_THRESHOLD', label_service.PARALLEL_THRESHOLD)
+        )
 
         return send_file(
-            pdf_output_path,
+            io.BytesIO(pdf_bytes),
             as_attachment=True,
             download_name='etiquetas.pdf',
             mimetype='application/pdf'
         )
 
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
     except Exception as e:
         print(f"--- ERROR GENERANDO ETIQUETAS: {e} ---")
         return jsonify(error=str(e)), 500
@@ -109,8 +65,8 @@ def generate_labels(payload):
 @requires_auth(required_permission='manage:inventory')
 def get_warehouses(payload):
     try:
-        warehouses = Warehouse.query.all()
-        return jsonify([w.to_dict() for w in warehouses])
+        data = cache.remember('warehouses', 'all', lambda: [w.to_dict() for w in Warehouse.query.all()])
+        return jsonify(data)
     except Exception as e:
         return jsonify(error=str(e)), 500
 
@@ -138,126 +94,114 @@ def receive_inventory(payload):
         return jsonify(error="Faltan datos (warehouse_id, order_id, items)"), 400
 
     try:
-        warehouse_id = data['warehouse_id']
-        order_id = data['order_id']
-
-        # 1. Recorrer cada item que el usuario está recepcionando
-        for item_data in data['items']:
-            po_item_id = item_data['po_item_id']
-            product_id = item_data['product_id']
-            quantity_received = float(item_data['quantity_received'])
-            # --- CAMBIO: Obtener la ubicación opcional ---
-            location = item_data.get('location')
-
-            if quantity_received <= 0:
-                continue # Ignorar items que no se están recibiendo
-
-            # 2. Actualizar el PurchaseOrderItem (le asignamos el product_id)
-            po_item = PurchaseOrderItem.query.get(po_item_id)
-            if not po_item:
-                raise Exception(f"No se encontró el item de orden {po_item_id}")
-
-            po_item.product_id = product_id
-
-            # 3. Encontrar (o crear) el registro de Stock para este producto/almacén
-            stock_entry = InventoryStock.query.filter_by(
-                product_id=product_id,
-                warehouse_id=warehouse_id
-            ).first()
-
-            if not stock_entry:
-                stock_entry = InventoryStock(
-                    product_id=product_id,
-                    warehouse_id=warehouse_id,
-                    quantity=0.0
-                )
-                db.session.add(stock_entry)
-
-            # --- CÁLCULO DE COSTO PROMEDIO PONDERADO Y UBICACIÓN ---
-            product = Product.query.get(product_id)
-
-            # --- CAMBIO: Actualizar la ubicación si se proporciona ---
-            if location:
-                product.location = location
-
-            current_total_stock = db.session.query(db.func.sum(InventoryStock.quantity)).filter_by(
-                product_id=product_id).scalar() or 0.0
-            current_total_stock = float(current_total_stock)
-            current_avg_price = float(product.standard_price)
-
-            incoming_price = float(po_item.unit_price)
-            current_total_value = current_total_stock * current_avg_price
-            incoming_total_value = quantity_received * incoming_price
-            new_total_quantity = current_total_stock + quantity_received
-
-            if new_total_quantity > 0:
-                new_avg_price = (current_total_value + incoming_total_value) / new_total_quantity
-                product.standard_price = new_avg_price
-            # -------------------------------------------
-
-            # 4. Actualizar la cantidad de stock
-            new_stock_quantity = float(stock_entry.quantity) + quantity_received
-            stock_entry.quantity = new_stock_quantity
-
-            # 5. Crear la Transacción de Inventario (Kardex)
-            transaction = InventoryTransaction(
-                product_id=product_id,
-                warehouse_id=warehouse_id,
-                quantity_change=quantity_received,
-                new_quantity=new_stock_quantity,
-                type="Recepción de Compra",
-                user_id=user_id,
-                purchase_order_item_id=po_item_id
-            )
-            db.session.add(transaction)
-
-        # 6. Actualizar el estado de la Orden de Compra a "Recibida"
-        order = PurchaseOrder.query.get(order_id)
-        received_status = OrderStatus.query.filter_by(name='Recibida').first()
-        if order and received_status:
-            order.status_id = received_status.id
-
-        # 7. Guardar todos los cambios en la BD
-        db.session.commit()
+        # El motor precarga y escribe por lotes (ver services/receiving_service.py);
+        # la cola de escritura lo ejecuta y confirma en la BD
+        write_queue.run(receive_items, data['warehouse_id'], data['order_id'], data['items'], user_id)
+        cache.bump_version('products')  # Precio promedio y ubicaciones del catálogo
 
         return jsonify(success=True, message="Inventario actualizado correctamente.")
 
     except Exception as e:
-        db.session.rollback()
         print(f"--- ERROR AL RECEPCIONAR: {str(e)} ---")
         return jsonify(error=str(e)), 500
 
 
 # --- API 3: Reporte de Stock Detallado por Almacén ---
+STOCK_REPORT_MAX_LIMIT = 1000
+
+
+def _stock_report_filters(query, args):
+    """
+    Aplica los filtros opcionales: warehouse_id, category_id y sku_prefix.
+    Con include_subcategories=true, category_id incluye todas sus subcategorías.
+    """
+    warehouse_id = args.get('warehouse_id', type=int)
+    category_id = args.get('category_id', type=int)
+    subtree = args.get('include_subcategories', 'false').lower() in ('true', '1', 'yes')
+    sku_prefix = args.get('sku_prefix', '').strip()
+
+    if warehouse_id:
+        query = query.filter(InventoryStock.warehouse_id == warehouse_id)
+    if category_id:
+        query = query.filter(category_tree_service.in_category(Product.category_id, category_id, subtree))
+    if sku_prefix:
+        query = query.filter(Product.sku.startswith(sku_prefix, autoescape=True))
+    return query
+
+
+def _stock_report_item(item):
+    row, locations = item
+    return {
+        "product_sku": row.sku,
+        "product_name": row.name,
+        "category_name": row.category_name,
+        "warehouse_name": row.warehouse_name,
+        "product_location": ', '.join(codes_in(locations, row.warehouse_id)) or None, # <-- AÑADIDO
+        "quantity": float(row.quantity),
+        "unit_price": float(row.standard_price or 0.0),
+        "total_value": float(row.total_value or 0.0)
+    }
+
+
 @inventory_api.route('/stock-report', methods=['GET'], strict_slashes=False)
 @requires_auth(required_permission='view:inventory')
 def get_stock_report(payload):
+    """
+    Reporte de stock por producto y almacén, calculado en SQL (solo las columnas necesarias).
+    Filtros opcionales: ?warehouse_id=, ?category_id= (&include_subcategories=true), ?sku_prefix=
+    Paginación: ?limit=N&cursor=<next_cursor>. Con 'limit' la respuesta es
+    { items, totals, next_cursor }; sin 'limit' se mantiene la lista completa de antes.
+    """
     try:
-        # La consulta ahora se basa en InventoryStock para obtener el detalle por almacén
-        query = InventoryStock.query.options(
-            joinedload(InventoryStock.product).joinedload(Product.category),
-            joinedload(InventoryStock.warehouse)
-        ).filter(InventoryStock.quantity > 0)
-
-        stock_entries = query.all()
-
-        report = []
-        for entry in stock_entries:
-            qty = float(entry.quantity)
-            price = float(entry.product.standard_price or 0.0)
-            
-            report.append({
-                "product_sku": entry.product.sku,
-                "product_name": entry.product.name,
-                "category_name": entry.product.category.name,
-                "warehouse_name": entry.warehouse.name,
-                "product_location": entry.product.location, # <-- AÑADIDO
-                "quantity": qty,
-                "unit_price": price,
-                "total_value": qty * price
-            })
+        # Mismos JOINs y filtros para las filas y para los totales
+        base_query = db.session.query(InventoryStock) \
+            .join(Product, InventoryStock.product_id == Product.id) \
+            .join(Category, Product.category_id == Category.id) \
+            .join(Warehouse, InventoryStock.warehouse_id == Warehouse.id) \
+            .filter(InventoryStock.quantity > 0)
+        base_query = _stock_report_filters(base_query, request.args)
+
+        total_value = (InventoryStock.quantity * Product.standard_price).label('total_value')
+        query = base_query.with_entities(
+            InventoryStock.id, InventoryStock.warehouse_id, InventoryStock.product_id,
+            Product.sku, Product.name, Category.name.label('category_name'),
+            Warehouse.name.label('warehouse_name'),
+            InventoryStock.quantity, Product.standard_price, total_value
+        )
+
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor', type=int)
+
+        if limit:
+            limit = max(1, min(limit, STOCK_REPORT_MAX_LIMIT))
+            # Paginación por llave (keyset): sin OFFSET, cada página cuesta lo mismo
+            page_query = query.order_by(InventoryStock.id)
+            if cursor:
+                page_query = page_query.filter(InventoryStock.id > cursor)
+            rows = page_query.limit(limit + 1).all()
+        else:
+            # Lista completa: se recorre con cursor del servidor y se escribe por partes
+            rows = stream_rows(query.order_by(InventoryStock.id))
+            return json_array_response(with_locations(rows, lambda row: row.product_id), _stock_report_item)
+
+        report = [_stock_report_item(item) for item in with_locations(rows[:limit], lambda row: row.product_id)]
+
+        # Totales generales sobre la misma consulta base, en una sola consulta agregada
+        count, total_quantity, grand_total = base_query.with_entities(
+            db.func.count(InventoryStock.id),
+            db.func.sum(InventoryStock.quantity),
+            db.func.sum(InventoryStock.quantity * Product.standard_price)
+        ).one()
 
-        return jsonify(report)
+        return jsonify({
+            "items": report,
+            "totals": {
+                "rows": count,
+                "quantity": float(total_quantity or 0.0),
+                "total_value": float(grand_total or 0.0)
+            },
+            "next_cursor": rows[limit - 1].id if len(rows) > limit else None
+        })
 
     except Exception as e:
         print(f"--- ERROR AL OBTENER REPORTE DE STOCK: {str(e)} ---")
@@ -275,72 +219,17 @@ def adjust_inventory_mass(payload):
     user_id = payload['sub']
 
     try:
-        df = pd.read_excel(file)
-
         # --- CAMBIO: Se añade 'Locacion' a las columnas esperadas ---
         expected_columns = ['SKU', 'Cantidad', 'Locacion']
-        if not all(col in df.columns for col in expected_columns):
-            return jsonify(error="El Excel debe tener las columnas: SKU, Cantidad, Locacion"), 400
-
-        updated_count = 0
-        errors = []
-
-        for index, row in df.iterrows():
-            sku = str(row['SKU']).strip()
-            try:
-                real_quantity = float(row['Cantidad'])
-                # --- CAMBIO: Se extrae la ubicación ---
-                location = str(row['Locacion']).strip() if pd.notna(row['Locacion']) else None
-            except (ValueError, TypeError):
-                errors.append(f"SKU {sku}: Cantidad inválida.")
-                continue
-
-            # 1. Buscar el producto
-            product = Product.query.filter_by(sku=sku).first()
-            if not product:
-                errors.append(f"SKU no encontrado: {sku}")
-                continue
-
-            # --- CAMBIO: Actualizar la ubicación del producto ---
-            if location:
-                product.location = location
-
-            # 2. Buscar (o crear) el registro de stock actual
-            stock_entry = InventoryStock.query.filter_by(
-                product_id=product.id,
-                warehouse_id=warehouse_id
-            ).first()
-
-            if not stock_entry:
-                stock_entry = InventoryStock(
-                    product_id=product.id,
-                    warehouse_id=warehouse_id,
-                    quantity=0.0
-                )
-                db.session.add(stock_entry)
-
-            current_qty = float(stock_entry.quantity)
-
-            # 3. Calcular la diferencia
-            difference = real_quantity - current_qty
-
-            if difference != 0:
-                # 4. Actualizar Stock
-                stock_entry.quantity = real_quantity
-
-                # 5. Crear Transacción (Kardex)
-                transaction = InventoryTransaction(
-                    product_id=product.id,
-                    warehouse_id=warehouse_id,
-                    quantity_change=difference,
-                    new_quantity=real_quantity,
-                    type="Carga Inicial / Ajuste",
-                    user_id=user_id
-                )
-                db.session.add(transaction)
-                updated_count += 1
+        # Lectura por streaming: solo se guardan en memoria las 3 columnas necesarias
+        with TabularReader(file, chunk_size=current_app.config['IMPORT_CHUNK_SIZE']) as reader:
+            if not all(col in reader.columns for col in expected_columns):
+                return jsonify(error="El Excel debe tener las columnas: SKU, Cantidad, Locacion"), 400
+            df = reader.read_frame(expected_columns)
 
-        db.session.commit()
+        # Resolución de SKUs, diferencias y escritura en bloque (ver services/stock_adjustment_service.py)
+        updated_count, errors = write_queue.run(adjust_stock_mass, df, warehouse_id, user_id)
+        cache.bump_version('products')  # Ubicaciones del catálogo
 
         return jsonify({
             "message": "Proceso completado",
@@ -349,45 +238,195 @@ def adjust_inventory_mass(payload):
         })
 
     except Exception as e:
-        db.session.rollback()
         print(f"--- ERROR CARGA MASIVA: {e} ---")
         return jsonify(error=str(e)), 500
 
 # --- API 5: Obtener Transacciones de Inventario (Kardex) ---
+KARDEX_MAX_LIMIT = 1000
+
+
+def _encode_kardex_cursor(timestamp, transaction_id):
+    raw = f"{timestamp.isoformat()}|{transaction_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_kardex_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    timestamp, transaction_id = raw.rsplit('|', 1)
+    return datetime.fromisoformat(timestamp), int(transaction_id)
+
+
+def _kardex_filters(query, args):
+    """Aplica los filtros del Kardex: product_id, warehouse_id, start_date y end_date."""
+    product_id = args.get('product_id')
+    warehouse_id = args.get('warehouse_id')
+    start_date = args.get('start_date')
+    end_date = args.get('end_date')
+
+    if product_id:
+        query = query.filter(InventoryTransaction.product_id == product_id)
+
+    if warehouse_id:
+        query = query.filter(InventoryTransaction.warehouse_id == warehouse_id)
+
+    if start_date:
+        query = query.filter(InventoryTransaction.timestamp >= start_date)
+
+    if end_date:
+        # Para que la fecha final sea inclusiva, se puede ajustar la lógica si es necesario
+        query = query.filter(InventoryTransaction.timestamp <= end_date)
+
+    return query
+
+
+def _kardex_item(row):
+    return {
+        'id': row.id,
+        'timestamp': row.timestamp.isoformat(),
+        'product_name': row.product_name or 'N/A',
+        'product_sku': row.product_sku or 'N/A',
+        'warehouse_name': row.warehouse_name or 'N/A',
+        'type': row.type,
+        'reference': row.reference,
+        'quantity_change': float(row.quantity_change),
+        'new_quantity': float(row.new_quantity)
+    }
+
+
 @inventory_api.route('/transactions', methods=['GET'], strict_slashes=False)
 @requires_auth(required_permission='view:inventory')
 def get_kardex_transactions(payload):
-    """Devuelve una lista de todas las transacciones de inventario (Kardex) con filtros."""
+    """
+    Devuelve las transacciones de inventario (Kardex), de la más reciente a la más antigua.
+    Filtros: ?product_id=, ?warehouse_id=, ?start_date=, ?end_date=
+    Paginación por cursor sobre (timestamp, id): ?limit=N&cursor=<next_cursor>.
+    Con 'limit' la respuesta es { items, next_cursor, total }; ?count=false omite el
+    total (evita contar millones de filas). Sin 'limit' se devuelve la lista completa.
+    """
     try:
-        # Construir la consulta base
-        query = InventoryTransaction.query.options(
-            joinedload(InventoryTransaction.product),
-            joinedload(InventoryTransaction.warehouse)
-        ).order_by(InventoryTransaction.timestamp.desc())
+        # Solo las columnas que se devuelven (los índices compuestos cubren filtros y orden)
+        query = db.session.query(
+            InventoryTransaction.id, InventoryTransaction.timestamp,
+            Product.name.label('product_name'), Product.sku.label('product_sku'),
+            Warehouse.name.label('warehouse_name'),
+            InventoryTransaction.type, InventoryTransaction.reference,
+            InventoryTransaction.quantity_change, InventoryTransaction.new_quantity
+        ).outerjoin(Product, InventoryTransaction.product_id == Product.id) \
+         .outerjoin(Warehouse, InventoryTransaction.warehouse_id == Warehouse.id)
 
         # Aplicar filtros desde los query params
-        product_id = request.args.get('product_id')
-        warehouse_id = request.args.get('warehouse_id')
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
+        query = _kardex_filters(query, request.args)
+
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
+        with_count = request.args.get('count', 'true').lower() not in ('false', '0', 'no')
+
+        page_query = query.order_by(InventoryTransaction.timestamp.desc(), InventoryTransaction.id.desc())
+        if limit:
+            limit = max(1, min(limit, KARDEX_MAX_LIMIT))
+            if cursor:
+                try:
+                    cursor_ts, cursor_id = _decode_kardex_cursor(cursor)
+                except (ValueError, UnicodeDecodeError, binascii.Error):
+                    return jsonify(error="Cursor inválido"), 400
+                page_query = page_query.filter(
+                    tuple_(InventoryTransaction.timestamp, InventoryTransaction.id) < tuple_(cursor_ts, cursor_id)
+                )
+            rows = page_query.limit(limit + 1).all()
+        else:
+            # Lista completa: se recorre con cursor del servidor y se escribe por partes
+            return json_array_response(stream_rows(page_query), _kardex_item)
+
+        items = [_kardex_item(row) for row in rows[:limit]]
+
+        response = {
+            'items': items,
+            'next_cursor': _encode_kardex_cursor(rows[limit - 1].timestamp, rows[limit - 1].id)
+            if len(rows) > limit else None
+        }
+        if with_count:
+            count_query = db.session.query(db.func.count(InventoryTransaction.id))
+            response['total'] = _kardex_filters(count_query, request.args).scalar()
+        return jsonify(response)
+
+    except Exception as e:
+        print(f"--- ERROR OBTENIENDO KARDEX: {e} ---")
+        return jsonify(error=str(e)), 500
+
+
+# --- API 6: Stock a una fecha (cierre más cercano + movimientos posteriores) ---
+@inventory_api.route('/stock-as-of', methods=['GET'], strict_slashes=False)
+@requires_auth(required_permission='view:inventory')
+def get_stock_as_of(payload):
+    """
+    Stock por producto y almacén al cierre de ?date=AAAA-MM-DD.
+    Filtros opcionales: ?product_id=, ?warehouse_id=
+    """
+    date_param = request.args.get('date')
+    if not date_param:
+        return jsonify(error="El parámetro 'date' es requerido (AAAA-MM-DD)"), 400
 
-        if product_id:
-            query = query.filter(InventoryTransaction.product_id == product_id)
-        
-        if warehouse_id:
-            query = query.filter(InventoryTransaction.warehouse_id == warehouse_id)
+    try:
+        day = datetime.strptime(date_param, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify(error="Fecha inválida, use el formato AAAA-MM-DD"), 400
 
-        if start_date:
-            query = query.filter(InventoryTransaction.timestamp >= start_date)
+    try:
+        balances = kardex_snapshot_service.stock_as_of(
+            day,
+            product_id=request.args.get('product_id', type=int),
+            warehouse_id=request.args.get('warehouse_id', type=int)
+        )
+        balances = {key: qty for key, qty in balances.items() if qty != 0}
+
+        product_ids = {pid for pid, _ in balances}
+        warehouse_ids = {wid for _, wid in balances}
+        products = {
+            row.id: row for row in db.session.query(Product.id, Product.sku, Product.name)
+            .filter(Product.id.in_(product_ids)).all()
+        } if product_ids else {}
+        warehouses = dict(
+            db.session.query(Warehouse.id, Warehouse.name).filter(Warehouse.id.in_(warehouse_ids)).all()
+        ) if warehouse_ids else {}
+
+        items = []
+        for (pid, wid), quantity in sorted(balances.items()):
+            product = products.get(pid)
+            items.append({
+                'product_id': pid,
+                'product_sku': product.sku if product else 'N/A',
+                'product_name': product.name if product else 'N/A',
+                'warehouse_id': wid,
+                'warehouse_name': warehouses.get(wid, 'N/A'),
+                'quantity': quantity
+            })
 
-        if end_date:
-            # Para que la fecha final sea inclusiva, se puede ajustar la lógica si es necesario
-            query = query.filter(InventoryTransaction.timestamp <= end_date)
+        return jsonify({'date': day.isoformat(), 'items': items})
+
+    except Exception as e:
+        print(f"--- ERROR OBTENIENDO STOCK A FECHA: {e} ---")
+        return jsonify(error=str(e)), 500
 
-        transactions = query.all()
 
-        return jsonify([t.to_dict() for t in transactions])
+# --- API 7: Cierre mensual del Kardex ---
+@inventory_api.route('/periods/close', methods=['POST'], strict_slashes=False)
+@requires_auth(required_permission='manage:inventory')
+def close_kardex_period(payload):
+    """Genera los saldos de cierre de un mes. Espera: { "period": "2026-09" }"""
+    data = request.get_json() or {}
+    try:
+        period = kardex_snapshot_service.parse_period(data.get('period', ''))
+    except ValueError:
+        return jsonify(error="El campo 'period' es requerido (AAAA-MM)"), 400
 
+    try:
+        count = kardex_snapshot_service.close_period(period)
+        db.session.commit()
+        return jsonify(success=True, period=f"{period:%Y-%m}", balances=count)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify(error=str(e)), 400
     except Exception as e:
-        print(f"--- ERROR OBTENIENDO KARDEX: {e} ---")
-        return jsonify(error=str(e)), 500
\ No newline at end of file
+        db.session.rollback()
+        print(f"--- ERROR AL CERRAR PERIODO: {e} ---")
+        return jsonify(error=str(e)), 500
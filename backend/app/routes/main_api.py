@@ -1,6 +1,5 @@
 from flask import Blueprint, jsonify
-from ..services.auth_service import requires_auth, AUTH0_NAMESPACE
-from ..models.role import Role
+from ..services.auth_service import requires_auth, get_permissions_for_roles, AUTH0_NAMESPACE
 
 main_api = Blueprint('main_api', __name__)
 
@@ -38,16 +37,10 @@ def get_my_permissions(payload):
 
         auth0_roles = payload[roles_key]
 
-        # 2. Buscar esos roles en nuestra BD
-        user_roles_in_db = Role.query.filter(Role.name.in_(auth0_roles)).all()
+        # 2. Obtener sus permisos (misma caché que usa requires_auth)
+        all_permissions = get_permissions_for_roles(auth0_roles)
 
-        # 3. Juntar todos sus permisos en una sola lista
-        all_permissions = set()
-        for role in user_roles_in_db:
-            for perm in role.permissions:
-                all_permissions.add(perm.name)
-
-        # 4. Devolver la lista
+        # 3. Devolver la lista
         return jsonify(permissions=list(all_permissions))
 
     except Exception as e:
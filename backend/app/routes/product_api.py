@@ -1,13 +1,32 @@
-from flask import Blueprint, jsonify, request, send_file
+from flask import Blueprint, jsonify, request, current_app
 from ..models.product_catalog import Product, Category # <-- Importa Category
-from ..extensions import db # <-- Importa db
+from ..extensions import db, cache, autocomplete # <-- Importa db
 from ..services.auth_service import requires_auth
-from sqlalchemy import or_
-import pandas as pd
-import io
+from ..services.tabular_reader import TabularReader
+from ..services.streaming import stream_rows, json_array_response, csv_response, xlsx_response
+from ..services import product_search_service, product_location_service, product_import_service, sku_sequence_service
+from ..services import catalog_change_service, category_tree_service
+from ..services.autocomplete_service import SEARCH_NAMESPACE
+from sqlalchemy import tuple_
+import base64
+import binascii
 
 product_api = Blueprint('product_api', __name__)
 
+
+def _catalog_changed(upserted=(), removed=()):
+    """
+    Después del commit: nueva versión del catálogo (ETag del listado) y el índice de
+    autocompletado al día.
+    upserted: (id, sku, nombre) de los productos creados/modificados; removed: ids borrados.
+    """
+    cache.bump_version('products')
+    version = cache.bump_version(SEARCH_NAMESPACE)
+    if removed:
+        autocomplete.remove(removed, version)
+    if upserted:
+        autocomplete.upsert(upserted, version)
+
 # --- API 1: Buscar Productos ---
 @product_api.route('/search')
 @requires_auth(required_permission='view:catalog') # Usamos el permiso de catálogo
@@ -21,13 +40,8 @@ def search_products(payload):
         return jsonify([]) # Devuelve vacío si no hay búsqueda
 
     try:
-        search_term = f"%{query.lower()}%"
-        products = Product.query.filter(
-            or_(
-                db.func.lower(Product.name).like(search_term),
-                db.func.lower(Product.sku).like(search_term)
-            )
-        ).limit(20).all() # Limita a 20 resultados
+        # Índice de búsqueda (FTS5 / trigramas), ordenado por relevancia; máx. 20 resultados
+        products = product_search_service.search_products(query, limit=20)
 
         return jsonify([p.to_dict() for p in products])
 
@@ -35,15 +49,128 @@ def search_products(payload):
         return jsonify(error=str(e)), 500
 
 # --- API 2: Obtener TODOS los productos ---
+PRODUCTS_MAX_LIMIT = 1000
+
+# Campo del JSON -> (columna, conversión). Mismo formato que Product.to_dict()
+_PRODUCT_FIELDS = {
+    'id': (Product.id, None),
+    'sku': (Product.sku, None),
+    'name': (Product.name, None),
+    'unit_of_measure': (Product.unit_of_measure, None),
+    'standard_price': (Product.standard_price, float),
+    'location': (None, None),  # Tabla product_locations: una consulta por lote de productos
+    'category_name': (Category.name.label('category_name'), lambda value: value or 'N/A'),
+    'category_id': (Product.category_id, None),
+}
+
+
+def _catalog_etag():
+    """
+    ETag del listado: la versión del catálogo (último id de catalog_changes), que cambia
+    con cada cambio de productos o de categorías. Sale de la BD y no de los contadores
+    de la caché, así no vuelve a un valor ya usado si la caché se reinicia.
+    """
+    return f"catalog-{catalog_change_service.current_version()}"
+
+
+def _product_listing(fields):
+    """
+    Consulta del listado con solo las columnas de 'fields' (más name/id para el orden) y
+    la categoría en el mismo JOIN. Devuelve (query, with_locations, serialize):
+    serialize(entry) recibe cada elemento de with_locations(filas).
+    """
+    columns = {'id': Product.id, 'name': Product.name}
+    columns.update({f: _PRODUCT_FIELDS[f][0] for f in fields if _PRODUCT_FIELDS[f][0] is not None})
+    query = db.session.query(*columns.values())
+    if 'category_name' in fields:
+        query = query.outerjoin(Category, Product.category_id == Category.id)
+    query = query.order_by(Product.name, Product.id)
+
+    converters = [(field, _PRODUCT_FIELDS[field][1]) for field in fields if field != 'location']
+
+    def with_locations(rows):
+        if 'location' not in fields:
+            return ((row, None) for row in rows)
+        return product_location_service.with_locations(rows, lambda row: row.id)
+
+    def serialize(entry):
+        row, locations = entry
+        item = {field: convert(getattr(row, field)) if convert else getattr(row, field)
+                for field, convert in converters}
+        if locations is not None:
+            item['location'] = product_location_service.codes_in(locations)
+        return item
+
+    return query, with_locations, serialize
+
+
+def _encode_product_cursor(name, product_id):
+    raw = f"{name}|{product_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_product_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    name, product_id = raw.rsplit('|', 1)
+    return name, int(product_id)
+
+
 @product_api.route('/', strict_slashes=False)
 @requires_auth(required_permission='view:catalog')
 def get_all_products(payload):
-    """Devuelve una lista de todos los productos."""
-    try:
-        products = Product.query.order_by(Product.name).all()
-        return jsonify([p.to_dict() for p in products])
-    except Exception as e:
-        return jsonify(error=str(e)), 500
+    """
+    Devuelve los productos ordenados por nombre.
+    ?fields=id,sku,name -> solo esos campos (por defecto, todos los de Product.to_dict()).
+    ?category_id=N -> solo esa categoría; con &include_subcategories=true, también todas
+    sus subcategorías (tabla de clausura, un solo IN).
+    Paginación por cursor sobre (name, id): ?limit=N&cursor=<next_cursor>. Con 'limit'
+    la respuesta es { items, next_cursor }; sin 'limit' se mantiene la lista completa.
+    Responde con ETag: si el catálogo no cambió (If-None-Match) devuelve 304 con una sola
+    consulta (la versión del catálogo, por su clave primaria).
+    """
+    # La versión se lee antes de consultar: un cambio a mitad de camino deja un ETag viejo, nunca uno adelantado
+    etag = _catalog_etag()
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        try:
+            fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()] or list(_PRODUCT_FIELDS)
+            unknown = [f for f in fields if f not in _PRODUCT_FIELDS]
+            if unknown:
+                return jsonify(error=f"Campos desconocidos: {', '.join(unknown)}"), 400
+
+            query, with_locations, serialize = _product_listing(fields)
+            category_id = request.args.get('category_id', type=int)
+            if category_id:
+                subtree = request.args.get('include_subcategories', 'false').lower() in ('true', '1', 'yes')
+                query = query.filter(category_tree_service.in_category(Product.category_id, category_id, subtree))
+
+            limit = request.args.get('limit', type=int)
+            cursor = request.args.get('cursor')
+            if limit:
+                limit = max(1, min(limit, PRODUCTS_MAX_LIMIT))
+                if cursor:
+                    try:
+                        cursor_name, cursor_id = _decode_product_cursor(cursor)
+                    except (ValueError, UnicodeDecodeError, binascii.Error):
+                        return jsonify(error="Cursor inválido"), 400
+                    query = query.filter(tuple_(Product.name, Product.id) > tuple_(cursor_name, cursor_id))
+                rows = query.limit(limit + 1).all()
+                response = jsonify({
+                    'items': [serialize(entry) for entry in with_locations(rows[:limit])],
+                    'next_cursor': _encode_product_cursor(rows[limit - 1].name, rows[limit - 1].id)
+                    if len(rows) > limit else None
+                })
+            else:
+                # Lista completa: se recorre con cursor del servidor y se escribe por partes
+                response = json_array_response(with_locations(stream_rows(query)), serialize)
+        except Exception as e:
+            return jsonify(error=str(e)), 500
+
+    # El navegador guarda la respuesta y la revalida siempre con If-None-Match
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 
 # --- API 3: Crear un nuevo Producto ---
@@ -55,21 +182,30 @@ def create_product(payload):
         return jsonify(error="SKU, Nombre y Categoría son requeridos"), 400
 
     try:
-        # Procesa las ubicaciones: convierte lista a string
+        # Ubicaciones: la lista va a la tabla product_locations
         locations_list = data.get('location', [])
-        location_str = ', '.join(locations_list) if isinstance(locations_list, list) else None
+
+        # Un SKU que es solo un prefijo ("CEL") se completa con el siguiente número (CEL-004)
+        sku = data['sku']
+        if sku_sequence_service.is_prefix(str(sku).strip()):
+            sku = sku_sequence_service.generate(str(sku).strip())[0]
+        else:
+            sku_sequence_service.observe([sku])
 
         new_prod = Product(
-            sku=data['sku'],
+            sku=sku,
             name=data['name'],
             description=data.get('description', ''),
             unit_of_measure=data.get('um', 'UND'),
             standard_price=data.get('standard_price', 0.00),
-            category_id=data['category_id'],
-            location=location_str # Guarda el string
+            category_id=data['category_id']
         )
+        product_location_service.set_codes(new_prod, locations_list if isinstance(locations_list, list) else [])
         db.session.add(new_prod)
+        db.session.flush()
+        catalog_change_service.record(catalog_change_service.PRODUCT, [new_prod.id])
         db.session.commit()
+        _catalog_changed(upserted=[(new_prod.id, new_prod.sku, new_prod.name)])
         return jsonify(new_prod.to_dict()), 201
 
     except Exception as e:
@@ -85,6 +221,7 @@ def update_product(product_id, payload):
 
     try:
         prod.sku = data.get('sku', prod.sku)
+        sku_sequence_service.observe([prod.sku])
         prod.name = data.get('name', prod.name)
         prod.description = data.get('description', prod.description)
         prod.unit_of_measure = data.get('um', prod.unit_of_measure)
@@ -94,9 +231,11 @@ def update_product(product_id, payload):
         # Procesa las ubicaciones si se envían
         if 'location' in data:
             locations_list = data.get('location', [])
-            prod.location = ', '.join(locations_list) if isinstance(locations_list, list) else None
+            product_location_service.set_codes(prod, locations_list if isinstance(locations_list, list) else [])
 
+        catalog_change_service.record(catalog_change_service.PRODUCT, [prod.id])
         db.session.commit()
+        _catalog_changed(upserted=[(prod.id, prod.sku, prod.name)])
         return jsonify(prod.to_dict())
     except Exception as e:
         db.session.rollback()
@@ -104,6 +243,14 @@ def update_product(product_id, payload):
 
 
 # --- API 5: Importación Masiva desde Excel ---
+IMPORT_PROGRESS_TTL = 3600
+
+
+def _import_progress(key, status, importer):
+    cache.set(key, {"status": status, "rows": importer.rows,
+                    "created": importer.created, "updated": importer.updated}, IMPORT_PROGRESS_TTL)
+
+
 @product_api.route('/import', methods=['POST'], strict_slashes=False)
 @requires_auth(required_permission='manage:catalog')
 def import_products(payload):
@@ -115,78 +262,40 @@ def import_products(payload):
         return jsonify(error="No se seleccionó ningún archivo"), 400
 
     try:
-        # 1. Leer el Excel con Pandas
-        df = pd.read_excel(file)
+        # 1. Leer el archivo por streaming (Excel o CSV), en bloques de filas
+        reader = TabularReader(file, chunk_size=current_app.config['IMPORT_CHUNK_SIZE'])
 
         # 2. Validar columnas requeridas
-        required_columns = ['SKU', 'Nombre', 'Categoria'] # (UM, Descripcion y Precio son opcionales)
-        if not all(col in df.columns for col in required_columns):
+        required_columns = product_import_service.REQUIRED_COLUMNS
+        if not all(col in reader.columns for col in required_columns):
+            reader.close()
             return jsonify(error=f"El Excel debe tener las columnas: {', '.join(required_columns)}"), 400
 
-        prefix_counters = {} # Diccionario para contar prefijos
-        created_count = 0
-        updated_count = 0
-        errors = []
-
-        # 3. Iterar sobre cada fila
-        for index, row in df.iterrows():
-            sku_input = str(row['SKU']).strip()
-            name = str(row['Nombre']).strip()
-            cat_name = str(row['Categoria']).strip()
-
-            # Lógica de generación de SKU
-            # Si el SKU es alfabético y en mayúsculas, trátalo como prefijo
-            if sku_input.isalpha() and sku_input.isupper():
-                prefix = sku_input
-                # Obtiene el siguiente número para este prefijo, o empieza en 1
-                count = prefix_counters.get(prefix, 0) + 1
-                prefix_counters[prefix] = count
-                # Genera el nuevo SKU con formato de 3 dígitos (e.g., CEL-001)
-                sku = f"{prefix}-{count:03d}"
-            else:
-                sku = sku_input # Usa el SKU tal como está
-
-            # Buscar la categoría por nombre
-            category = Category.query.filter(db.func.lower(Category.name) == cat_name.lower()).first()
-            if not category:
-                # Si no existe, la creamos automáticamente
-                category = Category(name=cat_name, description="Creada por importación")
-                db.session.add(category)
-                db.session.flush() # Para obtener el ID inmediatamente
-
-            # Buscar si el producto ya existe (por SKU)
-            product = Product.query.filter_by(sku=sku).first()
-
-            if product:
-                # ACTUALIZAR existente
-                product.name = name
-                product.category_id = category.id
-                if 'Descripcion' in row and pd.notna(row['Descripcion']):
-                    product.description = str(row['Descripcion'])
-                if 'UM' in row and pd.notna(row['UM']):
-                    product.unit_of_measure = str(row['UM'])
-                if 'Precio' in row and pd.notna(row['Precio']):
-                    product.standard_price = float(row['Precio'])
-                updated_count += 1
-            else:
-                # CREAR nuevo
-                new_prod = Product(
-                    sku=sku,
-                    name=name,
-                    category_id=category.id,
-                    description=str(row['Descripcion']) if 'Descripcion' in row and pd.notna(row['Descripcion']) else '',
-                    unit_of_measure=str(row['UM']) if 'UM' in row and pd.notna(row['UM']) else 'UND',
-                    standard_price=float(row['Precio']) if 'Precio' in row and pd.notna(row['Precio']) else 0.00
-                )
-                db.session.add(new_prod)
-                created_count += 1
-
-        db.session.commit()
-
+        # 3. Cada bloque se resuelve por conjuntos y se confirma por separado
+        #    (ver services/product_import_service.py)
+        importer = product_import_service.ProductImport()
+        progress_key = f"product_import:{payload['sub']}"
+        try:
+            with reader:
+                for chunk in reader.iter_chunks(product_import_service.IMPORT_COLUMNS):
+                    categories_before = importer.categories_created
+                    changed = importer.apply(chunk)
+                    db.session.commit()
+                    _catalog_changed(upserted=changed)
+                    if importer.categories_created > categories_before:
+                        cache.bump_version('categories')
+                    _import_progress(progress_key, "running", importer)
+                    print(f"--- Importación de productos: {importer.rows} filas "
+                          f"({importer.created} creados, {importer.updated} actualizados) ---")
+        except Exception:
+            _import_progress(progress_key, "error", importer)
+            raise
+
+        _import_progress(progress_key, "done", importer)
         return jsonify({
             "message": "Importación completada",
-            "created": created_count,
-            "updated": updated_count
+            "created": importer.created,
+            "updated": importer.updated
         })
 
     except Exception as e:
@@ -194,6 +303,21 @@ def import_products(payload):
         print(f"--- ERROR EN IMPORTACIÓN: {e} ---")
         return jsonify(error=f"Error al procesar el archivo: {str(e)}"), 500
 
+
+@product_api.route('/import/progress', methods=['GET'])
+@requires_auth(required_permission='manage:catalog')
+def get_import_progress(payload):
+    """
+    Avance de la última importación del usuario (se consulta mientras corre /import):
+    { status: running|done|error, rows, created, updated }.
+    Los bloques ya informados quedaron confirmados aunque la importación falle después.
+    """
+    progress = cache.get(f"product_import:{payload['sub']}")
+    if progress is None:
+        return jsonify(error="No hay una importación reciente"), 404
+    return jsonify(progress)
+
+
 # --- API 6: Eliminar un Producto ---
 @product_api.route('/<int:product_id>', methods=['DELETE'])
 @requires_auth(required_permission='manage:catalog')
@@ -201,49 +325,121 @@ def delete_product(product_id, payload):
     prod = Product.query.get_or_404(product_id)
     try:
         db.session.delete(prod)
+        catalog_change_service.record(catalog_change_service.PRODUCT, [product_id])
         db.session.commit()
+        _catalog_changed(removed=[product_id])
         return jsonify(message="Producto eliminado correctamente"), 200
     except Exception as e:
         db.session.rollback()
         return jsonify(error=str(e)), 500
 
 # --- API 7: Exportar Productos a Excel ---
+EXPORT_COLUMNS = ['SKU', 'Nombre', 'Categoria', 'Descripcion', 'UM', 'Precio'] # Las mismas que lee /import
+
+
 @product_api.route('/export', methods=['GET'])
 @requires_auth(required_permission='view:catalog')
 def export_products(payload):
     """
-    Exporta todos los productos a un archivo Excel.
+    Exporta todos los productos a un archivo Excel (o CSV con ?format=csv).
+    El archivo se escribe y se envía por partes mientras se leen los productos:
+    la memoria usada no depende del tamaño del catálogo.
     """
+    export_format = request.args.get('format', 'xlsx').lower()
+    if export_format not in ('xlsx', 'csv'):
+        return jsonify(error="Formato no soportado (xlsx o csv)"), 400
+
     try:
-        products = Product.query.order_by(Product.name).all()
-
-        # Prepara los datos para el DataFrame
-        data = []
-        for p in products:
-            data.append({
-                'SKU': p.sku,
-                'Nombre': p.name,
-                'Categoria': p.category.name if p.category else '',
-                'Descripcion': p.description,
-                'UM': p.unit_of_measure,
-                'Precio': p.standard_price
-            })
-
-        df = pd.DataFrame(data)
-
-        # Crea un archivo Excel en memoria
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Productos')
-        output.seek(0)
-
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name='productos.xlsx'
+        # Solo las columnas del archivo, con la categoría en el mismo JOIN,
+        # leídas por lotes con cursor del servidor
+        rows = stream_rows(
+            db.session.query(
+                Product.sku, Product.name, Category.name.label('category_name'),
+                Product.description, Product.unit_of_measure, Product.standard_price
+            ).outerjoin(Category, Product.category_id == Category.id)
+            .order_by(Product.name, Product.id)
         )
+        values = ([row.sku, row.name, row.category_name or '', row.description, row.unit_of_measure,
+                   float(row.standard_price) if row.standard_price is not None else None]
+                  for row in rows)
+
+        if export_format == 'csv':
+            return csv_response(EXPORT_COLUMNS, values, 'productos.csv')
+        return xlsx_response(EXPORT_COLUMNS, values, 'productos.xlsx', sheet_name='Productos')
 
     except Exception as e:
         print(f"--- ERROR EN EXPORTACIÓN: {e} ---")
         return jsonify(error=f"Error al exportar el archivo: {str(e)}"), 500
+
+# --- API 8: Productos en una ubicación ---
+@product_api.route('/by-location', methods=['GET'])
+@requires_auth(required_permission='view:catalog')
+def get_products_by_location(payload):
+    """
+    ¿Qué hay en el estante A1-B2? -> /api/products/by-location?code=A1-B2&warehouse_id=1
+    Con warehouse_id se incluyen también las ubicaciones sin almacén asignado.
+    Usa el índice (code, warehouse_id) de product_locations.
+    """
+    code = request.args.get('code', '').strip()
+    if not code:
+        return jsonify(error="Falta el parámetro 'code'"), 400
+
+    try:
+        products = product_location_service.products_at(code, request.args.get('warehouse_id', type=int)).all()
+        return jsonify([p.to_dict() for p in products])
+    except Exception as e:
+        return jsonify(error=str(e)), 500
+
+# --- API 9: Sincronización del catálogo por versiones ---
+@product_api.route('/changes', methods=['GET'])
+@requires_auth(required_permission='view:catalog')
+def get_catalog_changes(payload):
+    """
+    Lo que cambió en productos y categorías desde la versión que guardó el cliente:
+    /api/products/changes?since=<version>
+    { version, full: false, products: {upserted, deleted}, categories: {upserted, deleted} }
+    Los productos van con el formato del listado (/api/products) y las categorías con el
+    de /api/categories; 'deleted' son ids. Sin 'since', con un registro ya podado o con
+    demasiados cambios, responde el catálogo completo con full: true (el cliente reemplaza
+    todo). En ambos casos el cliente guarda 'version' para la próxima llamada.
+    """
+    try:
+        since = int(request.args.get('since') or 0)
+    except ValueError:
+        return jsonify(error="'since' debe ser un número de versión"), 400
+
+    try:
+        # La versión se lee antes que los datos: lo que cambie mientras tanto vuelve a llegar la próxima vez
+        version = catalog_change_service.current_version()
+        changed = catalog_change_service.changes_since(since, current_app.config.get('CATALOG_SYNC_MAX_CHANGES', 5000))
+        query, with_locations, serialize = _product_listing(list(_PRODUCT_FIELDS))
+
+        if changed is None:
+            categories = [c.to_dict() for c in Category.query.order_by(Category.name).all()]
+            dumps = current_app.json.dumps
+            before = (f'{{"version":{version},"full":true,'
+                      f'"categories":{{"upserted":{dumps(categories, separators=(",", ":"))},"deleted":[]}},'
+                      f'"products":{{"deleted":[],"upserted":')
+            return json_array_response(with_locations(stream_rows(query)), serialize, before=before, after='}}')
+
+        # Se leen con una subconsulta del registro (sin listas de ids en el IN);
+        # lo que ya no existe se informa como borrado
+        products = [serialize(entry) for entry in with_locations(query.filter(
+            Product.id.in_(catalog_change_service.changed_ids(catalog_change_service.PRODUCT, since))).all())]
+        categories = [c.to_dict() for c in Category.query.filter(
+            Category.id.in_(catalog_change_service.changed_ids(catalog_change_service.CATEGORY, since))
+        ).order_by(Category.name).all()]
+        return jsonify({
+            'version': version,
+            'full': False,
+            'products': {
+                'upserted': products,
+                'deleted': sorted(changed[catalog_change_service.PRODUCT] - {p['id'] for p in products})
+            },
+            'categories': {
+                'upserted': categories,
+                'deleted': sorted(changed[catalog_change_service.CATEGORY] - {c['id'] for c in categories})
+            }
+        })
+    except Exception as e:
+        return jsonify(error=str(e)), 500
@@ -1,12 +1,13 @@
 from flask import Blueprint, jsonify, request
-from ..extensions import db
+from ..extensions import db, write_queue
 from sqlalchemy.orm import joinedload
 from ..services.auth_service import requires_auth
+from ..services import stock_service, stock_totals_service
 from datetime import datetime
 
 # Importamos TODOS los modelos que necesitamos
 from ..models.stock_transfer import StockTransfer, StockTransferItem
-from ..models.inventory_models import InventoryStock, InventoryTransaction
+from ..models.inventory_models import InventoryTransaction
 from ..models.product_catalog import Product
 from ..models.warehouse import Warehouse
 
@@ -28,6 +29,85 @@ def get_transfers(payload):
         return jsonify(error=str(e)), 500
 
 
+# --- Trabajo de escritura: crea la transferencia y mueve el stock (sin commit) ---
+def _create_transfer_job(transfer_data, user_id):
+    # --- 1. Lógica de Inventario y Base de Datos ---
+    new_transfer = StockTransfer(
+        user_id=user_id,
+        origin_warehouse_id=transfer_data['origin_warehouse_id'],  # <-- Usamos transfer_data
+        destination_warehouse_id=transfer_data.get('destination_warehouse_id'),  # <-- Usamos transfer_data
+        destination_external_address=transfer_data.get('destination_external_address'),  # <-- Usamos transfer_data
+        status="Completada",  # Es instantáneo
+        transfer_date=datetime.now()
+    )
+    db.session.add(new_transfer)
+
+    # 1.2 Crear los items
+    origin_warehouse_id = transfer_data['origin_warehouse_id']
+    destination_warehouse_id = new_transfer.destination_warehouse_id
+    lines = []  # (product_id, cantidad) en el orden de los items
+    products = {}
+    for item_data in transfer_data['items']:  # <-- Usamos transfer_data
+        product_id = item_data['product_id']
+        quantity = float(item_data['quantity'])
+
+        if quantity <= 0:
+            raise ValueError("La cantidad debe ser mayor a 0.")
+
+        # Verificamos que el producto exista
+        product = Product.query.get(product_id)
+        if not product:
+            raise ValueError(f"Producto ID {product_id} no encontrado.")
+        products[product_id] = product
+
+        new_item = StockTransferItem(
+            transfer=new_transfer,
+            product_id=product_id,
+            quantity=quantity
+        )
+        db.session.add(new_item)
+        lines.append((product_id, quantity))
+
+    # --- Lógica de Stock (Salida): UPDATE condicional en la BD ---
+    try:
+        origin_balances = stock_service.remove_lines(origin_warehouse_id, lines)
+    except stock_service.InsufficientStockError as e:
+        raise ValueError(f"Stock insuficiente para {products[e.product_id].name} en el almacén de origen.")
+
+    # --- Lógica de Stock (Entrada) ---
+    destination_balances = stock_service.add_lines(destination_warehouse_id, lines) \
+        if destination_warehouse_id else None
+
+    total_deltas = {}  # Cambio neto del stock total por producto
+    for index, (product_id, quantity) in enumerate(lines):
+        db.session.add(InventoryTransaction(
+            product_id=product_id,
+            warehouse_id=origin_warehouse_id,
+            quantity_change=-quantity,
+            new_quantity=origin_balances[index],
+            type="Transferencia Salida",
+            user_id=user_id
+        ))
+
+        if destination_balances is not None:
+            db.session.add(InventoryTransaction(
+                product_id=product_id,
+                warehouse_id=destination_warehouse_id,
+                quantity_change=quantity,
+                new_quantity=destination_balances[index],
+                type="Transferencia Entrada",
+                user_id=user_id
+            ))
+        else:
+            # Destino externo: el stock sale de la empresa
+            total_deltas[product_id] = total_deltas.get(product_id, 0.0) - quantity
+
+    stock_totals_service.apply_deltas(total_deltas)
+
+    db.session.flush()
+    return new_transfer.id
+
+
 # --- RUTA 2: Crear una nueva transferencia (SIN GRE) ---
 @transfer_api.route('/', methods=['POST'], strict_slashes=False)
 @requires_auth(required_permission='manage:transfers')
@@ -47,92 +127,15 @@ def create_transfer(payload):
     # --- FIN DE LA CORRECCIÓN ---
 
     try:
-        # --- 1. Lógica de Inventario y Base de Datos ---
-        new_transfer = StockTransfer(
-            user_id=user_id,
-            origin_warehouse_id=transfer_data['origin_warehouse_id'],  # <-- Usamos transfer_data
-            destination_warehouse_id=transfer_data.get('destination_warehouse_id'),  # <-- Usamos transfer_data
-            destination_external_address=transfer_data.get('destination_external_address'),  # <-- Usamos transfer_data
-            status="Completada",  # Es instantáneo
-            transfer_date=datetime.now()
-        )
-        db.session.add(new_transfer)
+        # La cola de escritura ejecuta el trabajo y guarda todo en un commit
+        transfer_id = write_queue.run(_create_transfer_job, transfer_data, user_id)
 
-        # 1.2 Crear los items y mover el stock
-        for item_data in transfer_data['items']:  # <-- Usamos transfer_data
-            product_id = item_data['product_id']
-            quantity = float(item_data['quantity'])
+        print(f"--- Transferencia ID {transfer_id} creada. ---")
 
-            if quantity <= 0:
-                raise ValueError("La cantidad debe ser mayor a 0.")
-
-            # Verificamos que el producto exista
-            product = Product.query.get(product_id)
-            if not product:
-                raise ValueError(f"Producto ID {product_id} no encontrado.")
-
-            new_item = StockTransferItem(
-                transfer=new_transfer,
-                product_id=product_id,
-                quantity=quantity
-            )
-            db.session.add(new_item)
-
-            # --- Lógica de Stock (Salida) ---
-            stock_origen = InventoryStock.query.filter_by(
-                product_id=product_id,
-                warehouse_id=transfer_data['origin_warehouse_id']
-            ).first()
-
-            if not stock_origen or float(stock_origen.quantity) < quantity:
-                raise ValueError(f"Stock insuficiente para {product.name} en el almacén de origen.")
-
-            stock_origen.quantity = float(stock_origen.quantity) - quantity
-
-            trans_salida = InventoryTransaction(
-                product_id=product_id,
-                warehouse_id=transfer_data['origin_warehouse_id'],
-                quantity_change=-quantity,
-                new_quantity=stock_origen.quantity,
-                type="Transferencia Salida",
-                user_id=user_id
-            )
-            db.session.add(trans_salida)
-
-            # --- Lógica de Stock (Entrada) ---
-            if new_transfer.destination_warehouse_id:
-                stock_destino = InventoryStock.query.filter_by(
-                    product_id=product_id,
-                    warehouse_id=new_transfer.destination_warehouse_id
-                ).first()
-
-                if not stock_destino:
-                    stock_destino = InventoryStock(product_id=product_id,
-                                                   warehouse_id=new_transfer.destination_warehouse_id, quantity=0.0)
-                    db.session.add(stock_destino)
-
-                stock_destino.quantity = float(stock_destino.quantity) + quantity
-
-                trans_entrada = InventoryTransaction(
-                    product_id=product_id,
-                    warehouse_id=new_transfer.destination_warehouse_id,
-                    quantity_change=quantity,
-                    new_quantity=stock_destino.quantity,
-                    type="Transferencia Entrada",
-                    user_id=user_id
-                )
-                db.session.add(trans_entrada)
-
-        # 1.3 Guardar todo
-        db.session.commit()
-
-        print(f"--- Transferencia ID {new_transfer.id} creada. ---")
-
-        db.session.refresh(new_transfer)
+        new_transfer = db.session.get(StockTransfer, transfer_id)
         return jsonify(new_transfer.to_dict()), 201
 
     except Exception as e:
-        db.session.rollback()
         print(f"--- ERROR AL CREAR TRANSFERENCIA: {str(e)} ---")
         return jsonify(error=str(e)), 500
 
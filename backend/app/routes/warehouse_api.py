@@ -1,5 +1,5 @@
 from flask import Blueprint, jsonify, request
-from ..extensions import db
+from ..extensions import db, cache
 from ..models.warehouse import Warehouse
 from ..services.auth_service import requires_auth
 
@@ -11,8 +11,11 @@ warehouse_api = Blueprint('warehouse_api', __name__)
 def get_warehouses(payload):
     """Devuelve una lista de todos los almacenes."""
     try:
-        warehouses = Warehouse.query.order_by(Warehouse.name).all()
-        return jsonify([w.to_dict() for w in warehouses])
+        # Se sirve desde la caché compartida hasta que alguna escritura suba la versión
+        data = cache.remember('warehouses', 'list', lambda: [
+            w.to_dict() for w in Warehouse.query.order_by(Warehouse.name).all()
+        ])
+        return jsonify(data)
     except Exception as e:
         return jsonify(error=str(e)), 500
 
@@ -33,6 +36,7 @@ def create_warehouse(payload):
         )
         db.session.add(new_wh)
         db.session.commit()
+        cache.bump_version('warehouses')
         return jsonify(new_wh.to_dict()), 201
 
     except Exception as e:
@@ -53,6 +57,7 @@ def update_warehouse(wh_id, payload):
         wh.ubigeo = data.get('ubigeo', wh.ubigeo)
 
         db.session.commit()
+        cache.bump_version('warehouses')
         return jsonify(wh.to_dict())
     except Exception as e:
         db.session.rollback()
@@ -67,6 +72,7 @@ def delete_warehouse(wh_id, payload):
     try:
         db.session.delete(wh)
         db.session.commit()
+        cache.bump_version('warehouses')
         return jsonify(success=True, message="Almacén eliminado")
     except Exception as e:
         # Captura errores si el almacén está en uso
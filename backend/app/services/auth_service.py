@@ -1,10 +1,15 @@
+import hashlib
 import json
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
 from urllib.request import urlopen
 from flask import request
 from jose import jwt
-from ..extensions import db
+from ..extensions import db, cache
 from ..models.role import Role
+from ..models.permission import Permission
 # --- Pega tus valores de Auth0 aquí ---
 AUTH0_DOMAIN = 'dev-gforng2dfnavhcdz.us.auth0.com'
 API_IDENTIFIER = 'https://api.appcompower.com' # El Audience
@@ -12,6 +17,17 @@ ALGORITHMS = ["RS256"]
 AUTH0_NAMESPACE = 'https://appcompower.com'
 # ------------------------------------
 
+# --- Caché de llaves públicas (JWKS) ---
+JWKS_URL = f"https://{AUTH0_DOMAIN}/.well-known/jwks.json"
+JWKS_CACHE_TTL = 600            # Segundos que un juego de llaves se considera fresco
+JWKS_REFRESH_MARGIN = 60        # Se refresca en segundo plano cuando faltan estos segundos para el TTL
+JWKS_MIN_REFRESH_INTERVAL = 30  # Mínimo entre refrescos forzados por un 'kid' desconocido
+JWKS_FETCH_TIMEOUT = 5
+
+# --- Caché de tokens verificados ---
+TOKEN_CACHE_SIZE = 1024         # Máximo de tokens distintos en memoria (LRU)
+TOKEN_REJECTION_TTL = 30        # Segundos que se recuerda un token rechazado
+
 
 # Clase para los errores de autenticación
 class AuthError(Exception):
@@ -20,6 +36,166 @@ class AuthError(Exception):
         self.status_code = status_code
 
 
+# --- Almacén de llaves JWKS compartido por todo el proceso ---
+class JWKSKeyStore:
+    """
+    Guarda en memoria las llaves públicas de Auth0 indexadas por 'kid'.
+    - Solo descarga el JWKS cuando expira el TTL o aparece un 'kid' desconocido.
+    - Poco antes de expirar, lo refresca en un hilo de fondo sin bloquear peticiones.
+    - Si un refresco falla, sigue sirviendo el último juego de llaves válido.
+    """
+
+    def __init__(self, url, ttl=JWKS_CACHE_TTL, refresh_margin=JWKS_REFRESH_MARGIN,
+                 min_refresh_interval=JWKS_MIN_REFRESH_INTERVAL, fetch_timeout=JWKS_FETCH_TIMEOUT):
+        self.url = url
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.min_refresh_interval = min_refresh_interval
+        self.fetch_timeout = fetch_timeout
+
+        self._keys = {}
+        self._fetched_at = None
+        self._last_attempt = None
+        self._lock = threading.Lock()
+        self._background_refresh = False
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def _fetch(self):
+        jsonurl = urlopen(self.url, timeout=self.fetch_timeout)
+        jwks = json.loads(jsonurl.read())
+        keys = {}
+        for key in jwks["keys"]:
+            keys[key["kid"]] = {
+                "kty": key["kty"], "kid": key["kid"], "use": key["use"], "n": key["n"], "e": key["e"]
+            }
+        return keys
+
+    def refresh(self):
+        """Descarga el JWKS y reemplaza las llaves. Devuelve False si falló (se conservan las anteriores)."""
+        with self._lock:
+            self._last_attempt = time.monotonic()
+        try:
+            keys = self._fetch()
+        except Exception as e:
+            with self._lock:
+                self.refresh_errors += 1
+            print(f"--- ERROR REFRESCANDO JWKS (se usan las llaves anteriores): {e} ---")
+            return False
+
+        with self._lock:
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+            self.refreshes += 1
+        return True
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._background_refresh:
+                return
+            self._background_refresh = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                with self._lock:
+                    self._background_refresh = False
+
+        threading.Thread(target=run, name="jwks-refresh", daemon=True).start()
+
+    def get_key(self, kid):
+        """Devuelve la llave RSA para 'kid' o None si Auth0 no la publica."""
+        now = time.monotonic()
+        with self._lock:
+            key = self._keys.get(kid)
+            age = now - self._fetched_at if self._fetched_at is not None else None
+            recently_tried = self._last_attempt is not None and \
+                now - self._last_attempt < self.min_refresh_interval
+
+        if key is not None and age < self.ttl:
+            with self._lock:
+                self.hits += 1
+            if age >= self.ttl - self.refresh_margin:
+                self._refresh_in_background()
+            return key
+
+        with self._lock:
+            self.misses += 1
+
+        # Llave desconocida o juego vencido: refresco síncrono, limitado a uno por
+        # min_refresh_interval para que 'kid' inventados o un Auth0 caído no frenen cada petición.
+        if not recently_tried:
+            self.refresh()
+
+        with self._lock:
+            return self._keys.get(kid)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "keys": len(self._keys)
+            }
+
+
+jwks_store = JWKSKeyStore(JWKS_URL)
+
+
+# --- Caché de permisos por conjunto de roles ---
+# Mapea frozenset(roles) -> (versión, vence, frozenset(permisos)). La versión vive en la
+# caché compartida (espacio 'permissions'), así que con CACHE_BACKEND = 'sqlite'
+# invalidate_permissions_cache() en un worker descarta las entradas de todos los workers.
+# Con 'memory' la versión es de cada proceso: por eso cada entrada vence igual que las de
+# cache.remember() (CACHE_DEFAULT_TTL) y los demás workers ven el cambio a lo sumo tras ese TTL.
+_permissions_cache = {}
+_permissions_lock = threading.Lock()
+
+
+def invalidate_permissions_cache():
+    """Se llama después de modificar roles o permisos en la BD."""
+    cache.bump_version('permissions')
+    with _permissions_lock:
+        _permissions_cache.clear()
+
+
+def _query_permissions(roles):
+    rows = db.session.query(Permission.name).join(Permission.roles) \
+        .filter(Role.name.in_(roles)).distinct().all()
+    return sorted(name for (name,) in rows)
+
+
+def get_permissions_for_roles(roles):
+    """
+    Devuelve el conjunto de nombres de permisos de los roles dados.
+    Busca primero en memoria, luego en la caché compartida y solo al final en la BD.
+    """
+    if isinstance(roles, str):
+        roles = [roles]
+    key = frozenset(roles or [])
+    if not key:
+        return frozenset()
+
+    version = cache.get_version('permissions')
+    now = time.time()
+    with _permissions_lock:
+        cached = _permissions_cache.get(key)
+    if cached is not None and cached[0] == version and cached[1] > now:
+        return cached[2]
+
+    names = cache.remember('permissions', '|'.join(sorted(key)), lambda: _query_permissions(key))
+    permissions = frozenset(names)
+    with _permissions_lock:
+        _permissions_cache[key] = (version, now + cache.default_ttl, permissions)
+    return permissions
+
+
 # --- Obtener el Token del Header ---
 def get_token_auth_header():
     auth = request.headers.get("Authorization", None)
@@ -58,6 +234,104 @@ def check_for_roles(required_role, payload):
     return True
 
 
+# --- Caché de tokens ya verificados ---
+class VerifiedTokenCache:
+    """
+    LRU acotado de tokens ya verificados, indexado por el SHA-256 del token.
+    Cada entrada vive hasta el 'exp' del token; los rechazos se guardan por poco tiempo.
+    """
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest):
+        """Devuelve (payload, error) o None si no hay una entrada vigente."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[digest]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, digest, expires_at, payload=None, error=None):
+        with self._lock:
+            self._entries[digest] = (expires_at, payload, error)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+token_cache = VerifiedTokenCache()
+
+
+def _decode_token(token):
+    """Valida la firma RS256 y los claims del token contra las llaves de Auth0."""
+    try:
+        unverified_header = jwt.get_unverified_header(token)
+    except jwt.JWTError:
+        raise AuthError({"code": "invalid_header",
+                        "description": "Unable to parse authentication token."}, 401)
+
+    # Las llaves salen del almacén en memoria; solo se descargan si hace falta
+    rsa_key = jwks_store.get_key(unverified_header.get("kid"))
+    if not rsa_key:
+        raise AuthError({"code": "invalid_header", "description": "Unable to find appropriate key"}, 401)
+
+    try:
+        return jwt.decode(
+            token, rsa_key, algorithms=ALGORITHMS,
+            audience=API_IDENTIFIER, issuer=f"https://{AUTH0_DOMAIN}/"
+        )
+    except jwt.ExpiredSignatureError:
+        raise AuthError({"code": "token_expired", "description": "Token is expired"}, 401)
+    except jwt.JWTClaimsError:
+        raise AuthError({"code": "invalid_claims", "description": "Incorrect claims"}, 401)
+    except Exception:
+        raise AuthError({"code": "invalid_header", "description": "Unable to find appropriate key"}, 401)
+
+
+def verify_token(token):
+    """
+    Devuelve el payload verificado del token.
+    Solo decodifica (y verifica la firma) la primera vez que ve cada token.
+    """
+    digest = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    cached = token_cache.get(digest)
+    if cached is not None:
+        payload, error = cached
+        if error is not None:
+            raise AuthError(error.error, error.status_code)
+        return dict(payload)
+
+    try:
+        payload = _decode_token(token)
+    except AuthError as e:
+        token_cache.put(digest, time.time() + TOKEN_REJECTION_TTL, error=e)
+        raise
+
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        token_cache.put(digest, exp, payload=payload)
+    return dict(payload)
+
+
 # --- ¡ACTUALIZADO! Decorador de Autenticación y Permisos ---
 def requires_auth(required_role=None, required_permission=None):
     """
@@ -69,63 +343,29 @@ def requires_auth(required_role=None, required_permission=None):
         @wraps(f)
         def decorated(*args, **kwargs):
             token = get_token_auth_header()
-            jsonurl = urlopen(f"https://{AUTH0_DOMAIN}/.well-known/jwks.json")
-            jwks = json.loads(jsonurl.read())
+            payload = verify_token(token)
 
-            try:
-                unverified_header = jwt.get_unverified_header(token)
-            except jwt.JWTError:
-                raise AuthError({"code": "invalid_header",
-                                "description": "Unable to parse authentication token."}, 401)
-
-            rsa_key = {}
-            for key in jwks["keys"]:
-                if key["kid"] == unverified_header["kid"]:
-                    rsa_key = {
-                        "kty": key["kty"], "kid": key["kid"], "use": key["use"], "n": key["n"], "e": key["e"]
-                    }
-            if rsa_key:
-                try:
-                    payload = jwt.decode(
-                        token, rsa_key, algorithms=ALGORITHMS,
-                        audience=API_IDENTIFIER, issuer=f"https://{AUTH0_DOMAIN}/"
-                    )
-                except jwt.ExpiredSignatureError:
-                    raise AuthError({"code": "token_expired", "description": "Token is expired"}, 401)
-                except jwt.JWTClaimsError:
-                    raise AuthError({"code": "invalid_claims", "description": "Incorrect claims"}, 401)
-                except Exception:
-                    raise AuthError({"code": "invalid_header", "description": "Unable to find appropriate key"}, 401)
-
-                # --- REVISIÓN DE ROL (de Auth0) ---
-                if required_role:
-                    check_for_roles(required_role, payload)
-
-                # --- ¡NUEVO! REVISIÓN DE PERMISO (de la Base de Datos) ---
-                if required_permission:
-                    # 1. Obtener los roles del token (ej. ['Admin', 'Usuario'])
-                    roles_key = f"{AUTH0_NAMESPACE}/roles"
-                    if roles_key not in payload:
-                        raise AuthError({"code": "invalid_claims", "description": "Roles claim not found."}, 401)
-                    auth0_roles = payload[roles_key]
-
-                    # 2. Buscar esos roles en nuestra BD
-                    user_roles_in_db = Role.query.filter(Role.name.in_(auth0_roles)).all()
-
-                    # 3. Juntar todos sus permisos en una sola lista
-                    all_permissions = set()
-                    for role in user_roles_in_db:
-                        for perm in role.permissions:
-                            all_permissions.add(perm.name)
-
-                    # 4. Revisar si el permiso requerido está en la lista
-                    if required_permission not in all_permissions:
-                        raise AuthError({"code": "unauthorized",
-                                        "description": "Permission not found."}, 403) # 403 Prohibido
-
-                kwargs["payload"] = payload
-                return f(*args, **kwargs)
-
-            raise AuthError({"code": "invalid_header", "description": "Unable to find appropriate key"}, 401)
+            # --- REVISIÓN DE ROL (de Auth0) ---
+            if required_role:
+                check_for_roles(required_role, payload)
+
+            # --- ¡NUEVO! REVISIÓN DE PERMISO (de la Base de Datos) ---
+            if required_permission:
+                # 1. Obtener los roles del token (ej. ['Admin', 'Usuario'])
+                roles_key = f"{AUTH0_NAMESPACE}/roles"
+                if roles_key not in payload:
+                    raise AuthError({"code": "invalid_claims", "description": "Roles claim not found."}, 401)
+                auth0_roles = payload[roles_key]
+
+                # 2. Obtener sus permisos (desde la caché; la BD solo si cambió la versión)
+                all_permissions = get_permissions_for_roles(auth0_roles)
+
+                # 3. Revisar si el permiso requerido está en la lista
+                if required_permission not in all_permissions:
+                    raise AuthError({"code": "unauthorized",
+                                    "description": "Permission not found."}, 403) # 403 Prohibido
+
+            kwargs["payload"] = payload
+            return f(*args, **kwargs)
         return decorated
-    return decorator
\ No newline at end of file
+    return decorator
@@ -0,0 +1,217 @@
+import bisect
+import os
+import re
+import threading
+import unicodedata
+from array import array
+from sqlalchemy import select
+
+
+# --- Autocompletado en memoria (SKU / nombre de producto) ---
+# Las búsquedas cortas ("c", "ca") son las más frecuentes mientras se escribe y las
+# que más filas tocan en la BD. Este índice las responde desde la memoria del worker:
+# para cada prefijo de hasta (AUTOCOMPLETE_QUERY_LENGTH - 1) letras de cada palabra
+# del SKU y del nombre guarda un array ordenado de códigos; los primeros 'limit'
+# códigos del array son los resultados, ya ordenados por relevancia:
+#   1. palabra del SKU  2. primera palabra del nombre  3. otra palabra del nombre
+#   y dentro de cada grupo, nombres más cortos primero.
+#
+# Se arma la primera vez que se usa, en un hilo aparte (mientras tanto responde la BD).
+# Las rutas del catálogo lo actualizan al momento con upsert()/remove(); los demás
+# workers ven que cambió la versión 'product_search' de la caché y lo vuelven a armar.
+# Los lotes grandes (importación) no se aplican uno a uno: insertar en los arrays
+# cuesta más que volver a armar el índice, así que se deja desactualizado y se rearma.
+
+SEARCH_NAMESPACE = 'product_search'
+
+INCREMENTAL_LIMIT = 200  # Más productos que esto en un upsert -> rearmar el índice
+
+_TOKEN_RE = re.compile(r'[^\W_]+')
+
+# Código de 64 bits: grupo (3 bits) | largo del nombre (20 bits) | id (36 bits)
+_ID_BITS = 36
+_ID_MASK = (1 << _ID_BITS) - 1
+_NAME_LEN_MAX = (1 << 20) - 1
+
+
+def normalize(text):
+    """Minúsculas y sin tildes (igual que el tokenizador de products_fts)."""
+    text = unicodedata.normalize('NFKD', (text or '').lower())
+    return ''.join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def _words(text):
+    text = (text or '').lower()
+    if not text.isascii():
+        text = normalize(text)
+    return _TOKEN_RE.findall(text)
+
+
+class AutocompleteIndex:
+    """
+    Índice de prefijos por proceso. Uso:
+        ids = autocomplete.lookup('ca', limit=20)   # None -> buscar en la BD
+        autocomplete.upsert([(id, sku, name)], version)
+        autocomplete.remove([id], version)
+    'version' es lo que devolvió cache.bump_version(SEARCH_NAMESPACE) después del commit.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.query_length = 3
+        self._lock = threading.Lock()
+        self._reset()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('AUTOCOMPLETE_ENABLED', True)
+        self.query_length = app.config.get('AUTOCOMPLETE_QUERY_LENGTH', 3)
+
+    def _reset(self):
+        self._products = {}    # id -> (sku, nombre) con que se indexó
+        self._prefixes = {}    # prefijo -> array('q') de códigos ordenados
+        self._version = None   # versión del catálogo indexada (None = sin armar)
+        self._building = False
+        self._pid = os.getpid()
+
+    # --- API pública ---
+    def lookup(self, term, limit=20):
+        """
+        Ids de los productos cuyo SKU o nombre tiene una palabra que empieza por 'term'.
+        Devuelve None si 'term' no es una búsqueda corta o el índice aún no está armado.
+        """
+        if not self.enabled:
+            return None
+        term = normalize(term).strip()
+        tokens = _words(term)
+        if len(term) >= self.query_length or len(tokens) != 1:
+            return None
+        if not self._ready():
+            return None
+        with self._lock:
+            codes = self._prefixes.get(tokens[0])
+            return [code & _ID_MASK for code in codes[:limit]] if codes else []
+
+    def upsert(self, products, version=None):
+        """Indexa (o reindexa) cada (id, sku, nombre) de 'products'."""
+        if len(products) > INCREMENTAL_LIMIT:
+            return  # Sin avanzar la versión: la próxima búsqueda rearma el índice aparte
+        with self._lock:
+            if self._version is None:
+                return
+            for product_id, sku, name in products:
+                self._remove(product_id)
+                self._add(product_id, sku, name)
+            self._advance(version)
+
+    def remove(self, product_ids, version=None):
+        with self._lock:
+            if self._version is None:
+                return
+            for product_id in product_ids:
+                self._remove(product_id)
+            self._advance(version)
+
+    def build(self):
+        """Arma el índice completo desde la BD (requiere contexto de la app)."""
+        from ..extensions import cache, db
+        from ..models.product_catalog import Product
+
+        version = cache.get_version(SEARCH_NAMESPACE)
+        rows = db.session.execute(select(Product.id, Product.sku, Product.name)).all()
+
+        products = {}
+        prefixes = {}
+        for product_id, sku, name in rows:
+            products[product_id] = (sku, name)
+            for prefix, code in self._codes(product_id, sku, name).items():
+                codes = prefixes.get(prefix)
+                if codes is None:
+                    codes = prefixes[prefix] = array('q')
+                codes.append(code)
+        for prefix, codes in prefixes.items():
+            prefixes[prefix] = array('q', sorted(codes))
+
+        with self._lock:
+            self._products = products
+            self._prefixes = prefixes
+            self._version = version
+
+    def stats(self):
+        return {'enabled': self.enabled, 'version': self._version, 'building': self._building,
+                'products': len(self._products), 'prefixes': len(self._prefixes),
+                'entries': sum(len(codes) for codes in self._prefixes.values())}
+
+    # --- Internos ---
+    def _ready(self):
+        """True si hay un índice para responder; si está desactualizado lo rearma aparte."""
+        from ..extensions import cache
+
+        if self._pid != os.getpid():
+            with self._lock:
+                self._reset()  # Proceso nuevo (fork de gunicorn): se arma el suyo
+        if self._version != cache.get_version(SEARCH_NAMESPACE):
+            self._start_build()
+        # Mientras se rearma, se responde con el índice anterior
+        return self._version is not None
+
+    def _start_build(self):
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self._build_in_background, name='autocomplete-build', daemon=True).start()
+
+    def _build_in_background(self):
+        try:
+            with self.app.app_context():
+                self.build()
+        except Exception as e:
+            print(f"--- ERROR AL ARMAR EL ÍNDICE DE AUTOCOMPLETADO: {e} ---")
+        finally:
+            self._building = False
+
+    def _advance(self, version):
+        # Si el índice estaba al día antes de este cambio, sigue al día con él
+        if version is not None and self._version == version - 1:
+            self._version = version
+
+    def _codes(self, product_id, sku, name):
+        """Código de cada prefijo del producto (el de mejor grupo si se repite)."""
+        max_length = self.query_length - 1
+        base = (min(len(name or ''), _NAME_LEN_MAX) << _ID_BITS) | product_id
+        name_words = _words(name)
+
+        codes = {}
+        # Del peor grupo al mejor: el último que escribe un prefijo es el que queda
+        for group, words in ((2, name_words[1:]), (1, name_words[:1]), (0, _words(sku))):
+            code = (group << 56) | base
+            for word in words:
+                for length in range(1, max_length + 1):
+                    codes[word[:length]] = code  # En palabras cortas se repite la palabra entera
+        return codes
+
+    def _add(self, product_id, sku, name):
+        self._products[product_id] = (sku, name)
+        for prefix, code in self._codes(product_id, sku, name).items():
+            codes = self._prefixes.get(prefix)
+            if codes is None:
+                codes = self._prefixes[prefix] = array('q')
+            codes.insert(bisect.bisect_left(codes, code), code)
+
+    def _remove(self, product_id):
+        indexed = self._products.pop(product_id, None)
+        if indexed is None:
+            return
+        for prefix, code in self._codes(product_id, *indexed).items():
+            codes = self._prefixes.get(prefix)
+            if codes is None:
+                continue
+            position = bisect.bisect_left(codes, code)
+            if position < len(codes) and codes[position] == code:
+                del codes[position]
+            if not codes:
+                del self._prefixes[prefix]
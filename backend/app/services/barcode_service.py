@@ -0,0 +1,163 @@
+from functools import lru_cache
+
+# qrcode es opcional: sin él solo se pueden imprimir códigos de barras Code128
+try:
+    import qrcode
+    from qrcode.constants import ERROR_CORRECT_M
+except ImportError:  # pragma: no cover
+    qrcode = None
+
+SYMBOL_CACHE_SIZE = 4096  # Símbolos (SKU + tipo + tamaño) que se guardan ya dibujados
+CODE128_QUIET_ZONE = 10   # Módulos en blanco a cada lado del código de barras
+
+# --- Code128 (juego B: ASCII 32-126; juego C para tramos de 4+ dígitos) ---
+# Anchos de barra/espacio de cada símbolo, del valor 0 al 106 (106 = stop).
+CODE128_PATTERNS = (
+    '212222', '222122', '222221', '121223', '121322', '131222', '122213', '122312', '132212', '221213',
+    '221312', '231212', '112232', '122132', '122231', '113222', '123122', '123221', '223211', '221132',
+    '221231', '213212', '223112', '312131', '311222', '321122', '321221', '312212', '322112', '322211',
+    '212123', '212321', '232121', '111323', '131123', '131321', '112313', '132113', '132311', '211313',
+    '231113', '231311', '112133', '112331', '132131', '113123', '113321', '133121', '313121', '211331',
+    '231131', '213113', '213311', '213131', '311123', '311321', '331121', '312113', '312311', '332111',
+    '314111', '221411', '431111', '111224', '111422', '121124', '121421', '141122', '141221', '112214',
+    '112412', '122114', '122411', '142112', '142211', '241211', '221114', '413111', '241112', '134111',
+    '111242', '121142', '121241', '114212', '124112', '124211', '411212', '421112', '421211', '212141',
+    '214121', '412121', '111143', '111341', '131141', '114113', '114311', '411113', '411311', '113141',
+    '114131', '311141', '411131', '211412', '211214', '211232', '2331112',
+)
+CODE128_START_B = 104
+CODE128_START_C = 105
+CODE128_TO_B = 100  # Dentro del juego C: cambiar a B
+CODE128_TO_C = 99   # Dentro del juego B: cambiar a C
+CODE128_STOP = 106
+
+
+def _digit_run(value, start):
+    end = start
+    while end < len(value) and value[end] in '0123456789':
+        end += 1
+    return end - start
+
+
+def _code128_codes(value):
+    # Los tramos de 4 o más dígitos van en el juego C (dos dígitos por símbolo): así los
+    # SKUs numéricos salen más cortos y las barras más anchas en etiquetas chicas.
+    codes = []
+    charset = None
+    i = 0
+    while i < len(value):
+        run = _digit_run(value, i)
+        if run >= 4:
+            if run % 2:  # El dígito impar va en B, el resto en pares
+                if charset != 'B':
+                    codes.append(CODE128_START_B if charset is None else CODE128_TO_B)
+                    charset = 'B'
+                codes.append(ord(value[i]) - 32)
+                i += 1
+                run -= 1
+            if charset != 'C':
+                codes.append(CODE128_START_C if charset is None else CODE128_TO_C)
+                charset = 'C'
+            for j in range(i, i + run, 2):
+                codes.append(int(value[j:j + 2]))
+            i += run
+            continue
+
+        char = value[i]
+        if not 32 <= ord(char) <= 126:
+            raise ValueError(f"El SKU '{value}' tiene caracteres que no se pueden imprimir en Code128.")
+        if charset != 'B':
+            codes.append(CODE128_START_B if charset is None else CODE128_TO_B)
+            charset = 'B'
+        codes.append(ord(char) - 32)
+        i += 1
+    return codes or [CODE128_START_B]
+
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def code128_bars(value):
+    """
+    Codifica 'value' en Code128.
+    Devuelve (barras, total_módulos): barras es una tupla de (inicio, ancho) en módulos,
+    contando la zona en blanco de ambos lados. Lanza ValueError si hay caracteres no ASCII.
+    """
+    codes = _code128_codes(value)
+    checksum = (codes[0] + sum(position * code for position, code in enumerate(codes[1:], start=1))) % 103
+    codes += [checksum, CODE128_STOP]
+
+    bars = []
+    position = CODE128_QUIET_ZONE
+    for code in codes:
+        for index, width in enumerate(CODE128_PATTERNS[code]):
+            width = int(width)
+            if index % 2 == 0:  # Posiciones pares = barra, impares = espacio
+                bars.append((position, width))
+            position += width
+    return tuple(bars), position + CODE128_QUIET_ZONE
+
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def qr_runs(value):
+    """
+    Codifica 'value' en QR (corrección M, sin borde).
+    Devuelve (tramos, módulos_por_lado): cada tramo es (fila, columna, largo) de módulos
+    negros seguidos, para dibujar un rectángulo por tramo y no uno por módulo.
+    """
+    if qrcode is None:
+        raise ValueError("Para imprimir códigos QR hay que instalar el paquete 'qrcode'.")
+    qr = qrcode.QRCode(error_correction=ERROR_CORRECT_M, border=0)
+    qr.add_data(value)
+    qr.make(fit=True)
+    matrix = qr.get_matrix()
+
+    runs = []
+    for row, modules in enumerate(matrix):
+        column = 0
+        while column < len(modules):
+            if modules[column]:
+                start = column
+                while column < len(modules) and modules[column]:
+                    column += 1
+                runs.append((row, start, column - start))
+            else:
+                column += 1
+    return tuple(runs), len(matrix)
+
+
+@lru_cache(maxsize=SYMBOL_CACHE_SIZE)
+def _symbol_ops(kind, value, width_pt, height_pt):
+    """
+    Operadores PDF que dibujan el símbolo con origen en su esquina inferior izquierda.
+    No dependen de la posición en la hoja, así que se generan una vez por SKU y tamaño.
+    """
+    rects = []
+    if kind == 'code128':
+        bars, total = code128_bars(value)
+        module = width_pt / total
+        for start, width in bars:
+            rects.append(f"{start * module:.3f} 0 {width * module:.3f} {height_pt:.3f} re")
+    elif kind == 'qr':
+        runs, size = qr_runs(value)
+        module = min(width_pt, height_pt) / size
+        for row, column, length in runs:
+            rects.append(f"{column * module:.3f} {(size - row - 1) * module:.3f} {length * module:.3f} {module:.3f} re")
+    else:
+        raise ValueError(f"Tipo de símbolo desconocido: {kind}")
+    return "0 g " + " ".join(rects) + " f"
+
+
+def draw_symbol(pdf, kind, value, x, y, w, h):
+    """Dibuja el símbolo ('code128' o 'qr') en la caja (x, y, w, h) en mm de la página actual."""
+    k = pdf.k
+    ops = _symbol_ops(kind, value, round(w * k, 3), round(h * k, 3))
+    # Se traslada el origen a la esquina de la caja y se reutilizan los operadores cacheados
+    pdf._out(f"q 1 0 0 1 {x * k:.2f} {(pdf.h - y - h) * k:.2f} cm {ops} Q")
+
+
+def cache_info():
+    """Aciertos/fallos de las cachés de símbolos (para diagnóstico y benchmarks)."""
+    return {
+        'code128': code128_bars.cache_info()._asdict(),
+        'qr': qr_runs.cache_info()._asdict(),
+        'drawn': _symbol_ops.cache_info()._asdict(),
+    }
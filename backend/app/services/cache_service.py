@@ -0,0 +1,192 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+# --- Backend 1: Memoria del proceso ---
+class MemoryCacheBackend:
+    """
+    Caché dentro del proceso. Sirve con un solo worker (desarrollo);
+    con varios workers cada uno tiene su propia copia.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_version(self, namespace):
+        with self._lock:
+            return self._versions.get(namespace, 0)
+
+    def bump_version(self, namespace):
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            return self._versions[namespace]
+
+
+# --- Backend 2: Archivo SQLite compartido por todos los workers de la máquina ---
+class SQLiteCacheBackend:
+    """
+    Caché en un archivo SQLite local (modo WAL). Todos los workers de gunicorn
+    leen y escriben el mismo archivo, así que una invalidación llega a todos.
+    Los valores se guardan como JSON.
+    """
+
+    CLEANUP_EVERY = 200  # Cada cuántos 'set' se borran las entradas vencidas
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._sets = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS cache_entries (
+                            key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS cache_versions (
+                            namespace TEXT PRIMARY KEY, version INTEGER NOT NULL)""")
+
+    def _connection(self):
+        # Una conexión por hilo (sqlite3 no permite compartirlas entre hilos)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), expires_at)
+        )
+        self._sets += 1
+        if self._sets % self.CLEANUP_EVERY == 0:
+            conn.execute("DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                         (time.time(),))
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def get_version(self, namespace):
+        row = self._connection().execute(
+            "SELECT version FROM cache_versions WHERE namespace = ?", (namespace,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def bump_version(self, namespace):
+        conn = self._connection()
+        conn.execute(
+            """INSERT INTO cache_versions (namespace, version) VALUES (?, 1)
+               ON CONFLICT(namespace) DO UPDATE SET version = version + 1""",
+            (namespace,)
+        )
+        return self.get_version(namespace)
+
+
+# --- Fachada que usan las rutas y servicios ---
+class CacheService:
+    """
+    Capa de caché intercambiable (get / set con TTL / versiones por espacio de nombres).
+    Se configura con CACHE_BACKEND = 'memory' | 'sqlite'.
+    Si el backend falla, se comporta como una caché vacía: nunca rompe la petición.
+    """
+
+    def __init__(self, app=None):
+        self.backend = MemoryCacheBackend()
+        self.default_ttl = 300
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend_name = app.config.get('CACHE_BACKEND', 'memory')
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', 300)
+        if backend_name == 'sqlite':
+            path = app.config.get('CACHE_SQLITE_PATH') or os.path.join(app.instance_path, 'cache.db')
+            self.backend = SQLiteCacheBackend(path)
+        elif backend_name == 'memory':
+            self.backend = MemoryCacheBackend()
+        else:
+            raise ValueError(f"CACHE_BACKEND desconocido: {backend_name}")
+
+    def get(self, key):
+        try:
+            return self.backend.get(key)
+        except sqlite3.Error as e:
+            print(f"--- ERROR DE CACHÉ (get {key}): {e} ---")
+            return None
+
+    def set(self, key, value, ttl=None):
+        try:
+            self.backend.set(key, value, ttl or self.default_ttl)
+        except sqlite3.Error as e:
+            print(f"--- ERROR DE CACHÉ (set {key}): {e} ---")
+
+    def delete(self, key):
+        try:
+            self.backend.delete(key)
+        except sqlite3.Error as e:
+            print(f"--- ERROR DE CACHÉ (delete {key}): {e} ---")
+
+    def get_version(self, namespace):
+        try:
+            return self.backend.get_version(namespace)
+        except sqlite3.Error as e:
+            print(f"--- ERROR DE CACHÉ (version {namespace}): {e} ---")
+            return 0
+
+    def bump_version(self, namespace):
+        """Invalida todo lo guardado bajo 'namespace' en todos los workers."""
+        try:
+            return self.backend.bump_version(namespace)
+        except sqlite3.Error as e:
+            print(f"--- ERROR DE CACHÉ (bump {namespace}): {e} ---")
+            return None
+
+    def remember(self, namespace, name, producer, ttl=None):
+        """
+        Devuelve el valor guardado para la versión actual de 'namespace',
+        o lo calcula con producer() y lo guarda. El valor debe ser serializable a JSON.
+        """
+        key = f"{namespace}:{name}:v{self.get_version(namespace)}"
+        value = self.get(key)
+        if value is None:
+            value = producer()
+            self.set(key, value, ttl)
+        return value
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, literal, select, text
+from ..extensions import db
+from ..models.product_catalog import CatalogChange, Category, Product
+
+PRODUCT = 'product'
+CATEGORY = 'category'
+BASELINE = 'catalog'  # Fila inicial que pone la migración (versión 1)
+
+# Clave del candado de PostgreSQL que ordena a los que escriben en catalog_changes
+_ADVISORY_LOCK_KEY = 72150024
+
+
+# --- Versiones y registro de cambios del catálogo ---
+# Cada escritura del catálogo (API de productos y categorías, importaciones, recepción
+# y ajuste masivo, que cambian precio y ubicaciones) agrega aquí el id de cada
+# producto/categoría que tocó. El id de la fila es la versión del catálogo.
+# Un cliente que guardó la versión N pide los ids con versión > N y descarga solo esos.
+#
+# Para que un cliente nunca se saltee un cambio, las versiones tienen que quedar en el
+# orden de los commits: en PostgreSQL se toma un candado de transacción antes de
+# insertar (se libera con el commit); SQLite ya admite una sola escritura a la vez.
+# Por eso record() va al final de cada transacción, después de las demás escrituras:
+# así nadie espera el candado con filas bloqueadas que otro necesita.
+# No hace commit: la ruta decide cuándo confirmar la transacción.
+
+def _serialize_writers():
+    if db.session.get_bind().dialect.name == 'postgresql':
+        db.session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': _ADVISORY_LOCK_KEY})
+
+
+def record(entity, ids):
+    """Registra que cambiaron (o se borraron) los 'ids' de 'entity' (PRODUCT / CATEGORY)."""
+    ids = sorted({int(entity_id) for entity_id in ids if entity_id is not None})
+    if not ids:
+        return
+    _serialize_writers()
+    db.session.execute(insert(CatalogChange), [{'entity': entity, 'entity_id': entity_id} for entity_id in ids])
+
+
+def record_category(category_id):
+    """
+    Cambio de una categoría que también se ve en otros registros: sus productos
+    (category_name) y sus subcategorías (parent_name). Un solo INSERT ... SELECT.
+    """
+    record(CATEGORY, [category_id])
+    now = datetime.now()
+    db.session.execute(insert(CatalogChange).from_select(
+        ['entity', 'entity_id', 'changed_at'],
+        select(literal(PRODUCT), Product.id, literal(now)).where(Product.category_id == category_id)
+        .union_all(select(literal(CATEGORY), Category.id, literal(now)).where(Category.parent_id == category_id))
+    ))
+
+
+def current_version():
+    return db.session.query(func.max(CatalogChange.id)).scalar() or 0
+
+
+def changes_since(since, max_changes):
+    """
+    {entity: set(ids)} de lo que cambió después de la versión 'since', o None si hay que
+    mandar el catálogo completo: cliente nuevo (since=0) o de otra BD (since > versión
+    actual), registro ya podado (prune()) o más de 'max_changes' cambios.
+    """
+    oldest, newest = db.session.query(func.min(CatalogChange.id), func.max(CatalogChange.id)).one()
+    if since <= 0 or oldest is None or since > newest:
+        return None
+    if since < oldest - 1:
+        return None  # Los cambios entre 'since' y 'oldest' ya no están
+
+    rows = db.session.query(CatalogChange.entity, CatalogChange.entity_id) \
+        .filter(CatalogChange.id > since).order_by(CatalogChange.id).limit(max_changes + 1).all()
+    if len(rows) > max_changes:
+        return None
+
+    changed = {PRODUCT: set(), CATEGORY: set()}
+    for entity, entity_id in rows:
+        changed.setdefault(entity, set()).add(entity_id)
+    return changed
+
+
+def changed_ids(entity, since):
+    """Subconsulta con los ids de 'entity' que cambiaron después de 'since' (para IN (...))."""
+    return select(CatalogChange.entity_id).where(CatalogChange.entity == entity, CatalogChange.id > since)
+
+
+def prune(days):
+    """Borra los cambios de hace más de 'days' días. Devuelve cuántos se borraron."""
+    cutoff = db.session.query(func.max(CatalogChange.id)) \
+        .filter(CatalogChange.changed_at < datetime.now() - timedelta(days=days)).scalar()
+    if cutoff is None:
+        return 0
+    # Siempre queda la última fila: de ahí sale la versión actual
+    cutoff = min(cutoff, current_version() - 1)
+    return db.session.query(CatalogChange).filter(CatalogChange.id <= cutoff).delete(synchronize_session=False)
@@ -0,0 +1,143 @@
+from sqlalchemy import literal, select
+from ..extensions import db
+from ..models.product_catalog import Category, CategoryClosure
+
+
+# --- Árbol de categorías (tabla de clausura) ---
+# categories guarda solo el padre directo (parent_id). category_closure guarda cada par
+# (ancestro, descendiente) con su distancia, así "Cables y todas sus subcategorías"
+# es un único SELECT por ancestor_id, sin importar cuántos niveles tenga el árbol.
+# Se mantiene en cada escritura: add() al crear, move() al cambiar el padre y remove()
+# al borrar. rebuild() la arma de nuevo desde parent_id (migración y comando
+# 'flask rebuild-category-tree').
+# No hace commit: la ruta decide cuándo confirmar la transacción.
+
+def closure_rows(parents):
+    """
+    Filas de la tabla para todo el árbol. parents: {id: parent_id}.
+    Un padre que no existe (o un ciclo ya guardado) corta la cadena en ese punto.
+    """
+    rows = []
+    for category_id in parents:
+        node, depth, seen = category_id, 0, set()
+        while node in parents and node not in seen:
+            rows.append({'ancestor_id': node, 'descendant_id': category_id, 'depth': depth})
+            seen.add(node)
+            node, depth = parents[node], depth + 1
+    return rows
+
+
+def rebuild():
+    """Vuelve a armar category_closure desde categories.parent_id. Devuelve cuántas filas quedaron."""
+    table = CategoryClosure.__table__
+    rows = closure_rows(dict(db.session.query(Category.id, Category.parent_id).all()))
+    db.session.execute(table.delete())
+    if rows:
+        db.session.execute(table.insert(), rows)
+    return len(rows)
+
+
+def add(categories):
+    """
+    Categorías nuevas (sin hijos todavía): su propia fila y una por cada ancestro del
+    padre. Si en la lista hay padre e hijo, el padre tiene que ir antes.
+    """
+    categories = list(categories)
+    if not categories:
+        return
+    db.session.flush()
+    table = CategoryClosure.__table__
+    db.session.execute(table.insert(), [
+        {'ancestor_id': category.id, 'descendant_id': category.id, 'depth': 0} for category in categories
+    ])
+    for category in categories:
+        if category.parent_id is not None:
+            db.session.execute(table.insert().from_select(
+                ['ancestor_id', 'descendant_id', 'depth'],
+                select(table.c.ancestor_id, literal(category.id), table.c.depth + 1)
+                .where(table.c.descendant_id == category.parent_id)
+            ))
+
+
+def move(category_id, parent_id):
+    """
+    Cuelga la categoría (con todo su subárbol) de 'parent_id' (None = raíz).
+    Lanza ValueError si el nuevo padre es ella misma o una de sus subcategorías;
+    en ese caso no escribe nada.
+    """
+    table = CategoryClosure.__table__
+    subtree = db.session.query(table.c.descendant_id, table.c.depth) \
+        .filter(table.c.ancestor_id == category_id).all()
+    subtree_ids = [descendant_id for descendant_id, _ in subtree]
+    if parent_id is not None and parent_id in subtree_ids:
+        raise ValueError("Una categoría no puede quedar dentro de sí misma ni de una de sus subcategorías")
+    if not subtree:
+        return  # Sin filas (categoría sin registrar): nada que mover
+
+    # Desconecta el subárbol de sus ancestros actuales y lo conecta a los del nuevo padre
+    db.session.execute(table.delete().where(table.c.descendant_id.in_(subtree_ids),
+                                            table.c.ancestor_id.notin_(subtree_ids)))
+    if parent_id is not None:
+        ancestors = db.session.query(table.c.ancestor_id, table.c.depth) \
+            .filter(table.c.descendant_id == parent_id).all()
+        rows = [{'ancestor_id': ancestor_id, 'descendant_id': descendant_id, 'depth': up + down + 1}
+                for ancestor_id, up in ancestors for descendant_id, down in subtree]
+        if rows:
+            db.session.execute(table.insert(), rows)
+
+
+def remove(category_id):
+    """Antes de borrar una categoría: sus subcategorías quedan como raíces de sus propios subárboles."""
+    table = CategoryClosure.__table__
+    move(category_id, None)
+    db.session.execute(table.delete().where(
+        (table.c.ancestor_id == category_id) | (table.c.descendant_id == category_id)))
+
+
+def subtree_ids(category_id):
+    """Subconsulta con el id de la categoría y los de todas sus subcategorías (para IN (...))."""
+    return select(CategoryClosure.descendant_id).where(CategoryClosure.ancestor_id == category_id)
+
+
+def in_category(column, category_id, include_subcategories=False):
+    """Filtro 'column es la categoría' o, con include_subcategories, 'está en su subárbol'."""
+    if include_subcategories:
+        return column.in_(subtree_ids(category_id))
+    return column == category_id
+
+
+def tree():
+    """
+    Todas las categorías anidadas: [{id, name, description, parent_id, children: [...]}],
+    ordenadas por nombre en cada nivel. Una sola consulta; el anidado se arma en memoria.
+    Las categorías cuyo padre no existe quedan como raíces, y un ciclo guardado antes de
+    validar move() se corta en su primera categoría por nombre.
+    """
+    rows = db.session.query(Category.id, Category.name, Category.description, Category.parent_id) \
+        .order_by(Category.name, Category.id).all()
+    nodes = {row.id: {'id': row.id, 'name': row.name, 'description': row.description,
+                      'parent_id': row.parent_id, 'children': []} for row in rows}
+    roots = []
+    for row in rows:
+        parent = nodes.get(row.parent_id)
+        (parent['children'] if parent is not None else roots).append(nodes[row.id])
+
+    reached = set()
+
+    def walk(node):
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            reached.add(current['id'])
+            stack.extend(current['children'])
+
+    for root in roots:
+        walk(root)
+    for row in rows:
+        if row.id not in reached:
+            node = nodes[row.id]
+            siblings = nodes[row.parent_id]['children']
+            siblings[:] = [child for child in siblings if child is not node]
+            roots.append(node)
+            walk(node)
+    return roots
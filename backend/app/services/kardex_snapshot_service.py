@@ -0,0 +1,135 @@
+from datetime import datetime, date, timedelta
+from sqlalchemy import and_, or_, event
+from ..extensions import db
+from ..models.inventory_models import InventoryTransaction, KardexSnapshot
+
+
+# --- Cierres mensuales del Kardex ---
+# Un snapshot guarda el saldo de (producto, almacén) al final de un mes.
+# El stock a cualquier fecha se obtiene con el snapshot más cercano anterior
+# más la suma de movimientos posteriores, sin recorrer todo el historial.
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def next_month(value):
+    return date(value.year + 1, 1, 1) if value.month == 12 else date(value.year, value.month + 1, 1)
+
+
+def parse_period(text):
+    """'2026-09' -> date(2026, 9, 1)."""
+    return datetime.strptime(text, '%Y-%m').date()
+
+
+def _balances(end, product_id=None, warehouse_id=None):
+    """
+    Saldo por (producto, almacén) de todos los movimientos con timestamp < end.
+    Devuelve {(product_id, warehouse_id): cantidad}.
+    """
+    KS = KardexSnapshot
+    T = InventoryTransaction
+
+    # 1. Snapshot más reciente (anterior a 'end') de cada par
+    latest = db.session.query(
+        KS.product_id, KS.warehouse_id, db.func.max(KS.balance_at).label('balance_at')
+    ).filter(KS.balance_at <= end)
+    if product_id:
+        latest = latest.filter(KS.product_id == product_id)
+    if warehouse_id:
+        latest = latest.filter(KS.warehouse_id == warehouse_id)
+    latest = latest.group_by(KS.product_id, KS.warehouse_id).subquery()
+
+    base = db.session.query(KS.product_id, KS.warehouse_id, KS.balance_at, KS.quantity).join(
+        latest, and_(KS.product_id == latest.c.product_id,
+                     KS.warehouse_id == latest.c.warehouse_id,
+                     KS.balance_at == latest.c.balance_at)
+    ).subquery()
+
+    balances = {
+        (row.product_id, row.warehouse_id): float(row.quantity)
+        for row in db.session.query(base).all()
+    }
+
+    # 2. Movimientos posteriores al snapshot (o todo el historial si el par no tiene)
+    deltas = db.session.query(
+        T.product_id, T.warehouse_id, db.func.sum(T.quantity_change)
+    ).outerjoin(
+        base, and_(T.product_id == base.c.product_id, T.warehouse_id == base.c.warehouse_id)
+    ).filter(
+        T.timestamp < end,
+        or_(base.c.balance_at.is_(None), T.timestamp >= base.c.balance_at)
+    )
+    if product_id:
+        deltas = deltas.filter(T.product_id == product_id)
+    if warehouse_id:
+        deltas = deltas.filter(T.warehouse_id == warehouse_id)
+
+    for pid, wid, delta in deltas.group_by(T.product_id, T.warehouse_id).all():
+        balances[(pid, wid)] = balances.get((pid, wid), 0.0) + float(delta or 0)
+    return balances
+
+
+def stock_as_of(day, product_id=None, warehouse_id=None):
+    """Stock por (producto, almacén) al cierre del día 'day' (incluye todos sus movimientos)."""
+    end = datetime.combine(day + timedelta(days=1), datetime.min.time())
+    return _balances(end, product_id, warehouse_id)
+
+
+def close_period(period):
+    """
+    Genera (o regenera) los snapshots del mes 'period'. Devuelve cuántos se guardaron.
+    Solo se pueden cerrar meses ya terminados. No hace commit.
+    """
+    period = month_start(period)
+    balance_at = datetime.combine(next_month(period), datetime.min.time())
+    if balance_at > datetime.now():
+        raise ValueError(f"El periodo {period:%Y-%m} todavía no termina.")
+
+    balances = _balances(balance_at)
+    KardexSnapshot.query.filter_by(period=period).delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(KardexSnapshot, [
+        {'product_id': pid, 'warehouse_id': wid, 'period': period,
+         'balance_at': balance_at, 'quantity': quantity}
+        for (pid, wid), quantity in balances.items()
+    ])
+    return len(balances)
+
+
+def invalidate_from(product_id, warehouse_id, timestamp):
+    """
+    Un movimiento con fecha 'timestamp' cambia los saldos de todos los cierres posteriores
+    de ese par: se borran y quedan pendientes de volver a cerrar.
+    """
+    return KardexSnapshot.query.filter(
+        KardexSnapshot.product_id == product_id,
+        KardexSnapshot.warehouse_id == warehouse_id,
+        KardexSnapshot.balance_at > timestamp
+    ).delete(synchronize_session=False)
+
+
+# --- Invalidación automática de cierres ante movimientos con fecha pasada ---
+def _invalidate_backdated(session, flush_context, instances):
+    affected = []
+    for obj in session.new:
+        # Sin timestamp explícito se usa datetime.now(): nunca cae dentro de un mes cerrado
+        if isinstance(obj, InventoryTransaction) and obj.timestamp is not None:
+            affected.append((obj.product_id, obj.warehouse_id, obj.timestamp))
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, InventoryTransaction):
+            history = db.inspect(obj).attrs.timestamp.history
+            timestamps = [ts for ts in (history.deleted or []) + (history.unchanged or []) + (history.added or [])
+                          if ts is not None]
+            if timestamps:
+                affected.append((obj.product_id, obj.warehouse_id, min(timestamps)))
+
+    if not affected:
+        return
+    with session.no_autoflush:
+        for product_id, warehouse_id, timestamp in affected:
+            invalidate_from(product_id, warehouse_id, timestamp)
+
+
+def register_snapshot_invalidation():
+    if not event.contains(db.session, 'before_flush', _invalidate_backdated):
+        event.listen(db.session, 'before_flush', _invalidate_backdated)
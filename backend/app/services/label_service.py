@@ -0,0 +1,261 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from fpdf import FPDF
+from PIL import Image
+from . import barcode_service
+
+# pypdf es opcional: sin él, las tiradas grandes se generan en serie
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # pragma: no cover
+    PdfReader = PdfWriter = None
+
+PARALLEL_THRESHOLD = 2000  # A partir de cuántas etiquetas se reparte el trabajo en procesos
+
+# --- Dimensiones y Posicionamiento (mm, hoja A4) ---
+DEFAULT_LAYOUT = {
+    'label_width': 60,
+    'label_height': 30,
+    'margin_x': 10,
+    'margin_y': 10,
+    'gap_x': 5,
+    'gap_y': 5,
+}
+
+# Tamaños de sticker disponibles (ancho x alto en mm)
+LABEL_SIZES = {
+    '50x25': (50, 25),
+    '60x30': (60, 30),
+    '70x40': (70, 40),
+    '100x50': (100, 50),
+}
+DEFAULT_SIZE = '60x30'
+
+# 'none' = solo texto (etiqueta clásica), 'code128' = código de barras, 'qr' = código QR
+SYMBOLOGIES = ('none', 'code128', 'qr')
+DEFAULT_SYMBOLOGY = 'code128'
+
+
+def get_layout(size=DEFAULT_SIZE):
+    """Devuelve las dimensiones de la hoja para un tamaño de LABEL_SIZES."""
+    if size not in LABEL_SIZES:
+        raise ValueError(f"Tamaño de etiqueta no válido: {size}. Opciones: {', '.join(LABEL_SIZES)}")
+    label_width, label_height = LABEL_SIZES[size]
+    return dict(DEFAULT_LAYOUT, label_width=label_width, label_height=label_height)
+
+
+class PDF(FPDF):
+    def header(self):
+        pass
+    def footer(self):
+        pass
+
+
+@lru_cache(maxsize=8)
+def _logo_aspect_ratio(logo_path, mtime):
+    # El logo se abre una sola vez por archivo (y versión del archivo), no por etiqueta
+    with Image.open(logo_path) as img:
+        logo_orig_w, logo_orig_h = img.size
+    return logo_orig_w / logo_orig_h
+
+
+def logo_aspect_ratio(logo_path):
+    return _logo_aspect_ratio(logo_path, os.path.getmtime(logo_path))
+
+
+def expand_labels(products):
+    """Convierte [{product_sku, product_name, quantity}] en una etiqueta por copia."""
+    labels = []
+    for product in products:
+        label = (str(product.get('product_sku', 'N/A')), str(product.get('product_name', 'Sin Nombre')))
+        labels.extend([label] * int(product.get('quantity', 1)))
+    return labels
+
+
+def labels_per_page(layout=DEFAULT_LAYOUT, page_w=210, page_h=297):
+    """Cuántas etiquetas entran en una hoja con la misma lógica de avance que render_labels()."""
+    columns = 1 + int((page_w - 2 * layout['margin_x'] - layout['label_width']) //
+                      (layout['label_width'] + layout['gap_x']))
+    rows = 1 + int((page_h - 2 * layout['margin_y'] - layout['label_height']) //
+                   (layout['label_height'] + layout['gap_y']))
+    return max(columns, 1) * max(rows, 1)
+
+
+def _pdf_bytes(pdf):
+    output = pdf.output(dest='S')
+    # fpdf 1.7 devuelve str (latin-1); fpdf2 devuelve bytearray
+    return output.encode('latin-1') if isinstance(output, str) else bytes(output)
+
+
+def _draw_classic(pdf, x, y, w, h, sku, name, logo_path, aspect_ratio):
+    s = h / 30  # Las medidas originales son para un sticker de 30 mm de alto
+
+    # --- Logo (Centrado y sin distorsión) ---
+    logo_h = 8 * s # Altura fija para el logo
+    logo_w = logo_h * aspect_ratio # Ancho calculado para mantener proporción
+    pdf.image(logo_path, x + (w - logo_w) / 2, y + 2 * s, w=logo_w, h=logo_h)
+
+    # --- SKU ---
+    pdf.set_font('Arial', 'B', 12 * s)
+    pdf.set_xy(x + 1, y + 12 * s)
+    pdf.cell(w - 2, 5 * s, f"SKU: {sku}", align='C')
+
+    # --- Nombre del Producto ---
+    pdf.set_font('Arial', '', 8 * s)
+    pdf.set_xy(x + 1, y + 18 * s)
+    # MultiCell para auto-ajuste de texto
+    pdf.multi_cell(w - 2, 5 * s, name, align='C')
+
+
+def _draw_code128(pdf, x, y, w, h, sku, name, logo_path, aspect_ratio):
+    s = h / 30
+
+    logo_h = 5 * s
+    logo_w = logo_h * aspect_ratio
+    pdf.image(logo_path, x + (w - logo_w) / 2, y + 1.5 * s, w=logo_w, h=logo_h)
+
+    # --- Código de barras (ancho completo, con su zona en blanco) ---
+    barcode_service.draw_symbol(pdf, 'code128', sku, x + 1, y + 7.5 * s, w - 2, 10 * s)
+
+    pdf.set_font('Arial', 'B', 9 * s)
+    pdf.set_xy(x + 1, y + 18 * s)
+    pdf.cell(w - 2, 4 * s, sku, align='C')
+
+    pdf.set_font('Arial', '', 7 * s)
+    pdf.set_xy(x + 1, y + 22.5 * s)
+    pdf.multi_cell(w - 2, 3 * s, name, align='C')
+
+
+def _draw_qr(pdf, x, y, w, h, sku, name, logo_path, aspect_ratio):
+    s = h / 30
+
+    # --- QR cuadrado a la izquierda, texto a la derecha ---
+    side = h - 4
+    barcode_service.draw_symbol(pdf, 'qr', sku, x + 2, y + 2, side, side)
+
+    text_x = x + side + 4
+    text_w = w - side - 6
+    logo_h = 6 * s
+    logo_w = min(logo_h * aspect_ratio, text_w)
+    logo_h = logo_w / aspect_ratio
+    pdf.image(logo_path, text_x + (text_w - logo_w) / 2, y + 2 * s, w=logo_w, h=logo_h)
+
+    pdf.set_font('Arial', 'B', 10 * s)
+    pdf.set_xy(text_x, y + 10 * s)
+    pdf.cell(text_w, 4 * s, sku, align='C')
+
+    pdf.set_font('Arial', '', 7 * s)
+    pdf.set_xy(text_x, y + 15 * s)
+    pdf.multi_cell(text_w, 3 * s, name, align='C')
+
+
+LABEL_DRAWERS = {
+    'none': _draw_classic,
+    'code128': _draw_code128,
+    'qr': _draw_qr,
+}
+
+
+def render_labels(labels, logo_path, aspect_ratio, layout=DEFAULT_LAYOUT, symbology='none'):
+    """Dibuja las etiquetas en un PDF en memoria y devuelve sus bytes."""
+    label_width = layout['label_width']
+    label_height = layout['label_height']
+    margin_x = layout['margin_x']
+    margin_y = layout['margin_y']
+    draw_label = LABEL_DRAWERS[symbology]
+
+    pdf = PDF('P', 'mm', 'A4')
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=10)
+
+    x = margin_x
+    y = margin_y
+    page_full = False
+
+    for sku, name in labels:
+        # La hoja nueva se abre recién cuando hay otra etiqueta (sin hoja en blanco al final)
+        if page_full:
+            pdf.add_page()
+            page_full = False
+
+        # --- Dibujar el borde del sticker ---
+        pdf.rect(x, y, label_width, label_height)
+
+        # fpdf guarda la imagen del logo la primera vez y luego solo la referencia;
+        # los símbolos salen de la caché de barcode_service (uno por SKU)
+        draw_label(pdf, x, y, label_width, label_height, sku, name, logo_path, aspect_ratio)
+
+        # --- Avanzar a la siguiente posición ---
+        x += label_width + layout['gap_x']
+        if x + label_width > pdf.w - margin_x:
+            x = margin_x
+            y += label_height + layout['gap_y']
+            if y + label_height > pdf.h - margin_y:
+                page_full = True
+                y = margin_y
+
+    return _pdf_bytes(pdf)
+
+
+def _render_chunk(args):
+    return render_labels(*args)
+
+
+def _merge(parts):
+    writer = PdfWriter()
+    for part in parts:
+        for page in PdfReader(io.BytesIO(part)).pages:
+            writer.add_page(page)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+_pool = None
+
+
+def _get_pool(workers):
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=workers)
+    return _pool
+
+
+def render_pdf(products, logo_path, size=DEFAULT_SIZE, symbology=DEFAULT_SYMBOLOGY,
+               workers=None, parallel_threshold=PARALLEL_THRESHOLD):
+    """
+    Genera el PDF de etiquetas completo en memoria.
+    Las tiradas grandes se parten en rangos de páginas completas que se dibujan en
+    un pool de procesos y luego se unen en orden.
+    Lanza ValueError si el tamaño, el tipo de símbolo o algún SKU no son válidos.
+    """
+    layout = get_layout(size)
+    if symbology not in SYMBOLOGIES:
+        raise ValueError(f"Tipo de símbolo no válido: {symbology}. Opciones: {', '.join(SYMBOLOGIES)}")
+
+    labels = expand_labels(products)
+    aspect_ratio = logo_aspect_ratio(logo_path)
+
+    # Se validan los símbolos antes de repartir el trabajo (y quedan en la caché)
+    if symbology == 'code128':
+        for sku in {sku for sku, _ in labels}:
+            barcode_service.code128_bars(sku)
+    elif symbology == 'qr':
+        for sku in {sku for sku, _ in labels}:
+            barcode_service.qr_runs(sku)
+
+    workers = workers or os.cpu_count() or 1
+    if len(labels) < parallel_threshold or workers < 2 or PdfWriter is None:
+        return render_labels(labels, logo_path, aspect_ratio, layout, symbology)
+
+    # Cada parte empieza en una hoja nueva: se corta en múltiplos de etiquetas por hoja
+    per_page = labels_per_page(layout)
+    pages = -(-len(labels) // per_page)
+    pages_per_part = -(-pages // workers)
+    part_size = pages_per_part * per_page
+    parts = [(labels[i:i + part_size], logo_path, aspect_ratio, layout, symbology)
+             for i in range(0, len(labels), part_size)]
+
+    return _merge(list(_get_pool(workers).map(_render_chunk, parts)))
@@ -0,0 +1,148 @@
+import pandas as pd
+from sqlalchemy import insert
+from ..extensions import db
+from ..models.product_catalog import Product, Category
+from . import sku_sequence_service, catalog_change_service, category_tree_service
+from .sql_helpers import chunks
+
+IMPORT_COLUMNS = ['SKU', 'Nombre', 'Categoria', 'Descripcion', 'UM', 'Precio']
+REQUIRED_COLUMNS = ['SKU', 'Nombre', 'Categoria'] # (UM, Descripcion y Precio son opcionales)
+
+
+# --- Importación Masiva de Productos por Conjuntos ---
+# En vez de buscar la categoría y el producto fila por fila (2 consultas + un flush
+# por fila), cada bloque del archivo se resuelve con pocas consultas:
+#   1. SKUs por prefijo ("CEL"): un rango de números de sku_sequences por prefijo.
+#   2. Categorías: un mapa nombre en minúsculas -> id, leído una sola vez; las que
+#      faltan se crean todas juntas.
+#   3. SKUs existentes: un mapa sku -> id con consultas IN por bloque.
+#   4. Las filas se agrupan en altas (bulk insert) y modificaciones (bulk update).
+#   5. Los ids tocados van al registro de cambios del catálogo en un solo INSERT.
+# Las filas repetidas de un mismo SKU se aplican en orden, igual que el bucle anterior:
+# la primera crea (o actualiza) y las siguientes cuentan como actualizaciones.
+# No hace commit: la ruta confirma cada bloque.
+
+class ProductImport:
+    """
+    Estado de una importación (categorías conocidas y totales).
+    Uso:
+        importer = ProductImport()
+        for chunk in reader.iter_chunks(IMPORT_COLUMNS):
+            changed = importer.apply(chunk)   # [(id, sku, nombre), ...]
+            db.session.commit()
+    """
+
+    def __init__(self):
+        self.categories = None   # nombre en minúsculas -> id
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.categories_created = 0
+
+    def apply(self, chunk):
+        """Crea/actualiza los productos de un bloque (DataFrame). Devuelve (id, sku, nombre) de cada uno."""
+        if self.categories is None:
+            self.categories = {name.lower(): category_id
+                               for category_id, name in db.session.query(Category.id, Category.name)}
+
+        has = {col: col in chunk.columns for col in ('Descripcion', 'UM', 'Precio')}
+        records = self._parse(chunk, has)
+        self._assign_skus(records)
+        new_categories = self._create_categories(records)
+
+        existing = self._existing_ids({record['sku'] for record in records})
+        inserts = {}  # sku -> fila a insertar
+        updates = {}  # id -> cambios
+
+        for record in records:
+            sku = record['sku']
+            values = {'name': record['name'], 'category_id': self.categories[record['category'].lower()]}
+            values.update(record['optional'])
+
+            product_id = existing.get(sku)
+            if product_id is not None:
+                # ACTUALIZAR existente
+                updates.setdefault(product_id, {'id': product_id}).update(values)
+                self.updated += 1
+            elif sku in inserts:
+                # Repetido dentro del bloque: actualiza la fila que se va a crear
+                inserts[sku].update(values)
+                self.updated += 1
+            else:
+                # CREAR nuevo
+                inserts[sku] = {'sku': sku, 'description': '', 'unit_of_measure': 'UND',
+                                'standard_price': 0.00, **values}
+                self.created += 1
+        self.rows += len(records)
+
+        # --- Escritura en bloque ---
+        # INSERT ... RETURNING en lotes (bulk_insert_mappings con return_defaults va fila por fila)
+        created_ids = {}
+        if inserts:
+            created_ids = {sku: product_id for product_id, sku in db.session.execute(
+                insert(Product).returning(Product.id, Product.sku), list(inserts.values()))}
+        # bulk_update_mappings agrupa en un executemany las filas seguidas con las mismas columnas
+        db.session.bulk_update_mappings(Product, sorted(updates.values(), key=lambda values: sorted(values)))
+
+        skus = {product_id: sku for sku, product_id in existing.items()}
+        changed = ([(created_ids[sku], sku, values['name']) for sku, values in inserts.items()] +
+                   [(product_id, skus[product_id], values['name']) for product_id, values in updates.items()])
+        catalog_change_service.record(catalog_change_service.CATEGORY, new_categories)
+        catalog_change_service.record(catalog_change_service.PRODUCT, [product_id for product_id, _, _ in changed])
+        return changed
+
+    # --- Internos ---
+    def _parse(self, chunk, has):
+        """Convierte cada fila en {sku, name, category, optional} (mismas reglas que antes)."""
+        records = []
+        for row in chunk.to_dict('records'):
+            sku = str(row['SKU']).strip()
+
+            # Las columnas opcionales solo se aplican si traen valor
+            optional = {}
+            if has['Descripcion'] and pd.notna(row['Descripcion']):
+                optional['description'] = str(row['Descripcion'])
+            if has['UM'] and pd.notna(row['UM']):
+                optional['unit_of_measure'] = str(row['UM'])
+            if has['Precio'] and pd.notna(row['Precio']):
+                optional['standard_price'] = float(row['Precio'])
+
+            records.append({'sku': sku, 'name': str(row['Nombre']).strip(),
+                            'category': str(row['Categoria']).strip(), 'optional': optional})
+        return records
+
+    def _assign_skus(self, records):
+        """
+        Completa los SKUs que son solo un prefijo ("CEL" -> CEL-001, CEL-002...) con
+        números de sku_sequences: un rango por prefijo, no una búsqueda por fila.
+        """
+        # Los PREFIJO-NNN explícitos del archivo adelantan la secuencia antes de reservar
+        sku_sequence_service.observe(record['sku'] for record in records
+                                     if not sku_sequence_service.is_prefix(record['sku']))
+
+        by_prefix = {}
+        for record in records:
+            if sku_sequence_service.is_prefix(record['sku']):
+                by_prefix.setdefault(record['sku'], []).append(record)
+        for prefix, prefixed in by_prefix.items():
+            for record, sku in zip(prefixed, sku_sequence_service.generate(prefix, len(prefixed))):
+                record['sku'] = sku
+
+    def _create_categories(self, records):
+        """Crea en un solo lote las categorías que aún no existen (sin distinguir mayúsculas). Devuelve sus ids."""
+        missing = {}
+        for record in records:
+            key = record['category'].lower()
+            if key not in self.categories and key not in missing:
+                missing[key] = Category(name=record['category'], description="Creada por importación")
+        if missing:
+            db.session.add_all(missing.values())
+            category_tree_service.add(missing.values())  # Hace flush: quedan con id
+            self.categories.update({key: category.id for key, category in missing.items()})
+            self.categories_created += len(missing)
+        return [category.id for category in missing.values()]
+
+    def _existing_ids(self, skus):
+        return {sku: product_id
+                for chunk in chunks(skus)
+                for product_id, sku in db.session.query(Product.id, Product.sku).filter(Product.sku.in_(chunk))}
@@ -0,0 +1,103 @@
+from itertools import islice
+from sqlalchemy import or_, select
+from sqlalchemy.orm import joinedload
+from ..extensions import db
+from ..models.product_catalog import Product, ProductLocation
+from .sql_helpers import chunks
+
+
+# --- Ubicaciones de productos (tabla product_locations) ---
+# Cada producto tiene una lista ordenada de códigos de ubicación; cada código puede
+# estar asignado a un almacén (recepción, ajuste masivo) o no (formulario del catálogo).
+# La API sigue devolviendo 'location' como lista de códigos (Product.to_dict()) y el
+# reporte de stock como texto separado por comas.
+# No hace commit: la ruta decide cuándo confirmar la transacción.
+
+def clean_codes(codes):
+    """Quita espacios, vacíos y repetidos (conservando el orden)."""
+    cleaned = []
+    for code in codes or []:
+        code = str(code).strip()
+        if code and code not in cleaned:
+            cleaned.append(code)
+    return cleaned
+
+
+def set_codes(product, codes):
+    """
+    Deja en 'product' exactamente esta lista de ubicaciones (formulario del catálogo).
+    Los códigos que ya tenía conservan su almacén; los nuevos quedan sin almacén.
+    """
+    existing = {location.code: location for location in product.locations}
+    locations = []
+    for position, code in enumerate(clean_codes(codes)):
+        location = existing.get(code) or ProductLocation(code=code)
+        location.position = position
+        locations.append(location)
+    product.locations = locations
+
+
+def replace_in_warehouse(codes_by_product, warehouse_id):
+    """
+    Recepción / ajuste masivo: {product_id: texto} pasa a ser la ubicación de cada
+    producto en el almacén. El texto puede traer varios códigos separados por comas
+    ("A1, B2"), igual que la columna de antes (ver la migración 0004): va una fila por
+    código, en ese orden. Se reemplazan sus ubicaciones en ese almacén y las que no
+    tenían almacén (el texto único de antes se sobrescribía igual); las de otros
+    almacenes se conservan.
+    """
+    if not codes_by_product:
+        return
+    for chunk in chunks(codes_by_product):
+        db.session.query(ProductLocation).filter(
+            ProductLocation.product_id.in_(chunk),
+            or_(ProductLocation.warehouse_id == warehouse_id, ProductLocation.warehouse_id.is_(None))
+        ).delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(ProductLocation, [
+        {'product_id': product_id, 'warehouse_id': warehouse_id, 'code': code, 'position': position}
+        for product_id, value in codes_by_product.items()
+        for position, code in enumerate(clean_codes(str(value).split(',')))
+    ])
+
+
+def locations_by_product(product_ids):
+    """{product_id: [(warehouse_id, código), ...]} en el orden de cada producto."""
+    result = {}
+    for chunk in chunks(set(product_ids)):
+        rows = db.session.query(ProductLocation.product_id, ProductLocation.warehouse_id, ProductLocation.code) \
+            .filter(ProductLocation.product_id.in_(chunk)) \
+            .order_by(ProductLocation.product_id, ProductLocation.position, ProductLocation.id)
+        for product_id, warehouse_id, code in rows:
+            result.setdefault(product_id, []).append((warehouse_id, code))
+    return result
+
+
+def codes_in(locations, warehouse_id=None):
+    """Códigos de 'locations' (de locations_by_product); con warehouse_id, los de ese almacén y los sin almacén."""
+    return [code for location_warehouse, code in locations
+            if warehouse_id is None or location_warehouse in (warehouse_id, None)]
+
+
+def with_locations(rows, product_id_of, batch_size=1000):
+    """
+    Recorre 'rows' (p. ej. una consulta con stream_rows) y entrega (row, ubicaciones)
+    con una sola consulta de ubicaciones por cada lote de 'batch_size' filas.
+    """
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        locations = locations_by_product(product_id_of(row) for row in batch)
+        for row in batch:
+            yield row, locations.get(product_id_of(row), [])
+
+
+def products_at(code, warehouse_id=None):
+    """Productos con la ubicación 'code' (en el almacén indicado o sin almacén asignado)."""
+    matches = select(ProductLocation.product_id).where(ProductLocation.code == code.strip())
+    if warehouse_id is not None:
+        matches = matches.where(or_(ProductLocation.warehouse_id == warehouse_id,
+                                    ProductLocation.warehouse_id.is_(None)))
+    return Product.query.options(joinedload(Product.category)) \
+        .filter(Product.id.in_(matches)).order_by(Product.name, Product.id)
@@ -0,0 +1,115 @@
+import re
+from sqlalchemy import case, func, or_, select, text
+from sqlalchemy.orm import joinedload
+from ..extensions import autocomplete, db
+from ..models.product_catalog import Product
+
+
+# --- Búsqueda de productos por SKU / nombre ---
+# Según lo que tenga la BD (ver migración 0002_product_search_index):
+#   - 'fts5': SQLite con la tabla products_fts. Cada palabra escrita se busca como
+#     prefijo de una palabra del SKU o del nombre ("cab 14" -> "cab"* AND "14"*) y se
+#     ordena por bm25 (todas las coincidencias), pesando más el SKU que el nombre.
+#   - 'trgm': PostgreSQL con pg_trgm. LIKE '%texto%' servido por los índices GIN de
+#     trigramas y ordenado por similitud.
+#   - 'like': sin índice; el mismo LIKE '%texto%' de siempre (recorre la tabla).
+# En todos los casos primero va el SKU exacto y luego los que empiezan por el texto.
+# Las búsquedas cortas se responden antes desde el índice en memoria (autocomplete).
+
+SEARCH_LIMIT = 20
+SKU_WEIGHT = 10.0
+NAME_WEIGHT = 1.0
+
+_TOKEN_RE = re.compile(r'[^\W_]+')
+_backends = {}
+
+
+def _backend():
+    """Detecta (una vez por BD) qué índice de búsqueda hay disponible."""
+    engine = db.engine
+    key = str(engine.url)
+    if key not in _backends:
+        backend = 'like'
+        try:
+            with engine.connect() as connection:
+                if engine.dialect.name == 'sqlite':
+                    if connection.execute(text(
+                            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'")).first():
+                        backend = 'fts5'
+                elif engine.dialect.name == 'postgresql':
+                    if connection.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first():
+                        backend = 'trgm'
+        except Exception as e:
+            print(f"--- ERROR AL DETECTAR EL ÍNDICE DE BÚSQUEDA: {e} ---")
+        _backends[key] = backend
+    return _backends[key]
+
+
+def _fts_query(term):
+    # Cada palabra entre comillas (sin operadores de FTS5) y como prefijo
+    tokens = _TOKEN_RE.findall(term.lower())
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _fts_ids(term, limit):
+    match = _fts_query(term)
+    if not match:
+        return []
+    # SKU exacto primero (por el índice único de sku, no por la tabla FTS)
+    exact = list(db.session.execute(
+        select(Product.id).where(Product.sku.in_({term, term.upper()}))).scalars())
+    # Los SKU exactos salen de la lista ordenada: se piden de más para completar 'limit'
+    rows = db.session.execute(text(
+        "SELECT rowid FROM products_fts WHERE products_fts MATCH :match "
+        "ORDER BY bm25(products_fts, :sku_weight, :name_weight), rowid LIMIT :limit"
+    ), {'match': match, 'limit': limit + len(exact),
+        'sku_weight': SKU_WEIGHT, 'name_weight': NAME_WEIGHT})
+    ranked = [row[0] for row in rows if row[0] not in exact]
+    return (exact + ranked)[:limit]
+
+
+def _like_ids(term, limit, similarity=False):
+    term = term.lower()
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    name = func.lower(Product.name)
+    sku = func.lower(Product.sku)
+
+    order_by = [
+        case((sku == term, 0), else_=1),
+        case((or_(sku.like(f"{escaped}%", escape='\\'), name.like(f"{escaped}%", escape='\\')), 0), else_=1),
+    ]
+    if similarity:
+        order_by.append(func.greatest(func.similarity(name, term), func.similarity(sku, term)).desc())
+    order_by += [Product.name, Product.id]
+
+    stmt = (
+        select(Product.id)
+        .where(or_(name.like(f"%{escaped}%", escape='\\'), sku.like(f"%{escaped}%", escape='\\')))
+        .order_by(*order_by)
+        .limit(limit)
+    )
+    return list(db.session.execute(stmt).scalars())
+
+
+def search_product_ids(term, limit=SEARCH_LIMIT):
+    """Ids de los productos que coinciden con 'term', del más al menos relevante."""
+    term = (term or '').strip()
+    if not term:
+        return []
+    ids = autocomplete.lookup(term, limit)
+    if ids is not None:
+        return ids
+    backend = _backend()
+    if backend == 'fts5':
+        return _fts_ids(term, limit)
+    return _like_ids(term, limit, similarity=backend == 'trgm')
+
+
+def search_products(term, limit=SEARCH_LIMIT):
+    """Productos (con su categoría ya cargada) que coinciden con 'term', en orden de relevancia."""
+    ids = search_product_ids(term, limit)
+    if not ids:
+        return []
+    products = Product.query.options(joinedload(Product.category)).filter(Product.id.in_(ids)).all()
+    by_id = {p.id: p for p in products}
+    return [by_id[product_id] for product_id in ids if product_id in by_id]
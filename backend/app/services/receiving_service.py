@@ -0,0 +1,132 @@
+from ..extensions import db
+from ..models.purchase_order import PurchaseOrder, PurchaseOrderItem, OrderStatus
+from ..models.inventory_models import InventoryTransaction
+from ..models.product_catalog import Product
+from . import stock_service, stock_totals_service, product_location_service, catalog_change_service
+
+
+# --- Motor de Recepción por Lotes ---
+# En vez de 4 consultas por línea (item de OC, stock, producto y SUM del stock),
+# se precarga todo con unas pocas consultas por conjunto, se calcula el costo
+# promedio ponderado en memoria y se escriben los cambios en bloque.
+# El stock del almacén se suma en la BD (stock_service) y el Kardex usa el saldo
+# que devuelve; el stock total por producto sale de product_stock_totals.
+# El precio se lee después de actualizar product_stock_totals: esa fila queda
+# bloqueada hasta el commit, así dos recepciones del mismo producto no se pisan.
+# No hace commit: la ruta decide cuándo confirmar la transacción.
+
+def _parse_lines(items):
+    lines = []
+    for item_data in items:
+        quantity_received = float(item_data['quantity_received'])
+        if quantity_received <= 0:
+            continue  # Ignorar items que no se están recibiendo
+        lines.append({
+            'po_item_id': item_data['po_item_id'],
+            'product_id': item_data['product_id'],
+            'quantity': quantity_received,
+            'location': item_data.get('location')
+        })
+    return lines
+
+
+def receive_items(warehouse_id, order_id, items, user_id):
+    """
+    Recepciona los items de una orden de compra en un almacén.
+    Devuelve la cantidad de líneas procesadas. Lanza ValueError si falta algún dato.
+    """
+    lines = _parse_lines(items)
+
+    order = PurchaseOrder.query.get(order_id)
+    reference = f"OC: {order.document_number}" if order else None
+
+    if lines:
+        po_item_ids = {line['po_item_id'] for line in lines}
+        product_ids = {line['product_id'] for line in lines}
+
+        # --- 1. Validación (una consulta por conjunto) ---
+        po_prices = dict(
+            db.session.query(PurchaseOrderItem.id, PurchaseOrderItem.unit_price)
+            .filter(PurchaseOrderItem.id.in_(po_item_ids)).all()
+        )
+        known_products = {
+            product_id for (product_id,) in db.session.query(Product.id).filter(Product.id.in_(product_ids)).all()
+        }
+        for line in lines:
+            if line['po_item_id'] not in po_prices:
+                raise ValueError(f"No se encontró el item de orden {line['po_item_id']}")
+            if line['product_id'] not in known_products:
+                raise ValueError(f"Producto ID {line['product_id']} no encontrado.")
+
+        # --- 2. Stock: sumas atómicas en la BD ---
+        balances = stock_service.add_lines(
+            warehouse_id, [(line['product_id'], line['quantity']) for line in lines]
+        )
+        received = {}
+        for line in lines:
+            received[line['product_id']] = received.get(line['product_id'], 0.0) + line['quantity']
+        stock_totals_service.apply_deltas(received)
+
+        # --- 3. Costo promedio ponderado en memoria (en el orden de las líneas) ---
+        totals_after = stock_totals_service.get_totals(product_ids)
+        totals = {product_id: totals_after[product_id] - received[product_id] for product_id in product_ids}
+        products = {
+            row.id: {'price': float(row.standard_price)}
+            for row in db.session.query(Product.id, Product.standard_price)
+            .filter(Product.id.in_(product_ids)).all()
+        }
+
+        po_item_updates = {}
+        kardex_rows = []
+        locations = {}
+
+        for line, new_quantity in zip(lines, balances):
+            po_item_id = line['po_item_id']
+            product_id = line['product_id']
+            quantity_received = line['quantity']
+            product = products[product_id]
+
+            po_item_updates[po_item_id] = product_id
+
+            location = str(line['location'] or '').strip()
+            if location:
+                locations[product_id] = location  # Gana la última ubicación informada
+
+            # Costo promedio ponderado sobre el stock total (todos los almacenes)
+            current_total_stock = totals[product_id]
+            current_total_value = current_total_stock * product['price']
+            incoming_total_value = quantity_received * float(po_prices[po_item_id])
+            new_total_quantity = current_total_stock + quantity_received
+            if new_total_quantity > 0:
+                product['price'] = (current_total_value + incoming_total_value) / new_total_quantity
+            totals[product_id] = new_total_quantity
+
+            kardex_rows.append({
+                'product_id': product_id,
+                'warehouse_id': warehouse_id,
+                'quantity_change': quantity_received,
+                'new_quantity': new_quantity,
+                'type': "Recepción de Compra",
+                'user_id': user_id,
+                'reference': reference
+            })
+
+        # --- 4. Escritura en bloque ---
+        db.session.bulk_update_mappings(PurchaseOrderItem, [
+            {'id': po_item_id, 'product_id': product_id} for po_item_id, product_id in po_item_updates.items()
+        ])
+        db.session.bulk_update_mappings(Product, [
+            {'id': product_id, 'standard_price': products[product_id]['price']}
+            for product_id in received
+        ])
+        product_location_service.replace_in_warehouse(locations, warehouse_id)
+        db.session.bulk_insert_mappings(InventoryTransaction, kardex_rows)
+        # Precio promedio y ubicaciones: el catálogo cambió para estos productos
+        catalog_change_service.record(catalog_change_service.PRODUCT, received)
+
+    # --- 5. Marcar la Orden de Compra como "Recibida" ---
+    received_status = OrderStatus.query.filter_by(name='Recibida').first()
+    if order and received_status:
+        order.status_id = received_status.id
+
+    return len(lines)
@@ -0,0 +1,98 @@
+from sqlalchemy import case
+from ..extensions import db
+from ..models.product_catalog import SkuSequence
+from .sql_helpers import upsert_insert
+
+
+# --- Secuencias de SKU por prefijo ---
+# Un SKU que es solo un prefijo en mayúsculas ("CEL") se completa con el siguiente
+# número de ese prefijo: CEL-001, CEL-002... La tabla sku_sequences guarda el último
+# número entregado; allocate() reserva un rango entero con un único UPSERT ... RETURNING,
+# así una importación de miles de filas hace una consulta por prefijo y dos workers
+# nunca reciben el mismo número (la fila queda bloqueada hasta el commit).
+# Los SKUs con formato PREFIJO-NNN escritos a mano también adelantan la secuencia
+# (observe()), para que después no se genere uno repetido.
+# No hace commit: la ruta decide cuándo confirmar la transacción.
+
+_MAX_DIGITS = 9  # last_value es Integer: números más largos no se registran
+
+
+def is_prefix(sku):
+    """True si el SKU es solo un prefijo a completar (alfabético y en mayúsculas)."""
+    return sku.isalpha() and sku.isupper()
+
+
+def format_sku(prefix, number):
+    return f"{prefix}-{number:03d}" # Formato de 3 dígitos (e.g., CEL-001)
+
+
+def parse(sku):
+    """(prefijo, número) si el SKU tiene el formato PREFIJO-NNN; si no, None."""
+    prefix, dash, number = str(sku).rpartition('-')
+    if dash and is_prefix(prefix) and number.isascii() and number.isdigit() and len(number) <= _MAX_DIGITS:
+        return prefix, int(number)
+    return None
+
+
+def allocate(prefix, count=1):
+    """Reserva 'count' números seguidos para el prefijo. Devuelve el range() reservado."""
+    table = SkuSequence.__table__
+    insert = upsert_insert()
+
+    if insert is not None:
+        stmt = insert(table).values(prefix=prefix, last_value=count)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.prefix],
+            set_={'last_value': table.c.last_value + stmt.excluded.last_value}
+        ).returning(table.c.last_value)
+        last = db.session.execute(stmt).scalar()
+    else:
+        # Otros motores: UPDATE atómico y, si no había fila, INSERT
+        last = db.session.execute(
+            table.update().where(table.c.prefix == prefix)
+            .values(last_value=table.c.last_value + count)
+            .returning(table.c.last_value)
+        ).scalar()
+        if last is None:
+            db.session.execute(table.insert().values(prefix=prefix, last_value=count))
+            last = count
+    return range(last - count + 1, last + 1)
+
+
+def generate(prefix, count=1):
+    """Los siguientes 'count' SKUs del prefijo: ['CEL-004', 'CEL-005', ...]."""
+    return [format_sku(prefix, number) for number in allocate(prefix, count)]
+
+
+def observe(skus):
+    """Adelanta las secuencias hasta el mayor PREFIJO-NNN de 'skus' (una sentencia para todos)."""
+    highest = {}
+    for sku in skus:
+        parsed = parse(sku)
+        if parsed and parsed[1] > highest.get(parsed[0], 0):
+            highest[parsed[0]] = parsed[1]
+    if not highest:
+        return
+
+    table = SkuSequence.__table__
+    insert = upsert_insert()
+    rows = [{'prefix': prefix, 'last_value': number} for prefix, number in highest.items()]
+
+    if insert is not None:
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.prefix],
+            set_={'last_value': case((table.c.last_value < stmt.excluded.last_value, stmt.excluded.last_value),
+                                     else_=table.c.last_value)}
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    for row in rows:
+        updated = db.session.execute(
+            table.update().where(table.c.prefix == row['prefix'])
+            .values(last_value=case((table.c.last_value < row['last_value'], row['last_value']),
+                                    else_=table.c.last_value))
+        ).rowcount
+        if not updated:
+            db.session.execute(table.insert().values(**row))
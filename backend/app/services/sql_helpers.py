@@ -0,0 +1,26 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from ..extensions import db
+
+IN_CHUNK_SIZE = 500  # Tamaño de los IN (...) para no pasar el límite de parámetros de SQLite
+
+
+# --- Utilidades SQL compartidas por los servicios ---
+
+def upsert_insert():
+    """
+    El insert() del motor actual que admite on_conflict_do_update (PostgreSQL o SQLite).
+    Devuelve None con otros motores: quien llama hace UPDATE y, si no había fila, INSERT.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert
+    if dialect == 'sqlite':
+        return sqlite.insert
+    return None
+
+
+def chunks(values, size=IN_CHUNK_SIZE):
+    """Parte 'values' en listas de hasta 'size' elementos (para armar varios IN (...))."""
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
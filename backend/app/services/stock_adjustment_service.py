@@ -0,0 +1,123 @@
+import pandas as pd
+from ..extensions import db
+from ..models.inventory_models import InventoryStock, InventoryTransaction
+from ..models.product_catalog import Product
+from . import stock_totals_service, product_location_service, catalog_change_service
+from .sql_helpers import chunks
+
+
+def _clean_location(value):
+    if pd.isna(value):
+        return None
+    location = str(value).strip()
+    return location or None
+
+
+# --- Ajuste Masivo Vectorizado ---
+# Toda la hoja se resuelve con operaciones sobre DataFrames:
+#   1. SKU -> product_id con un merge contra un frame leído en bloque.
+#   2. Diferencias contra una única lectura del stock del almacén.
+#   3. Upsert de InventoryStock y alta de InventoryTransaction en bloque.
+# Las filas repetidas de un mismo SKU se procesan en orden, igual que el bucle anterior:
+# cada una se compara contra la cantidad que dejó la fila previa.
+
+def adjust_stock_mass(df, warehouse_id, user_id):
+    """
+    Ajusta el stock del almacén a las cantidades de la hoja (columnas SKU, Cantidad, Locacion).
+    Devuelve (updated_count, errors). No hace commit.
+    """
+    warehouse_id = int(warehouse_id)
+
+    rows = pd.DataFrame({
+        'row': range(len(df)),
+        'sku': df['SKU'].astype(str).str.strip().values,
+        'quantity': pd.to_numeric(df['Cantidad'], errors='coerce').values,
+        'location': df['Locacion'].map(_clean_location).values
+    })
+
+    # --- Cantidades inválidas ---
+    invalid_qty = rows['quantity'].isna()
+    errors = [(row, f"SKU {sku}: Cantidad inválida.") for row, sku in
+              zip(rows.loc[invalid_qty, 'row'], rows.loc[invalid_qty, 'sku'])]
+    rows = rows[~invalid_qty]
+
+    # --- 1. Resolver SKUs contra la tabla de productos ---
+    sku_frame = pd.DataFrame(
+        [(sku, product_id) for chunk in chunks(rows['sku'].unique())
+         for product_id, sku in db.session.query(Product.id, Product.sku).filter(Product.sku.in_(chunk)).all()],
+        columns=['sku', 'product_id']
+    )
+    rows = rows.merge(sku_frame, on='sku', how='left')
+
+    not_found = rows['product_id'].isna()
+    errors += [(row, f"SKU no encontrado: {sku}") for row, sku in
+               zip(rows.loc[not_found, 'row'], rows.loc[not_found, 'sku'])]
+    rows = rows[~not_found].sort_values('row', kind='stable')
+    rows['product_id'] = rows['product_id'].astype(int)
+
+    errors = [message for _, message in sorted(errors, key=lambda e: e[0])]
+    if rows.empty:
+        return 0, errors
+
+    # --- 2. Lectura del stock actual en bloque ---
+    product_ids = [int(pid) for pid in rows['product_id'].unique()]
+    stock_frame = pd.DataFrame(
+        [(stock_id, product_id, float(quantity)) for chunk in chunks(product_ids)
+         for stock_id, product_id, quantity in
+         db.session.query(InventoryStock.id, InventoryStock.product_id, InventoryStock.quantity)
+         .filter(InventoryStock.warehouse_id == warehouse_id, InventoryStock.product_id.in_(chunk)).all()],
+        columns=['stock_id', 'product_id', 'current']
+    )
+    rows = rows.merge(stock_frame, on='product_id', how='left')
+    rows['current'] = rows['current'].fillna(0.0)
+
+    # Cada fila se compara contra la fila anterior del mismo producto (o el stock actual)
+    previous = rows.groupby('product_id')['quantity'].shift(1)
+    rows['difference'] = rows['quantity'] - previous.fillna(rows['current'])
+    changed = rows[rows['difference'] != 0]
+
+    per_product = rows.groupby('product_id').agg(
+        stock_id=('stock_id', 'first'),
+        current=('current', 'first'),
+        final=('quantity', 'last'),
+        location=('location', 'last')  # 'last' ignora los nulos: gana la última ubicación informada
+    )
+
+    # --- 3. Escritura en bloque ---
+    existing = per_product[per_product['stock_id'].notna()]
+    missing = per_product[per_product['stock_id'].isna()]
+
+    db.session.bulk_update_mappings(InventoryStock, [
+        {'id': int(stock_id), 'quantity': float(final)}
+        for stock_id, final, current in zip(existing['stock_id'], existing['final'], existing['current'])
+        if final != current
+    ])
+    db.session.bulk_insert_mappings(InventoryStock, [
+        {'product_id': int(product_id), 'warehouse_id': warehouse_id, 'quantity': float(final)}
+        for product_id, final in zip(missing.index, missing['final'])
+    ])
+    db.session.bulk_insert_mappings(InventoryTransaction, [
+        {
+            'product_id': int(product_id),
+            'warehouse_id': warehouse_id,
+            'quantity_change': float(difference),
+            'new_quantity': float(quantity),
+            'type': "Carga Inicial / Ajuste",
+            'user_id': user_id
+        }
+        for product_id, difference, quantity in zip(changed['product_id'], changed['difference'], changed['quantity'])
+    ])
+
+    with_location = per_product[per_product['location'].notna()]
+    product_location_service.replace_in_warehouse({
+        int(product_id): location
+        for product_id, location in zip(with_location.index, with_location['location'])
+    }, warehouse_id)
+
+    stock_totals_service.apply_deltas({
+        int(product_id): float(final - current)
+        for product_id, final, current in zip(per_product.index, per_product['final'], per_product['current'])
+    })
+    catalog_change_service.record(catalog_change_service.PRODUCT, with_location.index)  # Ubicaciones del catálogo
+
+    return len(changed), errors
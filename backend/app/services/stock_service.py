@@ -0,0 +1,106 @@
+from ..extensions import db
+from ..models.inventory_models import InventoryStock
+from .sql_helpers import upsert_insert
+
+
+# --- Movimientos de stock atómicos ---
+# El stock nunca se lee a Python para restarlo y volver a escribirlo: cada movimiento
+# es una única sentencia UPDATE/UPSERT que calcula la cantidad en la BD y devuelve el
+# saldo resultante (RETURNING) para la fila del Kardex. Así dos workers que mueven el
+# mismo producto a la vez no se pisan: la BD los ordena y la condición
+# 'quantity >= :q' impide dejar stock negativo.
+# No hace commit: la ruta decide cuándo confirmar la transacción.
+
+class InsufficientStockError(ValueError):
+    """No hay stock suficiente del producto en el almacén."""
+
+    def __init__(self, product_id, warehouse_id, quantity):
+        self.product_id = product_id
+        self.warehouse_id = warehouse_id
+        self.quantity = quantity
+        super().__init__(f"Stock insuficiente del producto ID {product_id} en el almacén ID {warehouse_id}.")
+
+
+def decrement(product_id, warehouse_id, quantity):
+    """
+    Descuenta 'quantity' solo si alcanza el stock. Devuelve el saldo resultante.
+    Lanza InsufficientStockError si no hay fila o no alcanza.
+    """
+    table = InventoryStock.__table__
+    new_quantity = db.session.execute(
+        table.update()
+        .where(table.c.product_id == product_id,
+               table.c.warehouse_id == warehouse_id,
+               table.c.quantity >= quantity)
+        .values(quantity=table.c.quantity - quantity)
+        .returning(table.c.quantity)
+    ).scalar()
+    if new_quantity is None:
+        raise InsufficientStockError(product_id, warehouse_id, quantity)
+    return float(new_quantity)
+
+
+def increment(product_id, warehouse_id, quantity):
+    """Suma 'quantity' (creando la fila si no existe). Devuelve el saldo resultante."""
+    table = InventoryStock.__table__
+    insert = upsert_insert()
+
+    if insert is not None:
+        stmt = insert(table).values(product_id=product_id, warehouse_id=warehouse_id, quantity=quantity)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.product_id, table.c.warehouse_id],
+            set_={'quantity': table.c.quantity + stmt.excluded.quantity}
+        ).returning(table.c.quantity)
+        return float(db.session.execute(stmt).scalar())
+
+    # Otros motores: UPDATE atómico y, si no había fila, INSERT
+    new_quantity = db.session.execute(
+        table.update()
+        .where(table.c.product_id == product_id, table.c.warehouse_id == warehouse_id)
+        .values(quantity=table.c.quantity + quantity)
+        .returning(table.c.quantity)
+    ).scalar()
+    if new_quantity is None:
+        db.session.execute(table.insert().values(product_id=product_id, warehouse_id=warehouse_id,
+                                                 quantity=quantity))
+        new_quantity = quantity
+    return float(new_quantity)
+
+
+def _apply(lines, warehouse_id, move):
+    # Una sentencia por producto con la cantidad sumada de sus líneas; el saldo de
+    # cada línea se reconstruye hacia atrás desde el saldo final que devuelve la BD.
+    per_product = {}
+    for product_id, quantity in lines:
+        per_product[product_id] = per_product.get(product_id, 0.0) + quantity
+
+    return {product_id: move(product_id, warehouse_id, quantity)
+            for product_id, quantity in per_product.items()}
+
+
+def remove_lines(warehouse_id, lines):
+    """
+    Descuenta del almacén cada (product_id, cantidad) de 'lines'.
+    Devuelve el saldo después de cada línea, en el mismo orden (para el Kardex).
+    """
+    finals = _apply(lines, warehouse_id, decrement)
+    balances = []
+    remaining = dict(finals)
+    for product_id, quantity in reversed(lines):
+        balances.append(remaining[product_id])
+        remaining[product_id] += quantity
+    return balances[::-1]
+
+
+def add_lines(warehouse_id, lines):
+    """
+    Suma al almacén cada (product_id, cantidad) de 'lines'.
+    Devuelve el saldo después de cada línea, en el mismo orden (para el Kardex).
+    """
+    finals = _apply(lines, warehouse_id, increment)
+    balances = []
+    remaining = dict(finals)
+    for product_id, quantity in reversed(lines):
+        balances.append(remaining[product_id])
+        remaining[product_id] -= quantity
+    return balances[::-1]
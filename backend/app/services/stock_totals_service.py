@@ -0,0 +1,108 @@
+from sqlalchemy import bindparam
+from ..extensions import db
+from ..models.inventory_models import InventoryStock, ProductStockTotal
+from .sql_helpers import upsert_insert
+
+
+# --- Stock total materializado por producto ---
+# Cada movimiento de stock llama a apply_deltas() con el cambio neto por producto.
+# Si un producto todavía no tiene fila, se inicializa con el SUM real de inventory_stock
+# (que ya incluye el movimiento, porque se hace flush antes). Si otro worker crea esa
+# misma fila entre la lectura y el INSERT, el UPSERT le suma el cambio de este en vez
+# de fallar por la clave primaria.
+# No hace commit: la ruta (o el comando) decide cuándo confirmar la transacción.
+
+
+def _sum_stock(product_ids):
+    query = db.session.query(InventoryStock.product_id, db.func.sum(InventoryStock.quantity)) \
+        .group_by(InventoryStock.product_id)
+    if product_ids is not None:
+        query = query.filter(InventoryStock.product_id.in_(product_ids))
+    return {product_id: float(total or 0) for product_id, total in query.all()}
+
+
+def get_totals(product_ids):
+    """Devuelve {product_id: stock total}. Los productos sin fila se calculan con SUM."""
+    product_ids = set(product_ids)
+    totals = {
+        product_id: float(quantity)
+        for product_id, quantity in db.session.query(ProductStockTotal.product_id, ProductStockTotal.quantity)
+        .filter(ProductStockTotal.product_id.in_(product_ids)).all()
+    }
+    missing = product_ids - set(totals)
+    if missing:
+        sums = _sum_stock(missing)
+        for product_id in missing:
+            totals[product_id] = sums.get(product_id, 0.0)
+    return totals
+
+
+def apply_deltas(deltas):
+    """Suma a cada producto su cambio neto de stock: {product_id: delta}."""
+    deltas = {product_id: float(delta) for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    db.session.flush()
+    table = ProductStockTotal.__table__
+
+    existing = {
+        product_id for (product_id,) in db.session.query(ProductStockTotal.product_id)
+        .filter(ProductStockTotal.product_id.in_(deltas)).all()
+    }
+    if existing:
+        db.session.execute(
+            table.update()
+            .where(table.c.product_id == bindparam('b_product_id'))
+            .values(quantity=table.c.quantity + bindparam('b_delta')),
+            [{'b_product_id': product_id, 'b_delta': deltas[product_id]} for product_id in existing]
+        )
+
+    missing = set(deltas) - existing
+    if missing:
+        sums = _sum_stock(missing)
+        insert = upsert_insert()
+        if insert is not None:
+            # Fila nueva: el SUM real; si ya la creó otro worker, su total + el cambio de este
+            stmt = insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.product_id],
+                set_={'quantity': table.c.quantity + bindparam('b_delta')}
+            )
+            db.session.execute(stmt, [
+                {'product_id': product_id, 'quantity': sums.get(product_id, 0.0), 'b_delta': deltas[product_id]}
+                for product_id in missing
+            ])
+        else:
+            db.session.execute(table.insert(), [
+                {'product_id': product_id, 'quantity': sums.get(product_id, 0.0)} for product_id in missing
+            ])
+
+
+def rebuild(fix=True):
+    """
+    Compara product_stock_totals con inventory_stock.
+    Devuelve la lista de diferencias [(product_id, guardado, real)] y, si fix=True, las corrige
+    (sin commit: lo hace quien llama).
+    """
+    real = _sum_stock(None)
+    stored = {
+        product_id: float(quantity)
+        for product_id, quantity in db.session.query(ProductStockTotal.product_id, ProductStockTotal.quantity).all()
+    }
+
+    mismatches = []
+    for product_id in sorted(set(real) | set(stored)):
+        real_qty = real.get(product_id, 0.0)
+        stored_qty = stored.get(product_id)
+        if stored_qty is None or abs(stored_qty - real_qty) > 0.005:
+            mismatches.append((product_id, stored_qty, real_qty))
+
+    if fix and mismatches:
+        table = ProductStockTotal.__table__
+        db.session.execute(table.delete())
+        db.session.execute(table.insert(), [
+            {'product_id': product_id, 'quantity': quantity} for product_id, quantity in real.items()
+        ])
+
+    return mismatches
@@ -0,0 +1,85 @@
+import csv
+import io
+from flask import Response, current_app, stream_with_context
+from ..extensions import db
+from .xlsx_stream import iter_xlsx
+
+
+# --- Recorrido de consultas grandes por lotes ---
+# yield_per activa 'stream_results': en PostgreSQL se usa un cursor del lado del
+# servidor (las filas llegan de a lotes, no todas juntas a la memoria del worker);
+# en SQLite se leen del cursor de a lotes igual.
+# Las filas se leen recién al enviar la respuesta, cuando Flask-SQLAlchemy ya cerró la
+# sesión con la que la ruta armó la consulta: si se ejecutara en esa sesión, nadie la
+# volvería a cerrar y su conexión quedaría con la transacción abierta hasta el recolector
+# de basura (con candados y ocupando el pool). Por eso la consulta se pasa a la sesión
+# actual, que se cierra al terminar la respuesta.
+
+def stream_rows(query, batch_size=None):
+    """Recorre la consulta de a 'batch_size' filas, en la sesión activa al momento de leerla."""
+    query = query.execution_options(yield_per=batch_size or current_app.config.get('STREAM_BATCH_SIZE', 1000))
+
+    def rows():
+        yield from query.with_session(db.session())
+
+    return rows()
+
+
+def json_array_response(rows, serialize, batch_size=None, before='', after=''):
+    """
+    Respuesta JSON con una lista, escrita a medida que se leen las filas.
+    El resultado es el mismo que jsonify([serialize(row) for row in rows]), pero sin
+    armar la lista completa en memoria.
+    'before'/'after': JSON ya armado que envuelve la lista (p. ej. '{"items":' y '}').
+    """
+    batch_size = batch_size or current_app.config.get('STREAM_BATCH_SIZE', 1000)
+    dumps = current_app.json.dumps
+    compact = {'separators': (',', ':')}  # Mismo formato compacto que jsonify()
+
+    def generate():
+        yield before + '['
+        separator = ''
+        buffer = []
+        for row in rows:
+            buffer.append(dumps(serialize(row), **compact))
+            if len(buffer) >= batch_size:
+                yield separator + ','.join(buffer)
+                separator = ','
+                buffer = []
+        if buffer:
+            yield separator + ','.join(buffer)
+        yield ']' + after + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+def csv_response(header, rows, filename, batch_size=None):
+    """
+    Archivo CSV escrito a medida que se leen las filas ('rows': listas de valores).
+    Va con BOM UTF-8 para que Excel respete las tildes (la importación lo acepta igual).
+    """
+    batch_size = batch_size or current_app.config.get('STREAM_BATCH_SIZE', 1000)
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        buffer.write('\ufeff')
+        writer.writerow(header)
+        for count, values in enumerate(rows, start=1):
+            writer.writerow(values)
+            if count % batch_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return Response(stream_with_context(generate()), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+
+def xlsx_response(header, rows, filename, sheet_name='Hoja1', batch_size=None):
+    """Archivo Excel escrito a medida que se leen las filas (ver xlsx_stream.py)."""
+    batch_size = batch_size or current_app.config.get('STREAM_BATCH_SIZE', 1000)
+    return Response(stream_with_context(iter_xlsx(header, rows, sheet_name, batch_size)),
+                    mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
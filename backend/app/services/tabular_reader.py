@@ -0,0 +1,116 @@
+import codecs
+import csv
+import os
+import pandas as pd
+from openpyxl import load_workbook
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+# --- Lector por streaming para todas las importaciones (Excel y CSV) ---
+class TabularReader:
+    """
+    Lee un archivo subido (.xlsx o .csv) fila por fila, sin cargar el libro completo.
+    - Excel: openpyxl en modo read_only (itera filas sin construir el libro en memoria).
+    - CSV: csv.reader sobre el stream, decodificado de forma incremental.
+    La primera fila es la cabecera. iter_chunks() entrega DataFrames de 'chunk_size'
+    filas con solo las columnas pedidas; el índice de cada chunk es la posición de
+    la fila de datos (0 = primera, sin contar filas vacías), igual que pd.read_excel.
+
+    Uso:
+        with TabularReader(file) as reader:
+            if 'SKU' not in reader.columns: ...
+            for chunk in reader.iter_chunks(['SKU', 'Cantidad']): ...
+    """
+
+    def __init__(self, file, filename=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.filename = filename or getattr(file, 'filename', None) or ''
+        self.chunk_size = chunk_size
+        self._stream = getattr(file, 'stream', file)
+        self._workbook = None
+        self._rows = None
+
+        if os.path.splitext(self.filename)[1].lower() == '.csv':
+            self._rows = self._iter_csv()
+        else:
+            self._workbook = load_workbook(self._stream, read_only=True, data_only=True)
+            self._rows = self._iter_excel()
+
+        header = next(self._rows, None) or []
+        self.columns = [
+            str(value).strip() if value is not None else f"Unnamed: {i}"
+            for i, value in enumerate(header)
+        ]
+        self._consumed = False
+
+    # --- Fuentes ---
+    def _iter_excel(self):
+        sheet = self._workbook.worksheets[0]
+        for values in sheet.iter_rows(values_only=True):
+            if all(value is None or value == '' for value in values):
+                continue  # Filas vacías (openpyxl también reporta filas "fantasma" al final)
+            yield values
+
+    def _iter_csv(self):
+        decoder = codecs.getreader('utf-8-sig')(self._stream)
+        for values in csv.reader(decoder):
+            if not any(value.strip() for value in values):
+                continue
+            # Celdas vacías -> None (igual que NaN en pandas: pd.notna() da False)
+            yield [value if value.strip() != '' else None for value in values]
+
+    # --- API pública ---
+    def iter_chunks(self, columns, chunk_size=None, converters=None):
+        """
+        Entrega DataFrames con las columnas pedidas que existan en el archivo.
+        'converters' permite tipar columnas: {'Cantidad': float, ...} (None se respeta).
+        Solo se puede recorrer una vez.
+        """
+        if self._consumed:
+            raise RuntimeError("El archivo ya fue leído.")
+        self._consumed = True
+
+        chunk_size = chunk_size or self.chunk_size
+        wanted = [(self.columns.index(col), col) for col in columns if col in self.columns]
+        names = [col for _, col in wanted]
+        converters = converters or {}
+
+        buffer = []
+        start = 0
+        for values in self._rows:
+            record = []
+            for index, col in wanted:
+                value = values[index] if index < len(values) else None
+                if value is not None and col in converters:
+                    value = converters[col](value)
+                record.append(value)
+            buffer.append(record)
+            if len(buffer) >= chunk_size:
+                yield pd.DataFrame(buffer, columns=names, index=range(start, start + len(buffer)))
+                start += len(buffer)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=names, index=range(start, start + len(buffer)))
+
+    def iter_rows(self, columns, chunk_size=None):
+        """Como iter_chunks(), pero entrega (índice, fila) igual que DataFrame.iterrows()."""
+        for chunk in self.iter_chunks(columns, chunk_size):
+            yield from chunk.iterrows()
+
+    def read_frame(self, columns, converters=None):
+        """Lee todo el archivo, pero solo las columnas pedidas, en un único DataFrame."""
+        chunks = list(self.iter_chunks(columns, converters=converters))
+        if not chunks:
+            return pd.DataFrame(columns=[col for col in columns if col in self.columns])
+        return pd.concat(chunks)
+
+    def close(self):
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,191 @@
+import os
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from itertools import groupby
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+
+# --- PRAGMAs de SQLite al abrir cada conexión ---
+def register_sqlite_pragmas(engine, busy_timeout_ms=5000):
+    """
+    WAL: los lectores (reportes, Kardex) leen su foto de la BD sin esperar al escritor.
+    synchronous=NORMAL: en WAL sigue siendo seguro ante caídas del proceso y hace menos fsync.
+    busy_timeout: si otro proceso tiene el candado de escritura, se espera en vez de fallar.
+
+    Además, el BEGIN lo manda SQLAlchemy y no el driver (receta de SQLAlchemy para
+    pysqlite): sqlite3 no abre la transacción antes de un SAVEPOINT, así que el primer
+    begin_nested() la abría con el SAVEPOINT y su RELEASE confirmaba en el acto; la
+    cola de escritura hacía un commit por trabajo en vez de uno por grupo.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None  # El driver no emite BEGIN/COMMIT por su cuenta
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def _begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+
+# --- Cola de escritura única ---
+class WriteQueue:
+    """
+    Canaliza las escrituras de stock por un único hilo escritor (uno por proceso).
+    Cada trabajo es una función que usa db.session sin hacer commit; el escritor junta
+    los trabajos que haya en cola, corre cada uno dentro de un SAVEPOINT (si uno falla,
+    solo se deshace ese) y confirma todo el grupo con un único commit.
+    Quien envía el trabajo espera el resultado en un Future.
+
+    Con WRITE_QUEUE_ENABLED = False (o None con un motor que no es SQLite) el trabajo
+    se ejecuta en la misma petición y se confirma ahí mismo.
+
+    Uso:
+        transfer_id = write_queue.run(create_transfer_job, data, user_id)
+    Los trabajos deben devolver valores simples (ids, dicts), no objetos del ORM.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.max_batch = 32
+        self.timeout = 60
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.jobs = 0
+        self.commits = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from ..extensions import db
+
+        self.app = app
+        self.max_batch = app.config.get('WRITE_QUEUE_MAX_BATCH', 32)
+        self.timeout = app.config.get('WRITE_QUEUE_TIMEOUT', 60)
+        enabled = app.config.get('WRITE_QUEUE_ENABLED')
+        if enabled is None:
+            enabled = app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite')
+        self.enabled = enabled
+
+        with app.app_context():
+            register_sqlite_pragmas(db.engine, app.config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+
+    # --- API pública ---
+    def submit(self, fn, *args, **kwargs):
+        """Encola 'fn(*args, **kwargs)' y devuelve un Future con su resultado."""
+        if not self.enabled or threading.current_thread() is self._thread:
+            # Sin cola (o llamado desde el propio escritor): se ejecuta aquí mismo
+            future = Future()
+            try:
+                future.set_result(self._run_inline(fn, args, kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        future = Future()
+        self._ensure_thread()
+        # El trabajo se corre en la app que lo envió (varias apps en un proceso: p. ej. las pruebas)
+        app = current_app._get_current_object() if has_app_context() else self.app
+        self._queue.put((app, fn, args, kwargs, future))
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        """
+        Como submit(), pero espera el resultado (o relanza la excepción del trabajo).
+        Si pasan 'timeout' segundos y el trabajo sigue en cola, se cancela (el escritor lo
+        salta) y se lanza TimeoutError: no se aplicó, así que reintentar es seguro. Si ya
+        empezó, se espera a que termine, para no responder error por algo que igual se
+        confirma (p. ej. una recepción que el cliente reintentaría y quedaría duplicada).
+        """
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            if future.cancel():
+                raise TimeoutError(f"La cola de escritura no atendió el trabajo en {self.timeout} s; "
+                                   "no se aplicó ningún cambio") from None
+            return future.result()
+
+    def stats(self):
+        return {'enabled': self.enabled, 'pending': self._queue.qsize(),
+                'jobs': self.jobs, 'commits': self.commits}
+
+    # --- Internos ---
+    def _run_inline(self, fn, args, kwargs):
+        from ..extensions import db
+
+        if threading.current_thread() is self._thread:
+            return fn(*args, **kwargs)  # El escritor confirma al final del grupo
+        try:
+            result = fn(*args, **kwargs)
+            db.session.commit()
+            return result
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Proceso nuevo (fork de gunicorn): el hilo del padre no existe aquí
+                self._queue = queue.Queue()
+                self._thread = None
+                self._pid = os.getpid()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name='write-queue', daemon=True)
+                self._thread.start()
+
+    def _worker(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for app, jobs in groupby(batch, key=lambda job: job[0]):
+                with app.app_context():
+                    self._process([job[1:] for job in jobs])
+
+    def _process(self, batch):
+        from ..extensions import db
+
+        done = []
+        try:
+            for fn, args, kwargs, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with db.session.begin_nested():
+                        result = fn(*args, **kwargs)
+                    done.append((future, result))
+                except Exception as e:
+                    future.set_exception(e)
+
+            # --- Commit de grupo: un solo commit para todos los trabajos del lote ---
+            if done:
+                db.session.commit()
+                self.commits += 1
+        except Exception as e:
+            db.session.rollback()
+            print(f"--- ERROR EN LA COLA DE ESCRITURA: {e} ---")
+            for future, _ in done:
+                future.set_exception(e)
+            return
+        finally:
+            db.session.close()
+
+        self.jobs += len(done)
+        for future, result in done:
+            future.set_result(result)
@@ -0,0 +1,56 @@
+"""
+Utilidades compartidas por los benchmarks.
+Cada benchmark crea la app contra una BD SQLite temporal (nunca toca instance/app.db).
+Uso: desde la carpeta 'backend' ->  python -m benchmarks.bench_receive
+"""
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def make_app(db_path=None):
+    """Crea la app apuntando a una BD SQLite temporal y una caché en memoria."""
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='bench_'), 'bench.db')
+    from config import Config
+    from app import create_app
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+        CACHE_BACKEND = 'memory'
+
+    return create_app(BenchConfig)
+
+
+class QueryCounter:
+    """Cuenta las sentencias SQL ejecutadas por el engine mientras está activo."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        from sqlalchemy import event
+        self.count = 0
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+@contextmanager
+def timer(result):
+    start = time.perf_counter()
+    yield
+    result['seconds'] = time.perf_counter() - start
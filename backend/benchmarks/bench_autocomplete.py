@@ -0,0 +1,76 @@
+"""
+Benchmark del índice de autocompletado en memoria con un catálogo grande.
+Mide el armado (tiempo y memoria), la búsqueda corta en memoria frente a la de la BD
+(products_fts) y la actualización incremental de un producto.
+
+    python -m benchmarks.bench_autocomplete --products 200000
+"""
+import argparse
+import statistics
+import time
+import tracemalloc
+import warnings
+
+from benchmarks._common import make_app
+from benchmarks.bench_search import seed
+
+QUERIES = ['c', 'ca', 'ta', 'p', 'pr', '0', '01', 'te', 'z']
+
+
+def percentiles(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return statistics.median(times), times[max(0, int(len(times) * 0.95) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    from app.extensions import autocomplete, db
+    from app.services import product_search_service
+
+    app = make_app()
+    with app.app_context():
+        seed(db, args.products)
+
+        start = time.perf_counter()
+        autocomplete.build()
+        seconds = time.perf_counter() - start
+
+        # La memoria se mide en otro armado: tracemalloc hace mucho más lento el de arriba
+        tracemalloc.start()
+        autocomplete.build()
+        memory = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+        tracemalloc.stop()
+        stats = autocomplete.stats()
+        print(f"Índice armado en {seconds:.2f} s | {memory:.1f} MB | "
+              f"{stats['prefixes']} prefijos, {stats['entries']} entradas")
+
+        print(f"{'texto':<6} {'memoria p50':>12} {'p95':>9} | {'BD (fts5) p50':>14} {'p95':>9}")
+        for term in QUERIES:
+            mem_p50, mem_p95 = percentiles(lambda: autocomplete.lookup(term, 20), args.repeat)
+            autocomplete.enabled = False
+            db_p50, db_p95 = percentiles(lambda: product_search_service.search_product_ids(term, 20),
+                                         max(1, args.repeat // 10))
+            autocomplete.enabled = True
+            print(f"{term:<6} {mem_p50 * 1000:9.1f} µs {mem_p95 * 1000:6.1f} µs | "
+                  f"{db_p50:11.2f} ms {db_p95:6.2f} ms")
+
+        version = autocomplete.stats()['version']
+        upsert_p50, upsert_p95 = percentiles(
+            lambda: autocomplete.upsert([(1, 'PRD-000000', 'Cable Térmico Renombrado #12')], version),
+            args.repeat)
+        print(f"Actualización incremental de un producto: p50 {upsert_p50 * 1000:.1f} µs, "
+              f"p95 {upsert_p95 * 1000:.1f} µs")
+
+
+if __name__ == '__main__':
+    main()
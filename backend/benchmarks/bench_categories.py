@@ -0,0 +1,128 @@
+"""
+Benchmark del árbol de categorías: Category.to_dict() con el padre cargado fila por fila
+(como antes, lazy='select') frente a la carga en bloque (selectin), con todas las
+categorías y con solo las hojas (sus padres no vienen en el mismo resultado), y
+"productos de Cables con todas sus subcategorías" recorriendo parent_id nivel por nivel
+frente a la tabla de clausura.
+
+    python -m benchmarks.bench_categories --categories 2000 --depth 6 --products 50000
+"""
+import argparse
+import random
+
+from benchmarks._common import make_app, QueryCounter, timer
+
+
+def seed(db, n_categories, depth, n_products):
+    """Árbol de 'depth' niveles con n_categories categorías y productos repartidos al azar."""
+    from sqlalchemy import text
+    from app.models.product_catalog import Category
+    from app.services import category_tree_service
+
+    rng = random.Random(25)
+    levels = [[]]
+    categories = []
+    for i in range(n_categories):
+        level = min(depth - 1, i * depth // n_categories)
+        while len(levels) <= level:
+            levels.append([])
+        parent = rng.choice(levels[level - 1]) if level and levels[level - 1] else None
+        category = Category(name=f"Categoría {i:05d}", parent=parent)
+        levels[level].append(category)
+        categories.append(category)
+    db.session.add_all(categories)
+    db.session.flush()
+    category_tree_service.rebuild()
+    db.session.execute(text(
+        "INSERT INTO products (sku, name, unit_of_measure, standard_price, category_id) "
+        "VALUES (:sku, :name, 'UND', 0, :category_id)"),
+        [{'sku': f"CAT-{i:06d}", 'name': f"Producto {i}", 'category_id': rng.choice(categories).id}
+         for i in range(n_products)])
+    db.session.commit()
+
+    # La raíz con el subárbol más grande
+    from app.models.product_catalog import CategoryClosure
+    return db.session.query(CategoryClosure.ancestor_id) \
+        .filter(CategoryClosure.ancestor_id.in_([category.id for category in levels[0]])) \
+        .group_by(CategoryClosure.ancestor_id) \
+        .order_by(db.func.count().desc(), CategoryClosure.ancestor_id).limit(1).scalar()
+
+
+def legacy_list(db, leaves_only=False):
+    """Como to_dict() antes del cambio: el padre se carga fila por fila (lazy='select')."""
+    from sqlalchemy.orm import lazyload
+    from app.models.product_catalog import Category
+    return _list(Category.query.options(lazyload(Category.parent)), leaves_only)
+
+
+def eager_list(db, leaves_only=False):
+    from app.models.product_catalog import Category
+    return _list(Category.query, leaves_only)
+
+
+def _list(query, leaves_only):
+    """Todas las categorías, o solo las hojas (sus padres no vienen en el mismo resultado)."""
+    from app.models.product_catalog import Category
+    if leaves_only:
+        parents = Category.query.with_entities(Category.parent_id).filter(Category.parent_id.isnot(None))
+        query = query.filter(Category.id.notin_(parents))
+    return [c.to_dict() for c in query.order_by(Category.name).all()]
+
+
+def legacy_subtree_products(db, category_id):
+    """Sin la tabla de clausura: una consulta por nivel del árbol para juntar los ids."""
+    from app.models.product_catalog import Category, Product
+    ids, frontier = {category_id}, [category_id]
+    while frontier:
+        frontier = [row.id for row in db.session.query(Category.id).filter(Category.parent_id.in_(frontier))]
+        ids.update(frontier)
+    return sorted(p.id for p in db.session.query(Product.id).filter(Product.category_id.in_(ids)))
+
+
+def closure_subtree_products(db, category_id):
+    from app.models.product_catalog import Product
+    from app.services import category_tree_service
+    return sorted(p.id for p in db.session.query(Product.id).filter(
+        category_tree_service.in_category(Product.category_id, category_id, include_subcategories=True)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--categories', type=int, default=2000)
+    parser.add_argument('--depth', type=int, default=6)
+    parser.add_argument('--products', type=int, default=50000)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        from app.extensions import db
+        root_id = seed(db, args.categories, args.depth, args.products)
+
+        cases = [
+            ('todas, antes            ', lambda: legacy_list(db)),
+            ('todas, ahora            ', lambda: eager_list(db)),
+            ('solo hojas, antes       ', lambda: legacy_list(db, leaves_only=True)),
+            ('solo hojas, ahora       ', lambda: eager_list(db, leaves_only=True)),
+            ('subárbol nivel por nivel', lambda: legacy_subtree_products(db, root_id)),
+            ('subárbol con clausura   ', lambda: closure_subtree_products(db, root_id)),
+        ]
+        print(f"Categorías: {args.categories} ({args.depth} niveles) | productos: {args.products}")
+        for _, fn in cases:  # Calentamiento: el primer caso no paga la caché fría de SQLite
+            db.session.expunge_all()
+            fn()
+
+        results = {}
+        for label, fn in cases:
+            db.session.expunge_all()  # Sin padres ya cargados de la vuelta anterior
+            timing = {}
+            with QueryCounter(db.engine) as counter, timer(timing):
+                results[label] = fn()
+            print(f"{label}: {timing['seconds'] * 1000:8.1f} ms | {counter.count:5d} consultas | {len(results[label])} filas")
+
+        values = list(results.values())
+        print(f"Mismo resultado: todas={values[0] == values[1]} hojas={values[2] == values[3]} "
+              f"subárbol={values[4] == values[5]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark de /api/products/export con un catálogo grande: la exportación anterior
+(lista de dicts -> DataFrame -> libro completo en memoria) frente al streaming (xlsx y csv).
+Reporta el tiempo, el pico de memoria de Python (tracemalloc), el tamaño del archivo y
+cuánto tarda en salir el primer bloque (los tiempos incluyen el costo de tracemalloc).
+
+    python -m benchmarks.bench_export --products 200000
+"""
+import argparse
+import io
+import time
+import tracemalloc
+import warnings
+
+from benchmarks._common import make_app
+from benchmarks.bench_search import seed
+
+
+def legacy_export(db):
+    """Copia de la exportación original, como referencia."""
+    import pandas as pd
+    from app.models.product_catalog import Product
+
+    data = [{
+        'SKU': p.sku, 'Nombre': p.name, 'Categoria': p.category.name if p.category else '',
+        'Descripcion': p.description, 'UM': p.unit_of_measure, 'Precio': p.standard_price
+    } for p in Product.query.order_by(Product.name).all()]
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        pd.DataFrame(data).to_excel(writer, index=False, sheet_name='Productos')
+    return [output.getvalue()]
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    first = None
+    size = 0
+    for chunk in fn():
+        if first is None:
+            first = time.perf_counter() - start
+        size += len(chunk)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return seconds, first, peak, size / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', type=int, default=200000)
+    parser.add_argument('--skip-legacy', action='store_true')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    app = make_app()
+    with app.app_context():
+        from app.extensions import db
+        seed(db, args.products)
+
+    from app.routes import product_api
+
+    def route(export_format):
+        # Llama a la vista sin pasar por la autenticación
+        view = product_api.export_products.__wrapped__
+        with app.test_request_context(f'/api/products/export?format={export_format}'):
+            response = view({'sub': 'bench'})
+            yield from response.response
+
+    cases = [('streaming xlsx', lambda: route('xlsx')), ('streaming csv ', lambda: route('csv'))]
+    if not args.skip_legacy:
+        def legacy():
+            with app.app_context():
+                from app.extensions import db
+                yield from legacy_export(db)
+        cases.insert(0, ('antes (pandas)', legacy))
+
+    print(f"Productos: {args.products}")
+    for label, fn in cases:
+        seconds, first, peak, size = measure(fn)
+        print(f"{label}: {seconds:6.2f} s | primer bloque {first * 1000:8.1f} ms | "
+              f"pico {peak:7.1f} MB | archivo {size:6.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
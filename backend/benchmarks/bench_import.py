@@ -0,0 +1,140 @@
+"""
+Benchmark de /api/products/import con un catálogo de proveedor grande:
+antes (dos consultas y un flush por fila) y después (ProductImport, por conjuntos).
+Cada variante corre sobre su propia BD con el mismo catálogo inicial y el mismo CSV
+(la mitad de los SKUs ya existen, categorías con mayúsculas distintas y SKUs por prefijo);
+al final se comprueba que las dos dejan la tabla de productos igual.
+
+    python -m benchmarks.bench_import --rows 50000 --products 50000
+"""
+import argparse
+import csv
+import io
+import random
+import warnings
+
+from benchmarks._common import make_app, QueryCounter, timer
+from benchmarks.bench_search import seed
+
+CATEGORIES = ['Cables', 'cables', 'Iluminación', 'Tuberías', 'TUBERÍAS', 'Tableros', 'Ferretería']
+
+
+def legacy_import(reader):
+    """Copia del bucle original (categoría y producto consultados fila por fila), como referencia."""
+    import pandas as pd
+    from app.extensions import db
+    from app.models.product_catalog import Product, Category
+
+    prefix_counters = {}
+    created_count = updated_count = 0
+    with reader:
+        for index, row in reader.iter_rows(['SKU', 'Nombre', 'Categoria', 'Descripcion', 'UM', 'Precio']):
+            sku_input = str(row['SKU']).strip()
+            name = str(row['Nombre']).strip()
+            cat_name = str(row['Categoria']).strip()
+            if sku_input.isalpha() and sku_input.isupper():
+                count = prefix_counters.get(sku_input, 0) + 1
+                prefix_counters[sku_input] = count
+                sku = f"{sku_input}-{count:03d}"
+            else:
+                sku = sku_input
+            category = Category.query.filter(db.func.lower(Category.name) == cat_name.lower()).first()
+            if not category:
+                category = Category(name=cat_name, description="Creada por importación")
+                db.session.add(category)
+                db.session.flush()
+            product = Product.query.filter_by(sku=sku).first()
+            if product:
+                product.name = name
+                product.category_id = category.id
+                if 'Descripcion' in row and pd.notna(row['Descripcion']):
+                    product.description = str(row['Descripcion'])
+                if 'UM' in row and pd.notna(row['UM']):
+                    product.unit_of_measure = str(row['UM'])
+                if 'Precio' in row and pd.notna(row['Precio']):
+                    product.standard_price = float(row['Precio'])
+                updated_count += 1
+            else:
+                db.session.add(Product(
+                    sku=sku, name=name, category_id=category.id,
+                    description=str(row['Descripcion']) if 'Descripcion' in row and pd.notna(row['Descripcion']) else '',
+                    unit_of_measure=str(row['UM']) if 'UM' in row and pd.notna(row['UM']) else 'UND',
+                    standard_price=float(row['Precio']) if 'Precio' in row and pd.notna(row['Precio']) else 0.00
+                ))
+                created_count += 1
+    db.session.commit()
+    return created_count, updated_count
+
+
+def set_based_import(reader):
+    from app.extensions import db
+    from app.services.product_import_service import ProductImport, IMPORT_COLUMNS
+
+    importer = ProductImport()
+    with reader:
+        for chunk in reader.iter_chunks(IMPORT_COLUMNS):
+            importer.apply(chunk)
+            db.session.commit()
+    return importer.created, importer.updated
+
+
+def build_csv(n_rows, n_products):
+    rng = random.Random(21)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['SKU', 'Nombre', 'Categoria', 'Descripcion', 'UM', 'Precio'])
+    for i in range(n_rows):
+        kind = rng.random()
+        if kind < 0.5 and n_products:
+            sku = f"PRD-{rng.randrange(n_products):06d}"       # Ya existe (o se repite en el archivo)
+        elif 0.5 <= kind < 0.52:
+            sku = rng.choice(['CEL', 'TUB'])                     # Prefijo: se genera CEL-001, ...
+        else:
+            sku = f"NEW-{i:06d}"
+        writer.writerow([sku, f"Producto importado {i}", rng.choice(CATEGORIES),
+                         '' if rng.random() < 0.3 else f"Descripción {i}",
+                         rng.choice(['', 'UND', 'Metros', 'Kilos']),
+                         '' if rng.random() < 0.2 else round(rng.uniform(1, 500), 2)])
+    return buffer.getvalue().encode('utf-8')
+
+
+def snapshot(db):
+    from app.models.product_catalog import Product, Category
+    return sorted(
+        (p.sku, p.name, p.description, p.unit_of_measure, float(p.standard_price), c.name.lower())
+        for p, c in db.session.query(Product, Category).join(Category, Product.category_id == Category.id)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--products', type=int, default=50000)
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    from app.services.tabular_reader import TabularReader
+
+    data = build_csv(args.rows, args.products)
+    print(f"Filas: {args.rows} | Productos existentes: {args.products}")
+
+    snapshots = []
+    for label, fn in (('antes  ', legacy_import), ('después', set_based_import)):
+        app = make_app()
+        with app.app_context():
+            from app.extensions import db
+            seed(db, args.products)
+            reader = TabularReader(io.BytesIO(data), filename='catalogo.csv',
+                                   chunk_size=app.config['IMPORT_CHUNK_SIZE'])
+            result = {}
+            with QueryCounter(db.engine) as counter, timer(result):
+                created, updated = fn(reader)
+            print(f"{label}: {created} creados, {updated} actualizados | {counter.count:7d} consultas | "
+                  f"{result['seconds']:7.2f} s ({result['seconds'] * 1e6 / args.rows:.0f} µs/fila)")
+            snapshots.append(snapshot(db))
+
+    print("Mismo resultado:", snapshots[0] == snapshots[1])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark del Kardex (/api/inventory/transactions) sobre muchas filas.
+Compara la lista completa sin paginar (antes) con la paginación por cursor,
+sin y con los índices compuestos de InventoryTransaction.
+
+    python -m benchmarks.bench_kardex --rows 5000000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks._common import make_app
+
+INDEX_NAMES = [
+    'ix_inv_tx_timestamp_id',
+    'ix_inv_tx_product_timestamp',
+    'ix_inv_tx_warehouse_timestamp',
+    'ix_inv_tx_product_warehouse_timestamp',
+]
+
+
+def populate(db, n_rows, n_products, n_warehouses, batch=50000):
+    from app.models.product_catalog import Product, Category
+    from app.models.warehouse import Warehouse
+
+    category = Category.query.first()
+    db.session.add_all([Warehouse(name=f'Bench WH {i}') for i in range(n_warehouses)])
+    db.session.add_all([Product(sku=f'KX-{i:06d}', name=f'Producto {i}', category_id=category.id)
+                        for i in range(n_products)])
+    db.session.commit()
+    product_ids = [pid for (pid,) in db.session.query(Product.id).all()]
+    warehouse_ids = [wid for (wid,) in db.session.query(Warehouse.id).all()]
+
+    rnd = random.Random(42)
+    start = datetime(2023, 1, 1)
+    step = timedelta(days=3 * 365) / n_rows
+    conn = db.engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        for offset in range(0, n_rows, batch):
+            rows = []
+            for i in range(offset, min(offset + batch, n_rows)):
+                ts = (start + step * i).strftime('%Y-%m-%d %H:%M:%S.%f')
+                rows.append((rnd.choice(product_ids), rnd.choice(warehouse_ids), 1, 1, 'Bench', ts, 'bench'))
+            cursor.executemany(
+                "INSERT INTO inventory_transactions "
+                "(product_id, warehouse_id, quantity_change, new_quantity, type, timestamp, user_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.commit()
+    finally:
+        conn.close()
+    return product_ids, warehouse_ids
+
+
+def call(app, view, **args):
+    """Llama a la vista del Kardex sin pasar por la autenticación."""
+    with app.test_request_context('/api/inventory/transactions', query_string=args):
+        start = time.perf_counter()
+        response = view(payload={})
+        elapsed = time.perf_counter() - start
+        data = response.get_json()
+    return elapsed, data
+
+
+def run_suite(app, view, product_id, warehouse_id, label):
+    print(f"\n== {label} ==")
+    elapsed, data = call(app, view, product_id=product_id)
+    print(f"antes   | lista completa de un producto      : {elapsed * 1000:9.1f} ms ({len(data)} filas)")
+
+    elapsed, data = call(app, view, limit=100, count='false')
+    print(f"después | 1a página sin filtros (100)         : {elapsed * 1000:9.1f} ms")
+    elapsed, data = call(app, view, product_id=product_id, limit=100, count='false')
+    print(f"después | 1a página por producto (100)        : {elapsed * 1000:9.1f} ms")
+    elapsed, data = call(app, view, product_id=product_id, warehouse_id=warehouse_id, limit=100, count='false')
+    print(f"después | 1a página producto+almacén (100)    : {elapsed * 1000:9.1f} ms")
+
+    cursor = None
+    for _ in range(50):
+        args = {'limit': 100, 'count': 'false'}
+        if cursor:
+            args['cursor'] = cursor
+        elapsed, data = call(app, view, **args)
+        cursor = data['next_cursor']
+    print(f"después | página 50 siguiendo el cursor       : {elapsed * 1000:9.1f} ms")
+
+    elapsed, data = call(app, view, product_id=product_id, limit=100)
+    print(f"después | 1a página por producto + total      : {elapsed * 1000:9.1f} ms (total={data['total']})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--warehouses', type=int, default=10)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        from app.extensions import db
+        from app.routes.inventory_api import get_kardex_transactions
+        view = get_kardex_transactions.__wrapped__
+
+        for name in INDEX_NAMES:
+            db.session.execute(db.text(f"DROP INDEX IF EXISTS {name}"))
+        db.session.commit()
+
+        start = time.perf_counter()
+        product_ids, warehouse_ids = populate(db, args.rows, args.products, args.warehouses)
+        print(f"{args.rows} filas insertadas en {time.perf_counter() - start:.1f} s")
+
+        run_suite(app, view, product_ids[0], warehouse_ids[0], "Sin índices")
+
+        start = time.perf_counter()
+        from app.models.inventory_models import InventoryTransaction
+        for index in InventoryTransaction.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+        print(f"\nÍndices creados en {time.perf_counter() - start:.1f} s")
+
+        run_suite(app, view, product_ids[0], warehouse_ids[0], "Con índices compuestos")
+
+
+if __name__ == '__main__':
+    main()
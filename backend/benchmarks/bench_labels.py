@@ -0,0 +1,72 @@
+"""
+Benchmark de generación de etiquetas (/api/inventory/generate-labels).
+Mide etiquetas por segundo del motor en serie y del reparto por páginas en procesos,
+para cada tipo de símbolo. No necesita la BD: usa un logo PNG temporal.
+
+    python -m benchmarks.bench_labels --labels 10000 --workers 4 --symbology code128 qr
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks import _common  # noqa: F401  (agrega 'backend' al sys.path)
+from PIL import Image
+
+
+def make_logo(directory):
+    path = os.path.join(directory, 'logo_bench.png')
+    Image.new('RGB', (400, 120), (20, 60, 140)).save(path)
+    return path
+
+
+def make_products(n_labels, copies_per_product=10):
+    return [
+        {'product_sku': f'LB-{i:06d}', 'product_name': f'Producto de prueba número {i}',
+         'quantity': copies_per_product}
+        for i in range(max(n_labels // copies_per_product, 1))
+    ]
+
+
+def run(label, fn, n_labels):
+    start = time.perf_counter()
+    pdf_bytes = fn()
+    seconds = time.perf_counter() - start
+    print(f"{label:<28} {seconds:8.2f} s  {n_labels / seconds:10.0f} etiquetas/s  "
+          f"{len(pdf_bytes) / 1024:10.0f} KB")
+    return pdf_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--labels', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--size', default='60x30')
+    parser.add_argument('--symbology', nargs='+', default=['none', 'code128'])
+    args = parser.parse_args()
+
+    from app.services import barcode_service, label_service
+
+    logo_path = make_logo(tempfile.mkdtemp(prefix='bench_labels_'))
+    products = make_products(args.labels)
+    n_labels = len(label_service.expand_labels(products))
+
+    print(f"{n_labels} etiquetas ({len(products)} SKUs), {args.size}, "
+          f"{label_service.labels_per_page(label_service.get_layout(args.size))} por hoja, {args.workers} procesos")
+    for symbology in args.symbology:
+        options = {'size': args.size, 'symbology': symbology}
+        run(f'{symbology}: serie', lambda: label_service.render_pdf(products, logo_path, workers=1, **options),
+            n_labels)
+        # La primera llamada en paralelo incluye el arranque del pool; se mide la segunda
+        label_service.render_pdf(products[:1], logo_path, workers=args.workers, parallel_threshold=0, **options)
+        run(f'{symbology}: paralelo ({args.workers})',
+            lambda: label_service.render_pdf(products, logo_path, workers=args.workers, parallel_threshold=0,
+                                             **options),
+            n_labels)
+
+    drawn = barcode_service.cache_info()['drawn']
+    print(f"Caché de símbolos (proceso principal): {drawn['hits']} aciertos, {drawn['misses']} símbolos dibujados")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark de /api/inventory/receive: consultas y latencia por línea,
+antes (bucle por línea) y después (motor por lotes de receiving_service).
+
+    python -m benchmarks.bench_receive --lines 300 --warehouses 5
+
+Montaje: SQLite temporal con caché en memoria (benchmarks/_common.py); una orden de
+compra con un producto distinto por línea, sin stock en el almacén de destino y con 5
+unidades en cada uno de los otros almacenes. Se cuentan todas las sentencias SQL de la
+recepción más su commit.
+
+Medido con el código actual:
+
+    líneas   antes                      después
+    30         363 consultas (12.1/l.)    47 consultas (1.57/l.)
+    300       3603 consultas (12.0/l.)   317 consultas (1.06/l.)
+    1000     12003 consultas (12.0/l.)  1018 consultas (1.02/l.)
+
+"después" crece con las líneas porque el stock se suma con un UPSERT ... RETURNING
+por producto (stock_service.add_lines), para que dos recepciones a la vez no pisen el
+saldo. Antes de ese cambio el motor hacía 11 consultas fijas (300 líneas: 3003 frente a
+11), y el bucle de referencia hacía 10 por línea (una menos: las ubicaciones todavía no
+estaban en su propia tabla).
+"""
+import argparse
+
+from benchmarks._common import make_app, QueryCounter, timer
+
+
+def legacy_receive(warehouse_id, order_id, items, user_id):
+    """Copia del bucle original (una consulta por dato y por línea), como referencia."""
+    from app.extensions import db
+    from app.models.purchase_order import PurchaseOrder, PurchaseOrderItem, OrderStatus
+    from app.models.inventory_models import InventoryStock, InventoryTransaction
+    from app.models.product_catalog import Product
+    from app.services.product_location_service import replace_in_warehouse
+
+    for item_data in items:
+        quantity_received = float(item_data['quantity_received'])
+        if quantity_received <= 0:
+            continue
+        po_item = PurchaseOrderItem.query.get(item_data['po_item_id'])
+        po_item.product_id = item_data['product_id']
+        stock_entry = InventoryStock.query.filter_by(
+            product_id=item_data['product_id'], warehouse_id=warehouse_id).first()
+        if not stock_entry:
+            stock_entry = InventoryStock(product_id=item_data['product_id'], warehouse_id=warehouse_id, quantity=0.0)
+            db.session.add(stock_entry)
+        product = Product.query.get(item_data['product_id'])
+        if item_data.get('location'):
+            replace_in_warehouse({product.id: item_data['location']}, warehouse_id)
+        current_total_stock = float(db.session.query(db.func.sum(InventoryStock.quantity)).filter_by(
+            product_id=item_data['product_id']).scalar() or 0.0)
+        new_total_quantity = current_total_stock + quantity_received
+        if new_total_quantity > 0:
+            product.standard_price = (current_total_stock * float(product.standard_price) +
+                                      quantity_received * float(po_item.unit_price)) / new_total_quantity
+        stock_entry.quantity = float(stock_entry.quantity) + quantity_received
+        db.session.add(InventoryTransaction(
+            product_id=item_data['product_id'], warehouse_id=warehouse_id,
+            quantity_change=quantity_received, new_quantity=stock_entry.quantity,
+            type="Recepción de Compra", user_id=user_id))
+
+    order = PurchaseOrder.query.get(order_id)
+    received_status = OrderStatus.query.filter_by(name='Recibida').first()
+    if order and received_status:
+        order.status_id = received_status.id
+
+
+def seed(db, n_lines, n_warehouses):
+    from app.models.product_catalog import Product, Category
+    from app.models.warehouse import Warehouse
+    from app.models.provider import Provider
+    from app.models.purchase_order import PurchaseOrder, PurchaseOrderItem, DocumentType, OrderStatus
+    from app.models.inventory_models import InventoryStock
+
+    category = Category.query.first()
+    for i in range(n_warehouses):
+        db.session.add(Warehouse(name=f'Bench WH {i}', location='Bench'))
+    provider = Provider(ruc='20000000001', name='Proveedor Bench')
+    db.session.add(provider)
+    db.session.flush()
+
+    products = [Product(sku=f'BENCH-{i:05d}', name=f'Producto {i}', standard_price=10, category_id=category.id)
+                for i in range(n_lines)]
+    db.session.add_all(products)
+    db.session.flush()
+
+    warehouses = Warehouse.query.all()
+    for product in products:
+        for wh in warehouses[1:]:
+            db.session.add(InventoryStock(product_id=product.id, warehouse_id=wh.id, quantity=5))
+
+    orders = []
+    for _ in range(2):
+        order = PurchaseOrder(document_number='F001-1', owner_id='bench', provider_id=provider.id,
+                              document_type_id=DocumentType.query.first().id,
+                              status_id=OrderStatus.query.first().id)
+        db.session.add(order)
+        db.session.flush()
+        items = [PurchaseOrderItem(order_id=order.id, invoice_detail_text=p.name, quantity=10, unit_price=12)
+                 for p in products]
+        db.session.add_all(items)
+        db.session.flush()
+        orders.append((order.id, [
+            {'po_item_id': it.id, 'product_id': p.id, 'quantity_received': 10, 'location': 'A1-B2'}
+            for it, p in zip(items, products)
+        ]))
+    db.session.commit()
+    return warehouses[0].id, orders
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', type=int, default=300)
+    parser.add_argument('--warehouses', type=int, default=5)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        from app.extensions import db
+        from app.services.receiving_service import receive_items
+
+        warehouse_id, orders = seed(db, args.lines, args.warehouses)
+        print(f"Líneas: {args.lines} | Almacenes: {args.warehouses}")
+
+        for label, fn, (order_id, items) in (('antes  ', legacy_receive, orders[0]),
+                                             ('después', receive_items, orders[1])):
+            result = {}
+            with QueryCounter(db.engine) as counter, timer(result):
+                fn(warehouse_id, order_id, items, 'bench')
+                db.session.commit()
+            print(f"{label}: {counter.count:6d} consultas ({counter.count / args.lines:.2f}/línea) | "
+                  f"{result['seconds'] * 1000:8.1f} ms ({result['seconds'] * 1000 / args.lines:.3f} ms/línea)")
+
+
+if __name__ == '__main__':
+    main()
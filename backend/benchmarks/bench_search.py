@@ -0,0 +1,95 @@
+"""
+Benchmark de la búsqueda de productos (autocompletado) con un catálogo grande.
+Compara, para cada texto (simulando lo que se va escribiendo):
+  - like:  lower(name) LIKE '%q%' OR lower(sku) LIKE '%q%'  (la búsqueda anterior)
+  - fts5:  product_search_service.search_products (índice products_fts)
+Reporta la latencia p50 / p95 en milisegundos.
+
+    python -m benchmarks.bench_search --products 200000 --repeat 20
+"""
+import argparse
+import random
+import statistics
+import time
+import warnings
+
+from benchmarks._common import make_app
+
+WORDS = ['Cable', 'Tubo', 'Codo', 'Cinta', 'Interruptor', 'Tomacorriente', 'Foco', 'Llave',
+         'Breaker', 'Canaleta', 'Caja', 'Conector', 'Terminal', 'Abrazadera', 'Perno', 'Tuerca']
+DETAILS = ['THW', 'NYY', 'PVC', 'LED', 'Mellizo', 'Simple', 'Doble', 'Térmico', 'Galvanizado',
+           'Rojo', 'Negro', 'Azul', 'Blanco', 'Industrial', 'Empotrable', 'Adosable']
+QUERIES = ['c', 'ca', 'cab', 'cabl', 'cable', 'cable t', 'cable th', 'cable thw', 'cable thw 14',
+           'prd-01234', 'termico', 'zzzz']
+
+
+def seed(db, n_products):
+    from sqlalchemy import text
+    from app.models.product_catalog import Category
+
+    rng = random.Random(17)
+    category_id = Category.query.first().id
+    rows = []
+    for i in range(n_products):
+        name = f"{rng.choice(WORDS)} {rng.choice(DETAILS)} {rng.choice(DETAILS)} #{rng.randint(1, 60)}"
+        rows.append({'sku': f"PRD-{i:06d}", 'name': name, 'category_id': category_id})
+    db.session.execute(text(
+        "INSERT INTO products (sku, name, unit_of_measure, standard_price, category_id) "
+        "VALUES (:sku, :name, 'UND', 0, :category_id)"), rows)
+    db.session.commit()
+
+
+def legacy_search(db, term):
+    from sqlalchemy import or_
+    from app.models.product_catalog import Product
+
+    search_term = f"%{term.lower()}%"
+    products = Product.query.filter(
+        or_(db.func.lower(Product.name).like(search_term), db.func.lower(Product.sku).like(search_term))
+    ).limit(20).all()
+    return [p.to_dict() for p in products]
+
+
+def indexed_search(db, term):
+    from app.services import product_search_service
+    return [p.to_dict() for p in product_search_service.search_products(term, limit=20)]
+
+
+def measure(fn, db, term, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = fn(db, term)
+        times.append((time.perf_counter() - start) * 1000)
+        db.session.rollback()
+    times.sort()
+    return statistics.median(times), times[max(0, int(len(times) * 0.95) - 1)], len(results)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    from app.extensions import db
+    from app.services import product_search_service
+
+    app = make_app()
+    with app.app_context():
+        start = time.perf_counter()
+        seed(db, args.products)
+        print(f"{args.products} productos insertados (con índice) en {time.perf_counter() - start:.1f} s | "
+              f"motor de búsqueda: {product_search_service._backend()}")
+
+        print(f"{'texto':<14} {'like p50':>9} {'p95':>8} {'n':>3} | {'fts p50':>9} {'p95':>8} {'n':>3}")
+        for term in QUERIES:
+            like_p50, like_p95, like_n = measure(legacy_search, db, term, args.repeat)
+            fts_p50, fts_p95, fts_n = measure(indexed_search, db, term, args.repeat)
+            print(f"{term:<14} {like_p50:8.2f}ms {like_p95:7.2f}ms {like_n:3d} | "
+                  f"{fts_p50:8.2f}ms {fts_p95:7.2f}ms {fts_n:3d}")
+
+
+if __name__ == '__main__':
+    main()
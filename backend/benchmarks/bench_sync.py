@@ -0,0 +1,72 @@
+"""
+Benchmark de la sincronización del catálogo: lo que descarga un cliente que ya tiene
+el catálogo cuando cambian unos pocos productos. Antes: /api/products + /api/categories
+completos en cada recarga; ahora: /api/products/changes?since=<versión>.
+Reporta bytes y tiempo de cada respuesta.
+
+    python -m benchmarks.bench_sync --products 50000 --changes 20
+"""
+import argparse
+import json
+import time
+
+from benchmarks._common import make_app
+from benchmarks.bench_search import seed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', type=int, default=50000)
+    parser.add_argument('--changes', type=int, default=20)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        from app.extensions import db
+        seed(db, args.products)
+
+    from app.routes import category_api, product_api
+
+    def call(view, path, **kwargs):
+        # Llama a la vista sin pasar por la autenticación
+        with app.test_request_context(path):
+            response = view.__wrapped__({'sub': 'bench'}, **kwargs)
+            return response.get_data()
+
+    def measure(fn):
+        start = time.perf_counter()
+        body = fn()
+        return time.perf_counter() - start, len(body)
+
+    def changes(since):
+        return call(product_api.get_catalog_changes, f'/api/products/changes?since={since}')
+
+    # El cliente arranca con la foto completa y guarda la versión
+    version = json.loads(changes(0))['version']
+
+    # Cambian unos pocos productos (misma escritura que PUT /api/products/<id>)
+    with app.app_context():
+        from app.extensions import db
+        from app.models.product_catalog import Product
+        from app.services import catalog_change_service
+        products = Product.query.order_by(Product.id).limit(args.changes).all()
+        for product in products:
+            product.standard_price = 9.99
+        catalog_change_service.record(catalog_change_service.PRODUCT, [p.id for p in products])
+        db.session.commit()
+
+    cases = [
+        # Lo que hacía el frontend en cada recarga: las dos listas completas
+        ('antes (listas completas)', lambda: call(product_api.get_all_products, '/api/products') +
+         call(category_api.get_categories, '/api/categories')),
+        ('foto completa (since=0) ', lambda: changes(0)),
+        (f'delta ({args.changes} cambios)      ', lambda: changes(version)),
+    ]
+    print(f"Productos: {args.products}")
+    for label, fn in cases:
+        seconds, size = measure(fn)
+        print(f"{label}: {seconds * 1000:8.1f} ms | {size / 1024:9.1f} KB")
+
+
+if __name__ == '__main__':
+    main()
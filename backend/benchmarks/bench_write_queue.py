@@ -0,0 +1,119 @@
+"""
+Benchmark de escrituras concurrentes de stock sobre SQLite.
+Varios hilos crean transferencias de 1 unidad entre dos almacenes:
+  - directo: cada hilo escribe y hace commit en su propia sesión (como antes)
+  - cola:    los trabajos pasan por la cola de escritura única (commit de grupo)
+Reporta transferencias por segundo, errores ("database is locked") y commits.
+Antes verifica el commit de grupo: un lote de N trabajos hace un único COMMIT y, hasta
+ese COMMIT, otra conexión no ve nada de lo escrito (falla con AssertionError si no).
+
+    python -m benchmarks.bench_write_queue --threads 16 --transfers 100
+"""
+import argparse
+import threading
+import time
+import warnings
+
+from benchmarks._common import make_app
+
+
+def seed(db, quantity):
+    from app.models.product_catalog import Product, Category
+    from app.models.warehouse import Warehouse
+    from app.models.inventory_models import InventoryStock
+
+    category = Category.query.first()
+    product = Product(sku='WQ-0001', name='Producto cola', category_id=category.id)
+    db.session.add(product)
+    db.session.flush()
+    origin, destination = [w.id for w in Warehouse.query.limit(2).all()]
+    db.session.add(InventoryStock(product_id=product.id, warehouse_id=origin, quantity=quantity))
+    db.session.commit()
+    return product.id, origin, destination
+
+
+def check_group_commit(n_jobs=5):
+    """Un lote de n_jobs (uno de ellos falla): un solo COMMIT, y nada visible antes de él."""
+    import sqlite3
+    from concurrent.futures import Future
+    from sqlalchemy import event
+    from app.extensions import db, write_queue
+    from app.models.product_catalog import Category
+
+    app = make_app()
+    with app.app_context():
+        path = db.engine.url.database
+        commits = []
+        visible = []
+
+        def job(n):
+            db.session.add(Category(name=f'wq-check-{n}'))
+            db.session.flush()
+            # Otra conexión: los trabajos anteriores del lote todavía no deben verse
+            with sqlite3.connect(path) as other:
+                visible.append(other.execute(
+                    "SELECT count(*) FROM categories WHERE name LIKE 'wq-check-%'").fetchone()[0])
+            if n == 1:
+                raise ValueError("trabajo que falla")
+
+        batch = [(job, (n,), {}, Future()) for n in range(n_jobs)]
+        event.listen(db.engine, 'commit', lambda connection: commits.append(1))
+        write_queue._process(batch)
+
+        stored = Category.query.filter(Category.name.like('wq-check-%')).count()
+        failed = [n for n, (_, _, _, future) in enumerate(batch) if future.exception() is not None]
+        assert visible == [0] * n_jobs, f"Se confirmó antes del final del lote: {visible}"
+        assert len(commits) == 1, f"{len(commits)} COMMIT para un lote de {n_jobs} trabajos"
+        assert failed == [1] and stored == n_jobs - 1, (failed, stored)
+    print(f"Commit de grupo: {n_jobs} trabajos (1 fallido) -> 1 COMMIT, nada visible antes")
+
+
+def run(mode, n_threads, n_transfers):
+    from app.extensions import db, write_queue
+    from app.routes.transfer_api import _create_transfer_job
+
+    app = make_app()
+    write_queue.enabled = mode == 'cola'
+    with app.app_context():
+        product_id, origin, destination = seed(db, n_threads * n_transfers)
+
+    transfer_data = {'origin_warehouse_id': origin, 'destination_warehouse_id': destination,
+                     'items': [{'product_id': product_id, 'quantity': 1}]}
+    errors = []
+
+    def worker():
+        with app.app_context():
+            for _ in range(n_transfers):
+                try:
+                    write_queue.run(_create_transfer_job, transfer_data, 'bench')
+                except Exception as e:
+                    errors.append(str(e).split('\n')[0][:60])
+
+    threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    done = n_threads * n_transfers - len(errors)
+    print(f"{mode:<7} {done:6d} transferencias en {seconds:6.2f} s ({done / seconds:8.0f}/s) | "
+          f"errores: {len(errors)} {sorted(set(errors))[:1]} | commits de la cola: {write_queue.stats()['commits']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--transfers', type=int, default=100)
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    check_group_commit()
+    print(f"{args.threads} hilos x {args.transfers} transferencias")
+    run('directo', args.threads, args.transfers)
+    run('cola', args.threads, args.transfers)
+
+
+if __name__ == '__main__':
+    main()
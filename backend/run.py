@@ -1,6 +1,9 @@
+import os
 from app import create_app
+from config import config_by_name
 
-app = create_app()
+# APP_CONFIG=production -> PostgreSQL con pool (ver config.py)
+app = create_app(config_by_name[os.environ.get('APP_CONFIG', 'default')])
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
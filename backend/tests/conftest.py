@@ -0,0 +1,50 @@
+"""
+Fixtures compartidas por las pruebas. La app de prueba usa una BD SQLite temporal y la
+caché en memoria (nunca toca instance/app.db). Uso: desde la carpeta 'backend' ->
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+HEADERS = {'Authorization': 'Bearer prueba'}
+
+
+def admin_payload(sub='auth0|prueba', roles=('Admin',)):
+    """Payload de un token ya verificado (los permisos de cada rol salen de la BD)."""
+    from app.services import auth_service
+    return {'sub': sub, f"{auth_service.AUTH0_NAMESPACE}/roles": list(roles)}
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    from config import Config
+    from app import create_app
+    from app.extensions import db
+    from app.services import auth_service
+
+    monkeypatch.setattr(auth_service, 'verify_token', lambda token: admin_payload())
+    monkeypatch.setattr(auth_service, '_permissions_cache', {})  # Permisos de la app de otra prueba
+
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'test.db')
+        CACHE_BACKEND = 'memory'
+        AUTOCOMPLETE_ENABLED = False
+
+    app = create_app(TestConfig)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,43 @@
+"""
+Permisos por rol: update_role_permissions() invalida los permisos ya resueltos, y con la
+caché en memoria (un proceso no ve la invalidación de otro) vencen tras CACHE_DEFAULT_TTL.
+"""
+import time
+
+from conftest import HEADERS
+
+
+def _admin_role(client):
+    data = client.get('/api/admin/roles', headers=HEADERS).get_json()
+    role = next(r for r in data['roles'] if r['name'] == 'Admin')
+    panel = next(p['id'] for p in data['permissions'] if p['name'] == 'access:admin_panel')
+    return role, panel
+
+
+def test_update_role_permissions_invalidates_cached_permissions(client):
+    role, panel = _admin_role(client)
+    assert panel in role['permission_ids']
+
+    response = client.put(f"/api/admin/roles/{role['id']}/permissions", headers=HEADERS,
+                          json={'permission_ids': [pid for pid in role['permission_ids'] if pid != panel]})
+    assert response.status_code == 200, response.get_json()
+
+    assert client.get('/api/admin/roles', headers=HEADERS).status_code == 403
+
+
+def test_change_from_another_worker_is_seen_after_ttl(app, client, monkeypatch):
+    from app.extensions import db
+    from app.models.role import Role
+
+    role, panel = _admin_role(client)
+    # Otro worker cambia el rol: con CACHE_BACKEND = 'memory' su invalidación no llega aquí
+    with app.app_context():
+        admin = db.session.get(Role, role['id'])
+        admin.permissions = [p for p in admin.permissions if p.id != panel]
+        db.session.commit()
+
+    assert client.get('/api/admin/roles', headers=HEADERS).status_code == 200  # Aún en memoria
+
+    now = time.time() + app.config['CACHE_DEFAULT_TTL'] + 1
+    monkeypatch.setattr(time, 'time', lambda: now)
+    assert client.get('/api/admin/roles', headers=HEADERS).status_code == 403
@@ -0,0 +1,97 @@
+"""
+Ubicaciones con varios códigos ("A1, B2") cargadas por recepción y por ajuste masivo:
+el JSON de productos, /by-location y el reporte de stock las ven igual que antes.
+"""
+import io
+
+import openpyxl
+
+from conftest import HEADERS
+
+
+def _seed_ids(app):
+    from app.models.product_catalog import Product
+    from app.models.warehouse import Warehouse
+    with app.app_context():
+        products = {p.sku: p.id for p in Product.query}
+        warehouses = [w.id for w in Warehouse.query.order_by(Warehouse.id)]
+    return products, warehouses
+
+
+def _purchase_order(app, product_ids):
+    from app.extensions import db
+    from app.models.provider import Provider
+    from app.models.purchase_order import PurchaseOrder, PurchaseOrderItem, DocumentType, OrderStatus
+    with app.app_context():
+        provider = Provider(ruc='20000000001', name='Proveedor Prueba')
+        db.session.add(provider)
+        db.session.flush()
+        order = PurchaseOrder(document_number='F001-1', owner_id='prueba', provider_id=provider.id,
+                              document_type_id=DocumentType.query.first().id,
+                              status_id=OrderStatus.query.first().id)
+        db.session.add(order)
+        db.session.flush()
+        items = [PurchaseOrderItem(order_id=order.id, invoice_detail_text='Item', quantity=10, unit_price=20)
+                 for _ in product_ids]
+        db.session.add_all(items)
+        db.session.commit()
+        return order.id, [item.id for item in items]
+
+
+def _product(client, product_id):
+    products = client.get('/api/products/', headers=HEADERS).get_json()
+    return next(p for p in products if p['id'] == product_id)
+
+
+def _skus_at(client, code, warehouse_id=None):
+    query = f'/api/products/by-location?code={code}' + (f'&warehouse_id={warehouse_id}' if warehouse_id else '')
+    response = client.get(query, headers=HEADERS)
+    assert response.status_code == 200, response.get_json()
+    return [p['sku'] for p in response.get_json()]
+
+
+def _stock_locations(client, warehouse_id):
+    rows = client.get(f'/api/inventory/stock-report?warehouse_id={warehouse_id}', headers=HEADERS).get_json()
+    return {row['product_sku']: row['product_location'] for row in rows}
+
+
+def test_receive_splits_comma_separated_locations(app, client):
+    products, (surco, _) = _seed_ids(app)
+    cable, clavo = products['CB-THW-14'], products['HR-CLV-3']
+    order_id, (item_cable, item_clavo) = _purchase_order(app, [cable, clavo])
+
+    response = client.post('/api/inventory/receive', headers=HEADERS, json={
+        'warehouse_id': surco, 'order_id': order_id, 'items': [
+            {'po_item_id': item_cable, 'product_id': cable, 'quantity_received': 5, 'location': 'A1, B2 ,, A1'},
+            {'po_item_id': item_clavo, 'product_id': clavo, 'quantity_received': 5},
+        ]})
+    assert response.status_code == 200, response.get_json()
+
+    assert _product(client, cable)['location'] == ['A1', 'B2']
+    assert _skus_at(client, 'A1') == ['CB-THW-14']
+    assert _skus_at(client, 'B2', surco) == ['CB-THW-14']
+    # El reporte de stock: texto separado por comas, o null si no tiene ubicación
+    assert _stock_locations(client, surco) == {'CB-THW-14': 'A1, B2', 'HR-CLV-3': None}
+
+
+def test_adjust_mass_splits_comma_separated_locations(app, client):
+    products, (_, cusco) = _seed_ids(app)
+
+    book = openpyxl.Workbook()
+    sheet = book.active
+    sheet.append(['SKU', 'Cantidad', 'Locacion'])
+    sheet.append(['CB-THW-14', 4, 'X1, X2'])
+    sheet.append(['HR-CLV-3', 2, None])
+    data = io.BytesIO()
+    book.save(data)
+    data.seek(0)
+    response = client.post('/api/inventory/adjust-mass', headers=HEADERS, content_type='multipart/form-data',
+                           data={'file': (data, 'ajuste.xlsx'), 'warehouse_id': str(cusco)})
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['errors'] == []
+
+    assert _product(client, products['CB-THW-14'])['location'] == ['X1', 'X2']
+    assert _skus_at(client, 'X1') == ['CB-THW-14']
+    assert _skus_at(client, 'X2', cusco) == ['CB-THW-14']
+    assert _skus_at(client, 'X1, X2') == []
+    assert _stock_locations(client, cusco) == {'CB-THW-14': 'X1, X2', 'HR-CLV-3': None}
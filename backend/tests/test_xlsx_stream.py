@@ -0,0 +1,74 @@
+"""
+El .xlsx de services/xlsx_stream.py leído de vuelta con openpyxl y con pandas.
+
+    cd backend
+    python -m pytest tests/test_xlsx_stream.py
+"""
+import io
+import warnings
+from decimal import Decimal
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from app.services.xlsx_stream import iter_xlsx
+
+HEADER = ['SKU', 'Nombre', 'Precio', 'Activo', 'Notas']
+ROWS = [
+    ['CB-THW-14', 'CABLE/THW #14 <rojo> & "negro"', 2.5, True, None],
+    ['HR-CLV-3', "Clavos de 3' Ñandú", Decimal('15.25'), False, '  con espacios  '],
+    ['EXP-1', 'Control\x01 y\x0b ilegales', 7, None, float('nan')],
+    ['EXP-2', ']]> </t></is>', -0.125, True, 'línea 1\nlínea 2'],
+]
+
+
+def _xlsx(header=HEADER, rows=ROWS, **kwargs):
+    return b''.join(iter_xlsx(header, rows, **kwargs))
+
+
+def test_openpyxl_reads_header_values_and_styles():
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')  # p. ej. "Workbook contains no default style"
+        book = openpyxl.load_workbook(io.BytesIO(_xlsx(sheet_name='Productos & "stock"')))
+
+    sheet = book.active
+    assert sheet.title == 'Productos & "stock"'
+    rows = list(sheet.iter_rows(values_only=True))
+    assert list(rows[0]) == HEADER
+    assert all(cell.font.b for cell in sheet[1])
+    assert not any(cell.font.b for cell in sheet[2])
+    assert 'Normal' in book.named_styles
+
+    assert list(rows[1]) == ['CB-THW-14', 'CABLE/THW #14 <rojo> & "negro"', 2.5, True, None]
+    assert list(rows[2]) == ['HR-CLV-3', "Clavos de 3' Ñandú", 15.25, False, '  con espacios  ']
+    assert list(rows[3]) == ['EXP-1', 'Control y ilegales', 7, None, None]  # Caracteres de control y NaN: fuera
+    assert list(rows[4]) == ['EXP-2', ']]> </t></is>', -0.125, True, 'línea 1\nlínea 2']
+    assert isinstance(rows[3][2], int) and isinstance(rows[1][3], bool)
+
+
+def test_pandas_reads_the_same_table():
+    frame = pd.read_excel(io.BytesIO(_xlsx()))
+    assert list(frame.columns) == HEADER
+    assert frame['Nombre'].tolist() == ['CABLE/THW #14 <rojo> & "negro"', "Clavos de 3' Ñandú",
+                                        'Control y ilegales', ']]> </t></is>']
+    assert frame['Precio'].tolist() == [2.5, 15.25, 7.0, -0.125]
+    assert frame['Activo'].tolist()[:2] == [True, False] and pd.isna(frame['Activo'][2])
+    assert frame['Notas'].isna().tolist() == [True, False, True, False]
+
+
+@pytest.mark.parametrize('batch_size', [1, 3, 1000])
+def test_batches_do_not_change_the_file_contents(batch_size):
+    rows = [[f"SKU-{i:05d}", f"Producto {i}", i * 1.5, i % 2 == 0, None] for i in range(250)]
+    chunks = list(iter_xlsx(HEADER, rows, batch_size=batch_size))
+    frame = pd.read_excel(io.BytesIO(b''.join(chunks)))
+    assert len(frame) == 250
+    assert frame['SKU'].tolist() == [row[0] for row in rows]
+    assert frame['Precio'].tolist() == [row[2] for row in rows]
+    if batch_size == 1:
+        assert len(chunks) > 250  # Una parte por fila: se entrega mientras se lee
+
+
+def test_empty_export_has_only_the_header():
+    frame = pd.read_excel(io.BytesIO(_xlsx(rows=[])))
+    assert list(frame.columns) == HEADER and frame.empty